@@ -1,24 +1,54 @@
-from flask import Flask, render_template, request, send_from_directory, jsonify, redirect, url_for
-from faster_whisper import WhisperModel
+from flask import Flask, Response, render_template, request, send_from_directory, jsonify, redirect, url_for, stream_with_context
+from werkzeug.utils import secure_filename
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+from faster_whisper.utils import available_models as available_whisper_models
+from faster_whisper.feature_extractor import FeatureExtractor
+import ctranslate2
+import numpy as np
+import av
 import os
 import uuid
+import bisect
+import gzip
+import hashlib
+import html
+import sqlite3
 import json
 import tempfile
 import shutil
 import subprocess
 import threading
+import itertools
+import multiprocessing
+import queue
+import random
+import re
+import time
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as google_exceptions
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
+from types import SimpleNamespace
 
 app = Flask(__name__)
 
 UPLOAD_FOLDER = "uploads"
 SESSION_FOLDER = "sessions"
 SUMMARY_FOLDER = "summaries"
+CACHE_FOLDER = "cache"
+TRANSCRIPT_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "transcripts")
+RENDITION_FOLDER = os.path.join(UPLOAD_FOLDER, "renditions")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(RENDITION_FOLDER, exist_ok=True)
 os.makedirs(SESSION_FOLDER, exist_ok=True)
 os.makedirs(SUMMARY_FOLDER, exist_ok=True)
+os.makedirs(TRANSCRIPT_CACHE_FOLDER, exist_ok=True)
 
 # Configure Gemini API (supports multiple API keys for load distribution)
 # Try to import from settings.py first, fallback to environment variables
@@ -34,196 +64,3138 @@ except ImportError:
     else:
         print("WARNING: No API keys found. Please create settings.py or set GEMINI_API_KEYS environment variable")
 
-current_api_key_index = 0
+try:
+    import settings as _settings_module
+    _settings = {k: v for k, v in vars(_settings_module).items() if k.isupper()}
+except ImportError:
+    _settings = {}
+
+def get_setting(name, default=None):
+    """
+    Read a setting from settings.py, then the environment, then fall back to the default.
+    Environment values are converted to the default's type (lists are comma-separated).
+    """
+    if name in _settings:
+        return _settings[name]
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if isinstance(default, (list, tuple)):
+        return type(default)(item.strip() for item in value.split(",") if item.strip())
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+# Gemini API key scheduler. Every request picks the least loaded key that is not
+# cooling down after a 429 and still has room in its per-minute request and
+# token budget, and runs on a client bound to that key (genai.configure changes
+# process-global state and is not safe with concurrent background threads).
+GEMINI_MODEL_NAME = get_setting("GEMINI_MODEL_NAME", "gemini-2.5-flash")
+GEMINI_RPM_PER_KEY = get_setting("GEMINI_RPM_PER_KEY", 10)
+GEMINI_TPM_PER_KEY = get_setting("GEMINI_TPM_PER_KEY", 250000)
+GEMINI_COOLDOWN_SECONDS = get_setting("GEMINI_COOLDOWN_SECONDS", 15)
+GEMINI_MAX_COOLDOWN_SECONDS = get_setting("GEMINI_MAX_COOLDOWN_SECONDS", 300)
+GEMINI_KEY_WAIT_SECONDS = get_setting("GEMINI_KEY_WAIT_SECONDS", 120)
+# A key the API rejects (invalid, revoked, no permission) is set aside for this long
+GEMINI_KEY_DISABLE_SECONDS = get_setting("GEMINI_KEY_DISABLE_SECONDS", 600)
+
+def mask_api_key(api_key):
+    """Show which key is being used (masked for security)"""
+    return f"{api_key[:10]}...{api_key[-4:]}" if len(api_key) > 14 else "***"
 
-def get_next_api_key():
-    """Rotate through available API keys for load distribution"""
-    global current_api_key_index
-    if not GEMINI_API_KEYS:
+def is_key_error(error):
+    """Whether the API rejected the key itself (so another key may still work)"""
+    if isinstance(error, (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated)):
+        return True
+    return (isinstance(error, google_exceptions.InvalidArgument)
+            and ("API_KEY_INVALID" in str(error) or "api key" in str(error).lower()))
+
+class NoUsableApiKeyError(RuntimeError):
+    """Every configured Gemini API key was rejected by the API"""
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+class ApiKeyScheduler:
+    """Thread-safe, rate-aware selection of Gemini API keys"""
+    
+    def __init__(self, api_keys, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.condition = threading.Condition()
+        self.keys = {
+            api_key: {
+                "requests": deque(),
+                "tokens": deque(),
+                "in_flight": 0,
+                "cooldown_until": 0.0,
+                "consecutive_429s": 0,
+                "disabled_until": 0.0,
+                "total_requests": 0,
+                "total_tokens": 0,
+                "rate_limited": 0,
+                "rejected": 0
+            } for api_key in api_keys
+        }
+    
+    def _prune(self, state, now):
+        """Drop usage older than the one-minute window"""
+        while state["requests"] and state["requests"][0] <= now - 60:
+            state["requests"].popleft()
+        while state["tokens"] and state["tokens"][0][0] <= now - 60:
+            state["tokens"].popleft()
+    
+    def _available_in(self, state, now, estimated_tokens):
+        """Seconds until this key can take a request of this size (0 = now)"""
+        wait = max(state["cooldown_until"] - now, state["disabled_until"] - now, 0)
+        if len(state["requests"]) >= self.rpm:
+            wait = max(wait, state["requests"][0] + 60 - now)
+        used_tokens = sum(tokens for _, tokens in state["tokens"])
+        if state["tokens"] and used_tokens + estimated_tokens > self.tpm:
+            wait = max(wait, state["tokens"][0][0] + 60 - now)
+        return wait
+    
+    def acquire(self, estimated_tokens=0, exclude=(), timeout=None):
+        """Reserve a key for one request, waiting until one has capacity. Returns (api_key, reservation)"""
+        timeout = GEMINI_KEY_WAIT_SECONDS if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                now = time.time()
+                if self.keys and all(state["disabled_until"] > now for state in self.keys.values()):
+                    raise NoUsableApiKeyError("Every Gemini API key was rejected (invalid or without permission)")
+                best_key, best_load, shortest_wait = None, None, None
+                for api_key, state in self.keys.items():
+                    if api_key in exclude and len(exclude) < len(self.keys):
+                        continue
+                    self._prune(state, now)
+                    wait = self._available_in(state, now, estimated_tokens)
+                    if wait > 0:
+                        shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+                        continue
+                    load = (state["in_flight"], len(state["requests"]))
+                    if best_load is None or load < best_load:
+                        best_key, best_load = api_key, load
+                
+                if best_key is not None:
+                    state = self.keys[best_key]
+                    reservation = [now, estimated_tokens]
+                    state["requests"].append(now)
+                    state["tokens"].append(reservation)
+                    state["in_flight"] += 1
+                    state["total_requests"] += 1
+                    return best_key, reservation
+                
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise RuntimeError("All Gemini API keys are rate limited or cooling down")
+                self.condition.wait(min(remaining, shortest_wait or 1.0))
+    
+    def release(self, api_key, reservation, tokens_used=None, rate_limited=False, rejected=False):
+        """Record the outcome of a request made with a reserved key"""
+        with self.condition:
+            state = self.keys[api_key]
+            state["in_flight"] -= 1
+            if tokens_used is not None:
+                # Replace the estimate with the real usage
+                reservation[1] = tokens_used
+                state["total_tokens"] += tokens_used
+            if rate_limited:
+                state["rate_limited"] += 1
+                state["consecutive_429s"] += 1
+                cooldown = min(GEMINI_COOLDOWN_SECONDS * 2 ** (state["consecutive_429s"] - 1), GEMINI_MAX_COOLDOWN_SECONDS)
+                state["cooldown_until"] = time.time() + cooldown
+                print(f"  🧊 API key {mask_api_key(api_key)} rate limited, cooling down for {cooldown}s")
+            elif rejected:
+                state["rejected"] += 1
+                state["disabled_until"] = time.time() + GEMINI_KEY_DISABLE_SECONDS
+                print(f"  🚫 API key {mask_api_key(api_key)} rejected, set aside for {GEMINI_KEY_DISABLE_SECONDS}s")
+            else:
+                state["consecutive_429s"] = 0
+            self.condition.notify_all()
+    
+    def stats(self):
+        """Per-key usage snapshot (keys masked)"""
+        with self.condition:
+            now = time.time()
+            result = []
+            for api_key, state in self.keys.items():
+                self._prune(state, now)
+                result.append({
+                    "key": mask_api_key(api_key),
+                    "requests_last_minute": len(state["requests"]),
+                    "tokens_last_minute": sum(tokens for _, tokens in state["tokens"]),
+                    "in_flight": state["in_flight"],
+                    "cooling_down_for": round(max(state["cooldown_until"] - now, 0), 1),
+                    "disabled_for": round(max(state["disabled_until"] - now, 0), 1),
+                    "total_requests": state["total_requests"],
+                    "total_tokens": state["total_tokens"],
+                    "rate_limited": state["rate_limited"],
+                    "rejected": state["rejected"]
+                })
+            return result
+
+api_key_scheduler = ApiKeyScheduler(GEMINI_API_KEYS, GEMINI_RPM_PER_KEY, GEMINI_TPM_PER_KEY)
+gemini_clients = {}
+gemini_clients_lock = threading.Lock()
+
+def get_gemini_client(api_key):
+    """One GenerativeService client per API key, shared by all requests using that key"""
+    with gemini_clients_lock:
+        client = gemini_clients.get(api_key)
+        if client is None:
+            client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+            gemini_clients[api_key] = client
+        return client
+
+class ScheduledGeminiModel:
+    """Drop-in for genai.GenerativeModel that schedules every request onto an API key"""
+    
+    def __init__(self, model_name=GEMINI_MODEL_NAME, use_cache=True, avoid_keys=()):
+        self.model_name = model_name
+        self.use_cache = use_cache and LLM_CACHE_ENABLED
+        # Keys to skip while others are available (e.g. the key a failed attempt used)
+        self.avoid_keys = set(avoid_keys)
+        self.last_api_key = None
+    
+    def is_cacheable(self, prompt, kwargs=None):
+        """Only plain text prompts with default options are cacheable"""
+        return self.use_cache and isinstance(prompt, str) and not kwargs
+    
+    def generate_content(self, prompt, timeout=None, deadline=None, **kwargs):
+        """
+        timeout bounds the request itself; deadline (a time.time() value) also bounds
+        the wait for a key with capacity, so the call as a whole ends by then.
+        """
+        if self.is_cacheable(prompt, kwargs):
+            cached_text = llm_cache_get(self.model_name, prompt)
+            if cached_text is not None:
+                print("  💾 Using cached LLM response")
+                return SimpleNamespace(text=cached_text, usage_metadata=None, from_cache=True)
+        return self._generate_scheduled(prompt, timeout, deadline, **kwargs)
+    
+    def remember(self, prompt, response):
+        """Cache a response once the caller has checked it is usable"""
+        if self.is_cacheable(prompt) and not getattr(response, "from_cache", False):
+            llm_cache_put(self.model_name, prompt, response.text)
+    
+    def _generate_scheduled(self, prompt, timeout=None, deadline=None, **kwargs):
+        """Send the request on the best available API key, moving to another key on 429 or a rejected key"""
+        estimated = estimate_tokens(prompt if isinstance(prompt, str) else str(prompt))
+        tried_keys = set()
+        while True:
+            key_wait = None
+            if deadline is not None:
+                key_wait = max(min(GEMINI_KEY_WAIT_SECONDS, deadline - time.time()), 0)
+            api_key, reservation = api_key_scheduler.acquire(estimated, exclude=tried_keys | self.avoid_keys, timeout=key_wait)
+            tried_keys.add(api_key)
+            request_timeout = timeout
+            if deadline is not None:
+                request_timeout = max(min(timeout or deadline, deadline - time.time()), 1)
+            if request_timeout:
+                # Deadline for the HTTP/gRPC request itself, so a stuck call cannot hang the thread
+                kwargs["request_options"] = {"timeout": request_timeout}
+            self.last_api_key = api_key
+            print(f"  🔑 Using API key: {mask_api_key(api_key)}")
+            
+            model = genai.GenerativeModel(self.model_name)
+            # The SDK has no public per-model client option: google-generativeai is pinned
+            # in requirements.txt and verify_stream_mock.py fails if _client goes away
+            model._client = get_gemini_client(api_key)
+            try:
+                response = model.generate_content(prompt, **kwargs)
+            except google_exceptions.TooManyRequests:
+                api_key_scheduler.release(api_key, reservation, rate_limited=True)
+                if len(tried_keys) >= len(GEMINI_API_KEYS):
+                    raise
+                continue
+            except Exception as e:
+                rejected = is_key_error(e)
+                api_key_scheduler.release(api_key, reservation, rejected=rejected)
+                if rejected and len(tried_keys) < len(GEMINI_API_KEYS):
+                    continue
+                raise
+            
+            usage = getattr(response, "usage_metadata", None)
+            tokens_used = getattr(usage, "total_token_count", None) if usage else None
+            api_key_scheduler.release(api_key, reservation, tokens_used=tokens_used)
+            return response
+
+# LLM response cache: responses are stored in SQLite keyed by model name + prompt
+# hash, so regenerating minutes for an unchanged transcript reuses them. Entries
+# expire after LLM_CACHE_TTL_SECONDS and the least recently used ones are evicted
+# once the cache grows beyond LLM_CACHE_MAX_MB.
+LLM_CACHE_PATH = os.path.join(CACHE_FOLDER, "llm_cache.db")
+LLM_CACHE_TTL_SECONDS = get_setting("LLM_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+LLM_CACHE_MAX_MB = get_setting("LLM_CACHE_MAX_MB", 200)
+LLM_CACHE_ENABLED = get_setting("LLM_CACHE_ENABLED", True)
+
+llm_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+llm_cache_lock = threading.Lock()
+db_local = threading.local()
+
+def get_db(path):
+    """Thread-local SQLite connection (WAL mode so readers don't block the writer)"""
+    connections = getattr(db_local, "connections", None)
+    if connections is None:
+        connections = db_local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = conn
+    return conn
+
+# Application database: session catalog (and other app state) in SQLite
+DATABASE_PATH = get_setting("DATABASE_PATH", "transcriber.db")
+
+def get_app_db():
+    """Connection to the application database, creating the schema on first use"""
+    conn = get_db(DATABASE_PATH)
+    if not getattr(db_local, "app_db_ready", False):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                duration REAL,
+                segment_count INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+            CREATE INDEX IF NOT EXISTS sessions_name ON sessions (name);
+            CREATE TABLE IF NOT EXISTS job_status (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                session_id TEXT PRIMARY KEY,
+                job_args TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+        """)
+        # Databases created before jobs counted their attempts
+        if "attempts" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+            conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1")
+        conn.commit()
+        db_local.app_db_ready = True
+    return conn
+
+def get_llm_cache_db():
+    """Connection to the LLM response cache, creating the table on first use"""
+    conn = get_db(LLM_CACHE_PATH)
+    if not getattr(db_local, "llm_cache_ready", False):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        conn.commit()
+        db_local.llm_cache_ready = True
+    return conn
+
+def get_llm_cache_key(model_name, prompt):
+    """Cache key for a prompt sent to a given model"""
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+def llm_cache_get(model_name, prompt):
+    """Cached response text for this prompt, or None"""
+    key = get_llm_cache_key(model_name, prompt)
+    conn = get_llm_cache_db()
+    now = time.time()
+    row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    if row is not None and now - row["created_at"] > LLM_CACHE_TTL_SECONDS:
+        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        conn.commit()
+        row = None
+    with llm_cache_lock:
+        llm_cache_stats["hits" if row is not None else "misses"] += 1
+    if row is None:
         return None
-    key = GEMINI_API_KEYS[current_api_key_index]
-    current_api_key_index = (current_api_key_index + 1) % len(GEMINI_API_KEYS)
-    return key
-
-def get_model():
-    """Get a Gemini model instance with the next available API key"""
-    api_key = get_next_api_key()
-    if api_key:
-        # Show which key is being used (masked for security)
-        key_preview = f"{api_key[:10]}...{api_key[-4:]}" if len(api_key) > 14 else "***"
-        print(f"  🔑 Using API key: {key_preview}")
-        genai.configure(api_key=api_key)
-        return genai.GenerativeModel('gemini-2.5-flash')
+    conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+    conn.commit()
+    return row["response"]
+
+def llm_cache_put(model_name, prompt, response_text):
+    """Store a response and evict least recently used entries beyond the size budget"""
+    key = get_llm_cache_key(model_name, prompt)
+    conn = get_llm_cache_db()
+    now = time.time()
+    size = len(response_text.encode("utf-8"))
+    conn.execute(
+        "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, model_name, response_text, size, now, now)
+    )
+    conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE_TTL_SECONDS,))
+    
+    max_bytes = LLM_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+    if total > max_bytes:
+        evicted = 0
+        for row in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            if total <= max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            evicted += 1
+        with llm_cache_lock:
+            llm_cache_stats["evictions"] += evicted
+    conn.commit()
+
+def forget_llm_response(prompt, model_name=GEMINI_MODEL_NAME):
+    """Drop a cached response that turned out to be unusable (e.g. invalid JSON)"""
+    conn = get_llm_cache_db()
+    conn.execute("DELETE FROM llm_cache WHERE key = ?", (get_llm_cache_key(model_name, prompt),))
+    conn.commit()
+
+def get_llm_cache_stats():
+    """Hit/miss counters and current size of the LLM response cache"""
+    conn = get_llm_cache_db()
+    entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+    with llm_cache_lock:
+        return {
+            **llm_cache_stats,
+            "entries": entries,
+            "size_mb": round(total / (1024 * 1024), 2),
+            "max_mb": LLM_CACHE_MAX_MB
+        }
+
+def get_model(avoid_keys=()):
+    """Get a Gemini model whose requests are scheduled across the available API keys"""
+    if GEMINI_API_KEYS:
+        return ScheduledGeminiModel(avoid_keys=avoid_keys)
     return None
 
-# Initialize with first key
-if GEMINI_API_KEYS:
-    genai.configure(api_key=GEMINI_API_KEYS[0])
+# Shared LLM call layer. Every prompt goes through call_llm: each attempt has a
+# deadline of LLM_CALL_TIMEOUT_SECONDS (enforced by the API client), a failed attempt
+# (error, timeout or unparseable response) is re-issued on another API key after a
+# jittered exponential backoff, and the call gives up after LLM_MAX_ATTEMPTS attempts
+# or LLM_TOTAL_TIMEOUT_SECONDS in total, which bounds the tail latency of a summary.
+LLM_CALL_TIMEOUT_SECONDS = get_setting("LLM_CALL_TIMEOUT_SECONDS", 120)
+LLM_TOTAL_TIMEOUT_SECONDS = get_setting("LLM_TOTAL_TIMEOUT_SECONDS", 300)
+LLM_MAX_ATTEMPTS = get_setting("LLM_MAX_ATTEMPTS", 4)
+LLM_BACKOFF_SECONDS = get_setting("LLM_BACKOFF_SECONDS", 2.0)
+LLM_MAX_BACKOFF_SECONDS = get_setting("LLM_MAX_BACKOFF_SECONDS", 30.0)
+# Errors that another attempt cannot fix. A rejected key (see is_key_error) is not
+# one of them: the scheduler sets it aside and the request moves to another key.
+LLM_FATAL_ERRORS = (
+    google_exceptions.InvalidArgument,
+    google_exceptions.NotFound,
+    NoUsableApiKeyError
+)
 
-# Global dict to track processing progress
-processing_status = {}
-def convert_to_wav(input_path, output_path):
-    """Convert any audio format to 16kHz mono WAV using ffmpeg."""
+def is_fatal_llm_error(error):
+    return isinstance(error, LLM_FATAL_ERRORS) and not is_key_error(error)
+
+llm_call_stats = {"calls": 0, "attempts": 0, "retries": 0, "timeouts": 0, "failures": 0}
+llm_call_lock = threading.Lock()
+
+def count_llm_call(**counts):
+    with llm_call_lock:
+        for name, value in counts.items():
+            llm_call_stats[name] += value
+
+def get_llm_call_stats():
+    """Counters of the shared LLM call layer"""
+    with llm_call_lock:
+        return {
+            **llm_call_stats,
+            "call_timeout_seconds": LLM_CALL_TIMEOUT_SECONDS,
+            "total_timeout_seconds": LLM_TOTAL_TIMEOUT_SECONDS,
+            "max_attempts": LLM_MAX_ATTEMPTS
+        }
+
+def parse_json_response(response):
+    """Parse a JSON response (raises ValueError if the model returned something else)"""
+    return json.loads(clean_json_response(response.text))
+
+def call_llm(prompt, parse=None, description="LLM call"):
+    """
+    Send a prompt with per-attempt deadlines, retries and key failover.
+    Returns parse(response), or the response itself; raises the last error once
+    the attempts or the total deadline are used up.
+    """
+    count_llm_call(calls=1)
+    deadline = time.time() + LLM_TOTAL_TIMEOUT_SECONDS
+    failed_keys = set()
+    attempt = 0
+    while True:
+        attempt += 1
+        count_llm_call(attempts=1)
+        model = get_model(avoid_keys=failed_keys)
+        timeout = max(min(LLM_CALL_TIMEOUT_SECONDS, deadline - time.time()), 1)
+        try:
+            response = model.generate_content(prompt, timeout=timeout, deadline=deadline)
+            result = parse(response) if parse else response
+            # Only responses that parsed are cached, so a truncated one is never replayed
+            model.remember(prompt, response)
+            return result
+        except Exception as e:
+            if isinstance(e, ValueError):
+                # A cached response the parser now rejects: drop it rather than replay it
+                forget_llm_response(prompt)
+            if isinstance(e, (google_exceptions.DeadlineExceeded, TimeoutError)):
+                count_llm_call(timeouts=1)
+            
+            last_key = getattr(model, "last_api_key", None)
+            if last_key:
+                failed_keys.add(last_key)
+            # Full jitter: spread the retries of concurrent calls over the backoff window
+            delay = random.uniform(0, min(LLM_MAX_BACKOFF_SECONDS, LLM_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+            if (is_fatal_llm_error(e) or attempt >= LLM_MAX_ATTEMPTS
+                    or time.time() + delay >= deadline):
+                count_llm_call(failures=1)
+                print(f"  ⚠️ {description} failed after {attempt} attempt(s): {e}")
+                raise
+            
+            count_llm_call(retries=1)
+            print(f"  🔁 {description} failed ({e}); retrying in {delay:.1f}s on another key...")
+            time.sleep(delay)
+
+# Job state store. Progress entries (and the arguments of queued transcription
+# jobs) live in a shared backend so every worker process of a multi-process
+# deployment sees the same state and jobs survive a restart:
+#   "sqlite" (default) - the application database, shared by processes on one host
+#   "redis"            - JOB_STATE_REDIS_URL, shared across hosts (needs the redis package)
+#   "memory"           - the original per-process dict, nothing is persisted
+# Finished entries expire after JOB_STATE_TTL_SECONDS. Queued/running jobs are
+# leased by the process that owns them; when a lease is not renewed for
+# JOB_LEASE_SECONDS (crash or restart) another process claims and re-runs the job.
+# Every claim counts as an attempt; a job that has used JOB_MAX_ATTEMPTS (e.g. an
+# input that keeps crashing its worker process) is marked as failed instead.
+JOB_STATE_BACKEND = get_setting("JOB_STATE_BACKEND", "sqlite")
+JOB_STATE_REDIS_URL = get_setting("JOB_STATE_REDIS_URL", "redis://localhost:6379/0")
+JOB_STATE_TTL_SECONDS = get_setting("JOB_STATE_TTL_SECONDS", 24 * 3600)
+JOB_LEASE_SECONDS = get_setting("JOB_LEASE_SECONDS", 90)
+JOB_MAX_ATTEMPTS = get_setting("JOB_MAX_ATTEMPTS", 3)
+FINISHED_STATUSES = ("complete", "error")
+PROCESS_ID = f"{os.uname().nodename if hasattr(os, 'uname') else 'host'}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class JobStore:
+    """Mapping-style progress store shared by all backends"""
+    
+    poll_interval = 0.5
+    
+    def __init__(self):
+        self.changed = threading.Condition()
+    
+    def notify(self):
+        """Wake up listeners in this process"""
+        with self.changed:
+            self.changed.notify_all()
+    
+    def wait_for_change(self, key, version, timeout):
+        """Block until the entry's version differs from `version` (or timeout); returns the current version"""
+        deadline = time.time() + timeout
+        while True:
+            current = self.get_version(key)
+            remaining = deadline - time.time()
+            if current != version or remaining <= 0:
+                return current
+            # Local writes notify immediately; other processes are picked up by polling
+            with self.changed:
+                self.changed.wait(min(remaining, self.poll_interval))
+
+class MemoryJobStore(JobStore):
+    """Per-process dict (no persistence, no sharing between processes)"""
+    
+    poll_interval = 5
+    
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+        self.versions = {}
+        self.finished_at = {}
+    
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+    
+    def __setitem__(self, key, value):
+        with self.changed:
+            now = time.time()
+            self.entries[key] = value
+            self.versions[key] = self.versions.get(key, 0) + 1
+            if value.get("status") in FINISHED_STATUSES:
+                self.finished_at[key] = now
+            else:
+                self.finished_at.pop(key, None)
+            # Forget finished entries after the TTL so the dict does not grow forever
+            for expired in [k for k, t in self.finished_at.items() if now - t > JOB_STATE_TTL_SECONDS]:
+                self.entries.pop(expired, None)
+                self.finished_at.pop(expired, None)
+            self.changed.notify_all()
+    
+    def get_version(self, key):
+        return self.versions.get(key, 0)
+    
+    def record_job(self, session_id, job_args, priority, owner):
+        pass
+    
+    def set_job_state(self, session_id, state):
+        pass
+    
+    def renew_leases(self, owner):
+        pass
+    
+    def claim_stale_jobs(self, owner):
+        return []
+
+class SQLiteJobStore(JobStore):
+    """Job state in the application database (job_status and jobs tables)"""
+    
+    def __init__(self):
+        super().__init__()
+        self.last_purge = 0.0
+    
+    def get(self, key, default=None):
+        row = get_app_db().execute("SELECT data FROM job_status WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["data"]) if row else default
+    
+    def __setitem__(self, key, value):
+        conn = get_app_db()
+        now = time.time()
+        conn.execute(
+            """INSERT INTO job_status (key, data, version, updated_at, finished) VALUES (?, ?, 1, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET
+                   data = excluded.data,
+                   version = job_status.version + 1,
+                   updated_at = excluded.updated_at,
+                   finished = excluded.finished""",
+            (key, json.dumps(value), now, int(value.get("status") in FINISHED_STATUSES))
+        )
+        if now - self.last_purge > 60:
+            self.last_purge = now
+            conn.execute("DELETE FROM job_status WHERE finished = 1 AND updated_at < ?", (now - JOB_STATE_TTL_SECONDS,))
+            conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (now - JOB_STATE_TTL_SECONDS,))
+        conn.commit()
+        self.notify()
+    
+    def get_version(self, key):
+        row = get_app_db().execute("SELECT version FROM job_status WHERE key = ?", (key,)).fetchone()
+        return row["version"] if row else 0
+    
+    def record_job(self, session_id, job_args, priority, owner):
+        conn = get_app_db()
+        now = time.time()
+        conn.execute(
+            """INSERT OR REPLACE INTO jobs (session_id, job_args, priority, state, owner, lease_expires, attempts, created_at, updated_at)
+               VALUES (?, ?, ?, 'queued', ?, ?, 1, ?, ?)""",
+            (session_id, json.dumps(job_args), priority, owner, now + JOB_LEASE_SECONDS, now, now)
+        )
+        conn.commit()
+    
+    def set_job_state(self, session_id, state):
+        conn = get_app_db()
+        conn.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE session_id = ?", (state, time.time(), session_id))
+        conn.commit()
+    
+    def renew_leases(self, owner):
+        conn = get_app_db()
+        conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND state IN ('queued', 'running')",
+            (time.time() + JOB_LEASE_SECONDS, owner)
+        )
+        conn.commit()
+    
+    def claim_stale_jobs(self, owner):
+        conn = get_app_db()
+        now = time.time()
+        claimed = []
+        rows = conn.execute(
+            "SELECT session_id, job_args, priority, owner, attempts FROM jobs WHERE state IN ('queued', 'running') AND lease_expires < ?",
+            (now,)
+        ).fetchall()
+        for row in rows:
+            # Compare-and-set on the previous owner so only one process wins each job
+            cursor = conn.execute(
+                """UPDATE jobs SET owner = ?, state = 'queued', lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                   WHERE session_id = ? AND owner IS ? AND lease_expires < ?""",
+                (owner, now + JOB_LEASE_SECONDS, now, row["session_id"], row["owner"], now)
+            )
+            if cursor.rowcount == 1:
+                claimed.append((row["session_id"], tuple(json.loads(row["job_args"])), row["priority"], row["attempts"] + 1))
+        conn.commit()
+        return claimed
+
+class RedisJobStore(JobStore):
+    """Job state in Redis (or any Redis-compatible server)"""
+    
+    prefix = "transcriber:"
+    
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("JOB_STATE_BACKEND is 'redis' but the redis package is not installed (pip install redis)")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+    
+    def get(self, key, default=None):
+        data = self.redis.hget(f"{self.prefix}status:{key}", "data")
+        return json.loads(data) if data else default
+    
+    def __setitem__(self, key, value):
+        redis_key = f"{self.prefix}status:{key}"
+        pipe = self.redis.pipeline()
+        pipe.hset(redis_key, "data", json.dumps(value))
+        pipe.hincrby(redis_key, "version", 1)
+        if value.get("status") in FINISHED_STATUSES:
+            pipe.expire(redis_key, JOB_STATE_TTL_SECONDS)
+        else:
+            pipe.persist(redis_key)
+        pipe.execute()
+        self.notify()
+    
+    def get_version(self, key):
+        return int(self.redis.hget(f"{self.prefix}status:{key}", "version") or 0)
+    
+    def record_job(self, session_id, job_args, priority, owner):
+        pipe = self.redis.pipeline()
+        pipe.hset(f"{self.prefix}job:{session_id}", mapping={
+            "job_args": json.dumps(job_args),
+            "priority": priority,
+            "state": "queued",
+            "attempts": 1
+        })
+        pipe.sadd(f"{self.prefix}jobs:active", session_id)
+        pipe.set(f"{self.prefix}lease:{session_id}", owner, px=JOB_LEASE_SECONDS * 1000)
+        pipe.execute()
+    
+    def set_job_state(self, session_id, state):
+        pipe = self.redis.pipeline()
+        pipe.hset(f"{self.prefix}job:{session_id}", "state", state)
+        if state in ("done", "failed"):
+            pipe.srem(f"{self.prefix}jobs:active", session_id)
+            pipe.expire(f"{self.prefix}job:{session_id}", JOB_STATE_TTL_SECONDS)
+            pipe.delete(f"{self.prefix}lease:{session_id}")
+        pipe.execute()
+    
+    def renew_leases(self, owner):
+        for session_id in self.redis.smembers(f"{self.prefix}jobs:active"):
+            lease_key = f"{self.prefix}lease:{session_id}"
+            if self.redis.get(lease_key) == owner:
+                self.redis.pexpire(lease_key, JOB_LEASE_SECONDS * 1000)
+    
+    def claim_stale_jobs(self, owner):
+        claimed = []
+        for session_id in self.redis.smembers(f"{self.prefix}jobs:active"):
+            # SET NX only succeeds once the previous owner's lease has expired
+            if self.redis.set(f"{self.prefix}lease:{session_id}", owner, nx=True, px=JOB_LEASE_SECONDS * 1000):
+                job = self.redis.hgetall(f"{self.prefix}job:{session_id}")
+                if not job:
+                    self.redis.srem(f"{self.prefix}jobs:active", session_id)
+                    continue
+                pipe = self.redis.pipeline()
+                pipe.hset(f"{self.prefix}job:{session_id}", "state", "queued")
+                pipe.hincrby(f"{self.prefix}job:{session_id}", "attempts", 1)
+                attempts = pipe.execute()[1]
+                claimed.append((session_id, tuple(json.loads(job["job_args"])), int(job["priority"]), attempts))
+        return claimed
+
+def create_job_store(backend):
+    """Instantiate the configured job state backend"""
+    if backend == "redis":
+        return RedisJobStore(JOB_STATE_REDIS_URL)
+    if backend == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore()
+
+# Global store to track processing progress
+processing_status = create_job_store(JOB_STATE_BACKEND)
+
+# Whisper model pool: each (size, device, compute_type) is loaded once and shared
+# across jobs. Idle models are evicted least-recently-used first once the
+# estimated memory of loaded models exceeds WHISPER_MODEL_POOL_MAX_MB.
+WHISPER_MODEL_POOL_MAX_MB = get_setting("WHISPER_MODEL_POOL_MAX_MB", 2048)
+WHISPER_MODEL_MEMORY_MB = {"tiny": 150, "base": 290, "small": 970, "medium": 3100, "large": 6200}
+COMPUTE_TYPE_MEMORY_FACTOR = {"int8": 0.35, "int8_float16": 0.4, "int8_float32": 0.4, "float16": 0.5, "float32": 1.0}
+
+# Transcription job queue: a fixed pool of workers sized to the CPU cores pulls
+# jobs from a bounded priority queue (lower priority value first, FIFO within a
+# priority). Uploads beyond TRANSCRIPTION_QUEUE_SIZE waiting jobs are rejected.
+CPU_CORES = os.cpu_count() or 1
+TRANSCRIPTION_WORKERS = get_setting("TRANSCRIPTION_WORKERS", max(1, CPU_CORES // 4))
+TRANSCRIPTION_QUEUE_SIZE = get_setting("TRANSCRIPTION_QUEUE_SIZE", 20)
+WHISPER_CPU_THREADS = max(1, CPU_CORES // TRANSCRIPTION_WORKERS)
+
+whisper_models = OrderedDict()
+whisper_models_lock = threading.Lock()
+whisper_load_locks = {}
+model_pool_stats = {"hits": 0, "misses": 0, "evictions": 0, "load_seconds": 0.0}
+
+def estimate_model_memory_mb(model_size, compute_type):
+    """Rough resident size of a loaded Whisper model, used for the pool budget"""
+    base_mb = WHISPER_MODEL_MEMORY_MB.get(model_size.split("-")[0].split(".")[0], 1000)
+    return int(base_mb * COMPUTE_TYPE_MEMORY_FACTOR.get(compute_type, 1.0))
+
+def evict_idle_whisper_models():
+    """Drop least recently used idle models until the pool fits its memory budget (lock must be held)"""
+    total_mb = sum(entry["memory_mb"] for entry in whisper_models.values())
+    # The most recently used model is always kept, even if it alone exceeds the budget
+    for key in list(whisper_models.keys())[:-1]:
+        if total_mb <= WHISPER_MODEL_POOL_MAX_MB:
+            break
+        entry = whisper_models[key]
+        if entry["in_use"] > 0:
+            continue
+        del whisper_models[key]
+        total_mb -= entry["memory_mb"]
+        model_pool_stats["evictions"] += 1
+        print(f"  ♻️ Evicted idle Whisper model {key[0]} ({key[1]}/{key[2]})")
+
+def checkout_whisper_model(model_size, device, compute_type):
+    """Return a pooled model entry, loading it on first use, and mark it in use"""
+    key = (model_size, device, compute_type)
+    with whisper_models_lock:
+        entry = whisper_models.get(key)
+        if entry is not None:
+            entry["in_use"] += 1
+            whisper_models.move_to_end(key)
+            model_pool_stats["hits"] += 1
+            return entry
+        load_lock = whisper_load_locks.setdefault(key, threading.Lock())
+
+    # Only one thread loads a given model; the others wait and then share it
+    with load_lock:
+        with whisper_models_lock:
+            entry = whisper_models.get(key)
+            if entry is not None:
+                entry["in_use"] += 1
+                whisper_models.move_to_end(key)
+                model_pool_stats["hits"] += 1
+                return entry
+
+        load_start = time.time()
+        # Models are shared by the transcription workers, so give each of them its
+        # own CTranslate2 worker and split the CPU cores between them
+        model = WhisperModel(
+            model_size, device=device, compute_type=compute_type,
+            cpu_threads=WHISPER_CPU_THREADS, num_workers=TRANSCRIPTION_WORKERS
+        )
+        load_seconds = time.time() - load_start
+        print(f"  🧠 Loaded Whisper model {model_size} ({device}/{compute_type}) in {load_seconds:.1f}s")
+
+        with whisper_models_lock:
+            entry = {
+                "model": model,
+                "in_use": 1,
+                "memory_mb": estimate_model_memory_mb(model_size, compute_type),
+                "loaded_at": datetime.now().isoformat(),
+                "last_used": time.time()
+            }
+            whisper_models[key] = entry
+            model_pool_stats["misses"] += 1
+            model_pool_stats["load_seconds"] += load_seconds
+            evict_idle_whisper_models()
+            return entry
+
+transcription_queue = queue.PriorityQueue()
+transcription_queue_lock = threading.Lock()
+queued_jobs = {}
+job_costs = {}
+job_sequence = itertools.count()
+transcription_workers = []
+
+def transcription_worker():
+    """Pull transcription jobs off the queue forever"""
+    while True:
+        priority, sequence, session_id, job_args = transcription_queue.get()
+        with transcription_queue_lock:
+            queued_jobs.pop(session_id, None)
+        try:
+            processing_status.set_job_state(session_id, "running")
+            process_transcription(session_id, *job_args)
+        except Exception as e:
+            print(f"Error running transcription job {session_id}: {e}")
+        finally:
+            with transcription_queue_lock:
+                job_costs.pop(session_id, None)
+            transcription_queue.task_done()
+
+def job_lease_keeper():
+    """Keep this process's job leases alive and pick up jobs whose owner went away"""
+    while True:
+        try:
+            processing_status.renew_leases(PROCESS_ID)
+            for session_id, job_args, priority, attempts in processing_status.claim_stale_jobs(PROCESS_ID):
+                if attempts > JOB_MAX_ATTEMPTS:
+                    print(f"  ❌ Giving up on transcription job {session_id} after {attempts - 1} interrupted attempts")
+                    release_transcription(session_id, None, None, error=(
+                        f"Transcription was interrupted {attempts - 1} times (the worker process stopped); giving up"
+                    ))
+                    continue
+                print(f"  🔁 Resuming interrupted transcription job {session_id} (attempt {attempts})")
+                enqueue_transcription(session_id, job_args, priority=priority, resumed=True)
+        except Exception as e:
+            print(f"Error maintaining job leases: {e}")
+        time.sleep(JOB_LEASE_SECONDS / 3)
+
+def ensure_transcription_workers():
+    """Start the worker pool (and the job lease keeper, which resumes interrupted jobs) on first use"""
+    with transcription_queue_lock:
+        if transcription_workers:
+            return
+        for _ in range(TRANSCRIPTION_WORKERS):
+            worker = threading.Thread(target=transcription_worker, daemon=True)
+            worker.start()
+            transcription_workers.append(worker)
+        threading.Thread(target=job_lease_keeper, daemon=True).start()
+        if WHISPER_PRELOAD:
+            threading.Thread(target=preload_whisper_models, daemon=True).start()
+
+def enqueue_transcription(session_id, job_args, priority=0, resumed=False, estimated_seconds=0.0):
+    """
+    Queue a transcription job. estimated_seconds (expected processing time) counts
+    towards the backlog used for model auto-selection. Returns the job's queue
+    position, or None if the queue is full.
+    """
+    ensure_transcription_workers()
+    with transcription_queue_lock:
+        # Resumed jobs were admitted before the restart, so they skip admission control
+        if len(queued_jobs) >= TRANSCRIPTION_QUEUE_SIZE and not resumed:
+            return None
+        order = (priority, next(job_sequence))
+        queued_jobs[session_id] = order
+        job_costs[session_id] = estimated_seconds
+        position = sum(1 for other in queued_jobs.values() if other <= order)
+    
+    if not resumed:
+        processing_status.record_job(session_id, list(job_args), priority, PROCESS_ID)
+    processing_status[session_id] = {"status": "queued", "progress": 0, "queue_position": position}
+    transcription_queue.put((order[0], order[1], session_id, job_args))
+    return position
+
+def get_queue_backlog_seconds():
+    """Estimated processing seconds of the jobs waiting or running"""
+    with transcription_queue_lock:
+        return sum(job_costs.values())
+
+def get_queue_position(session_id):
+    """1-based position of a waiting job, or None once a worker has picked it up"""
+    with transcription_queue_lock:
+        order = queued_jobs.get(session_id)
+        if order is None:
+            return None
+        return sum(1 for other in queued_jobs.values() if other <= order)
+
+def get_queue_stats():
+    """Snapshot of the transcription queue"""
+    with transcription_queue_lock:
+        waiting = len(queued_jobs)
+    return {
+        "workers": TRANSCRIPTION_WORKERS,
+        "waiting": waiting,
+        "capacity": TRANSCRIPTION_QUEUE_SIZE
+    }
+
+@contextmanager
+def pooled_whisper_model(model_size, device, compute_type):
+    """Borrow a shared Whisper model from the pool for the duration of a job"""
+    entry = checkout_whisper_model(model_size, device, compute_type)
+    try:
+        yield entry["model"]
+    finally:
+        with whisper_models_lock:
+            entry["in_use"] -= 1
+            entry["last_used"] = time.time()
+            evict_idle_whisper_models()
+
+def get_model_pool_stats():
+    """Snapshot of pool hits/misses and the models currently loaded"""
+    with whisper_models_lock:
+        return {
+            **model_pool_stats,
+            "load_seconds": round(model_pool_stats["load_seconds"], 2),
+            "budget_mb": WHISPER_MODEL_POOL_MAX_MB,
+            "loaded_mb": sum(entry["memory_mb"] for entry in whisper_models.values()),
+            "models": [
+                {
+                    "model_size": key[0],
+                    "device": key[1],
+                    "compute_type": key[2],
+                    "memory_mb": entry["memory_mb"],
+                    "in_use": entry["in_use"],
+                    "loaded_at": entry["loaded_at"]
+                } for key, entry in whisper_models.items()
+            ]
+        }
+
+# Model selection. Defaults come from settings (WHISPER_MODEL_SIZE, WHISPER_DEVICE,
+# WHISPER_COMPUTE_TYPE); values from the upload form are checked against the models
+# faster-whisper knows and the compute types the local CTranslate2 build supports;
+# uploads may only pick the sizes in WHISPER_ALLOWED_MODELS (plus the default).
+# With model size "auto", every upload gets the largest tier of WHISPER_AUTO_TIERS
+# whose estimated wait (the queue backlog plus its own transcription) stays within
+# TARGET_WAIT_SECONDS. The speed estimates per tier are refined from finished jobs.
+WHISPER_MODEL_SIZE = get_setting("WHISPER_MODEL_SIZE", "tiny")
+WHISPER_DEVICE = get_setting("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = get_setting("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_PRELOAD = get_setting("WHISPER_PRELOAD", True)
+WHISPER_AUTO_TIERS = get_setting("WHISPER_AUTO_TIERS", ["tiny", "base", "small"])
+TARGET_WAIT_SECONDS = get_setting("TARGET_WAIT_SECONDS", 600)
+WHISPER_MODEL_SIZES = ["auto"] + available_whisper_models()
+# Sizes the upload form may request: a client must not be able to load large models
+WHISPER_ALLOWED_MODELS = get_setting("WHISPER_ALLOWED_MODELS", ["auto"] + WHISPER_AUTO_TIERS)
+WHISPER_DEVICES = ["cpu", "cuda", "auto"]
+WHISPER_COMPUTE_TYPES = ["int8", "int8_float16", "int8_float32", "int8_bfloat16", "int16", "float16", "bfloat16", "float32", "default", "auto"]
+
+# Initial estimate of processing seconds per second of audio on one worker (CPU, int8)
+MODEL_REALTIME_FACTORS = {"tiny": 0.04, "base": 0.08, "small": 0.25, "medium": 0.7, "large": 1.5}
+
+transcription_speed = {}
+transcription_speed_lock = threading.Lock()
+
+def get_upload_model_sizes():
+    """Model sizes the upload form offers: the allowed ones faster-whisper knows, and the default"""
+    sizes = [size for size in WHISPER_MODEL_SIZES if size in WHISPER_ALLOWED_MODELS and "." not in size]
+    if WHISPER_MODEL_SIZE not in sizes:
+        sizes.append(WHISPER_MODEL_SIZE)
+    return sizes
+
+def resolve_model_settings(model_size=None, device=None, compute_type=None, allowed_sizes=None):
+    """
+    Validate (model_size, device, compute_type), filling gaps from settings.
+    Unknown values (or sizes outside allowed_sizes) raise ValueError; a GPU request
+    without a GPU falls back to the CPU.
+    """
+    model_size = model_size or WHISPER_MODEL_SIZE
+    device = device or WHISPER_DEVICE
+    compute_type = compute_type or WHISPER_COMPUTE_TYPE
+    if model_size not in WHISPER_MODEL_SIZES:
+        raise ValueError(f"Unknown model size '{model_size}'")
+    if allowed_sizes is not None and model_size not in allowed_sizes:
+        raise ValueError(f"Model size '{model_size}' is not allowed")
+    if device not in WHISPER_DEVICES:
+        raise ValueError(f"Unknown device '{device}'")
+    
+    has_gpu = ctranslate2.get_cuda_device_count() > 0
+    if device == "auto":
+        device = "cuda" if has_gpu else "cpu"
+    elif device == "cuda" and not has_gpu:
+        print("  ⚠️ No CUDA device available, transcribing on the CPU")
+        device = "cpu"
+    
+    if compute_type not in WHISPER_COMPUTE_TYPES:
+        raise ValueError(f"Unknown compute type '{compute_type}'")
+    supported = ctranslate2.get_supported_compute_types(device)
+    if compute_type not in supported and compute_type not in ("default", "auto"):
+        fallback = "int8" if "int8" in supported else "float32"
+        print(f"  ⚠️ Compute type {compute_type} is not supported on {device}, using {fallback}")
+        compute_type = fallback
+    return model_size, device, compute_type
+
+def get_realtime_factor(model_size):
+    """Estimated processing seconds per audio second for a model size"""
+    with transcription_speed_lock:
+        if model_size in transcription_speed:
+            return transcription_speed[model_size]
+    return MODEL_REALTIME_FACTORS.get(model_size.split("-")[0].split(".")[0], 1.0)
+
+def record_transcription_speed(model_size, audio_seconds, elapsed_seconds):
+    """Update the speed estimate of a model size from a finished transcription"""
+    if audio_seconds < 10:
+        return
+    factor = elapsed_seconds / audio_seconds
+    current = get_realtime_factor(model_size)
+    with transcription_speed_lock:
+        transcription_speed[model_size] = 0.7 * current + 0.3 * factor
+
+def probe_audio_duration(audio_path):
+    """Duration of an audio file in seconds from its container header (None if unknown)"""
+    try:
+        with av.open(audio_path) as container:
+            if container.duration:
+                return container.duration / av.time_base
+            stream = container.streams.audio[0]
+            if stream.duration and stream.time_base:
+                return float(stream.duration * stream.time_base)
+    except Exception as e:
+        print(f"  ⚠️ Could not read the duration of {audio_path}: {e}")
+    return None
+
+def choose_model_tier(audio_seconds):
+    """Largest auto tier whose estimated wait stays within TARGET_WAIT_SECONDS. Returns (model_size, estimated_wait)"""
+    backlog_seconds = get_queue_backlog_seconds() / max(1, TRANSCRIPTION_WORKERS)
+    if audio_seconds is None:
+        return WHISPER_AUTO_TIERS[0], backlog_seconds
+    
+    choice = WHISPER_AUTO_TIERS[0]
+    wait = backlog_seconds + audio_seconds * get_realtime_factor(choice)
+    for tier in WHISPER_AUTO_TIERS[1:]:
+        tier_wait = backlog_seconds + audio_seconds * get_realtime_factor(tier)
+        if tier_wait <= TARGET_WAIT_SECONDS:
+            choice, wait = tier, tier_wait
+    return choice, wait
+
+def preload_whisper_models():
+    """Load the default model(s) into the pool at startup, so the first upload does not wait for it"""
+    try:
+        model_size, device, compute_type = resolve_model_settings()
+    except ValueError as e:
+        print(f"  ⚠️ Not preloading a Whisper model: {e}")
+        return
+    sizes = WHISPER_AUTO_TIERS if model_size == "auto" else [model_size]
+    for size in sizes:
+        try:
+            with pooled_whisper_model(size, device, compute_type):
+                pass
+        except Exception as e:
+            print(f"  ⚠️ Could not preload Whisper model {size}: {e}")
+
+# Audio decoding for Whisper. "pyav" decodes in-process to float32 PCM with the
+# PyAV build bundled with faster-whisper, "pipe" reads raw PCM from an ffmpeg
+# subprocess, and "wav" is the original temp-WAV round trip. A failing mode
+# falls back to the next one in AUDIO_DECODE_MODES.
+AUDIO_DECODE_MODES = ["pyav", "pipe", "wav"]
+AUDIO_DECODE_MODE = get_setting("AUDIO_DECODE_MODE", "pyav")
+SAMPLE_RATE = 16000
+
+def get_ffmpeg_path():
+    """Locate the ffmpeg binary or raise a helpful error"""
     ffmpeg_path = shutil.which("ffmpeg")
     if ffmpeg_path is None:
         raise FileNotFoundError(
             "ffmpeg not found. Please install ffmpeg and make sure it is in your system PATH. "
             "Download from: https://ffmpeg.org/download.html"
         )
+    return ffmpeg_path
+
+def convert_to_wav(input_path, output_path):
+    """Convert any audio format to 16kHz mono WAV using ffmpeg."""
+    ffmpeg_path = get_ffmpeg_path()
     command = [
-        ffmpeg_path, "-i", input_path, "-ar", "16000", "-ac", "1",
+        ffmpeg_path, "-i", input_path, "-ar", str(SAMPLE_RATE), "-ac", "1",
         "-y", output_path
     ]
     subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
 
-def process_transcription(session_id, audio_path, filename, model_size, device, compute_type):
+def decode_audio_pipe(input_path):
+    """Decode any audio format to 16kHz mono float32 PCM through an ffmpeg pipe (no temp file)"""
+    ffmpeg_path = get_ffmpeg_path()
+    command = [
+        ffmpeg_path, "-nostdin", "-i", input_path, "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+        "-"
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def load_audio(audio_path, session_id, mode=None):
+    """
+    Decode audio for Whisper using the configured mode, falling back to the next
+    mode on failure. Returns (audio, temp_path): audio is a float32 array or a WAV
+    path, temp_path is a file to delete afterwards (or None).
+    """
+    mode = mode or AUDIO_DECODE_MODE
+    modes = AUDIO_DECODE_MODES[AUDIO_DECODE_MODES.index(mode):] if mode in AUDIO_DECODE_MODES else AUDIO_DECODE_MODES
+    
+    for i, current_mode in enumerate(modes):
+        try:
+            if current_mode == "pyav":
+                return decode_audio(audio_path, sampling_rate=SAMPLE_RATE), None
+            if current_mode == "pipe":
+                return decode_audio_pipe(audio_path), None
+            wav_path = os.path.join(tempfile.gettempdir(), f"{session_id}.wav")
+            convert_to_wav(audio_path, wav_path)
+            return wav_path, wav_path
+        except Exception as e:
+            if i == len(modes) - 1:
+                raise
+            print(f"  ⚠️ Audio decode mode '{current_mode}' failed ({e}), falling back to '{modes[i + 1]}'")
+
+# Uploads are stored content-addressed (uploads/<sha256><ext>), so re-uploading
+# the same recording never overwrites another file and can be recognised. The
+# transcript cache maps (audio hash, model size, compute type, word timestamps)
+# to the session that already holds that transcript.
+transcript_cache_lock = threading.Lock()
+inflight_transcriptions = {}
+
+def save_upload(file_storage):
+    """
+    Stream an upload to disk while hashing it. Returns (audio_hash, stored_filename, created),
+    created being False when the same content was stored already.
+    """
+    extension = os.path.splitext(secure_filename(file_storage.filename or ""))[1].lower()
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix=".upload")
+    with os.fdopen(fd, "wb") as out:
+        while True:
+            chunk = file_storage.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            out.write(chunk)
+    
+    audio_hash = hasher.hexdigest()
+    stored_filename = f"{audio_hash}{extension}"
+    stored_path = os.path.join(UPLOAD_FOLDER, stored_filename)
+    created = not os.path.exists(stored_path)
+    if created:
+        os.replace(temp_path, stored_path)
+    else:
+        os.remove(temp_path)
+    return audio_hash, stored_filename, created
+
+def get_transcript_cache_key(audio_hash, model_size, compute_type, word_timestamps=True, vad_filter=None):
+    """Cache key for a transcript of this audio produced with these model settings"""
+    vad_filter = VAD_FILTER if vad_filter is None else vad_filter
+    raw_key = f"{audio_hash}:{model_size}:{compute_type}:{int(word_timestamps)}"
+    if vad_filter:
+        raw_key += ":vad"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+def get_cached_transcript(cache_key):
+    """Session id of a finished transcript for this cache key, or None"""
+    cache_path = os.path.join(TRANSCRIPT_CACHE_FOLDER, f"{cache_key}.json")
+    try:
+        session_id = read_json_file(cache_path)["session_id"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+    # The session may have been deleted since it was cached
+    if not os.path.exists(os.path.join(SESSION_FOLDER, f"{session_id}.json")):
+        return None
+    return session_id
+
+def store_cached_transcript(cache_key, session_id):
+    """Remember which session holds the transcript for this cache key"""
+    cache_path = os.path.join(TRANSCRIPT_CACHE_FOLDER, f"{cache_key}.json")
+    write_json_file(cache_path, {"session_id": session_id, "created_at": datetime.now().isoformat()})
+
+# Playback rendition: a low-bitrate Opus copy of each upload (uploads/renditions/<sha256>.opus),
+# encoded in the background at ingest from the PCM already decoded for Whisper.
+# Speech at 16kHz mono needs ~24kbps, a small fraction of the original upload.
+AUDIO_RENDITION_ENABLED = get_setting("AUDIO_RENDITION_ENABLED", True)
+AUDIO_RENDITION_BITRATE = get_setting("AUDIO_RENDITION_BITRATE", 24000)
+
+rendition_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rendition")
+
+def get_rendition_path(audio_hash):
+    """Path of the Opus playback rendition of an upload"""
+    return os.path.join(RENDITION_FOLDER, f"{audio_hash}.opus")
+
+def encode_opus_rendition(audio, output_path, bitrate=None):
+    """Encode 16kHz mono float32 PCM as Ogg/Opus"""
+    temp_path = f"{output_path}.tmp"
+    frame_samples = SAMPLE_RATE // 50  # 20ms, the native Opus frame size
+    with av.open(temp_path, "w", format="ogg") as container:
+        stream = container.add_stream("libopus", rate=SAMPLE_RATE, layout="mono")
+        stream.bit_rate = bitrate or AUDIO_RENDITION_BITRATE
+        for start in range(0, len(audio), frame_samples * 50):
+            frame = av.AudioFrame.from_ndarray(
+                np.ascontiguousarray(audio[start:start + frame_samples * 50], dtype=np.float32).reshape(1, -1),
+                format="flt", layout="mono"
+            )
+            frame.sample_rate = SAMPLE_RATE
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    os.replace(temp_path, output_path)
+
+def create_audio_rendition(audio_hash, audio, audio_path):
+    """Build the playback rendition unless it already exists (audio may be None to decode audio_path)"""
+    output_path = get_rendition_path(audio_hash)
+    if os.path.exists(output_path):
+        return
+    try:
+        start = time.time()
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        encode_opus_rendition(audio, output_path)
+        original_mb = os.path.getsize(audio_path) / (1024 * 1024)
+        rendition_mb = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"  🎧 Opus rendition ready: {rendition_mb:.1f}MB (original {original_mb:.1f}MB) in {time.time() - start:.1f}s")
+    except Exception as e:
+        print(f"  ⚠️ Could not create Opus rendition for {audio_hash}: {e}")
+        if os.path.exists(f"{output_path}.tmp"):
+            os.remove(f"{output_path}.tmp")
+
+def schedule_audio_rendition(audio_hash, audio, audio_path):
+    """Queue the playback rendition for an upload (no-op when disabled or already present)"""
+    if AUDIO_RENDITION_ENABLED and audio_hash and not os.path.exists(get_rendition_path(audio_hash)):
+        rendition_executor.submit(create_audio_rendition, audio_hash, audio, audio_path)
+
+def build_segment_data(segment_id, segment, offset=0.0):
+    """Convert a faster-whisper segment into the session JSON segment schema"""
+    return {
+        "id": segment_id,
+        "start": round(segment.start + offset, 2),
+        "end": round(segment.end + offset, 2),
+        "text": segment.text.strip(),
+        "words": [
+            {
+                "start": round(w.start + offset, 2),
+                "end": round(w.end + offset, 2),
+                "word": w.word.strip()
+            } for w in segment.words or []
+        ]
+    }
+
+# Voice activity detection: faster-whisper's Silero VAD removes non-speech before
+# decoding (waiting rooms, breaks) and maps timestamps back to the original timeline.
+VAD_FILTER = get_setting("VAD_FILTER", True)
+VAD_THRESHOLD = get_setting("VAD_THRESHOLD", 0.5)
+VAD_MIN_SILENCE_MS = get_setting("VAD_MIN_SILENCE_MS", 2000)
+VAD_SPEECH_PAD_MS = get_setting("VAD_SPEECH_PAD_MS", 400)
+
+vad_stats = {"audio_seconds": 0.0, "skipped_seconds": 0.0}
+vad_stats_lock = threading.Lock()
+
+def get_transcribe_options(vad_filter=None):
+    """Keyword arguments for WhisperModel.transcribe"""
+    vad_filter = VAD_FILTER if vad_filter is None else vad_filter
+    options = {"word_timestamps": True, "vad_filter": vad_filter}
+    if vad_filter:
+        options["vad_parameters"] = {
+            "threshold": VAD_THRESHOLD,
+            "min_silence_duration_ms": VAD_MIN_SILENCE_MS,
+            "speech_pad_ms": VAD_SPEECH_PAD_MS
+        }
+    return options
+
+def get_vad_skipped_seconds(info):
+    """Seconds of audio the VAD removed before decoding"""
+    if info.duration_after_vad is None:
+        return 0.0
+    return max((info.duration or 0) - info.duration_after_vad, 0.0)
+
+def record_vad_skip(audio_seconds, skipped_seconds):
+    """Add a finished transcription to the VAD totals reported by /api/stats"""
+    with vad_stats_lock:
+        vad_stats["audio_seconds"] += audio_seconds
+        vad_stats["skipped_seconds"] += skipped_seconds
+
+def get_vad_stats():
+    """VAD settings and how much audio it has skipped so far"""
+    with vad_stats_lock:
+        audio_seconds = vad_stats["audio_seconds"]
+        skipped_seconds = vad_stats["skipped_seconds"]
+    return {
+        "enabled": VAD_FILTER,
+        "audio_seconds": round(audio_seconds, 1),
+        "skipped_seconds": round(skipped_seconds, 1),
+        "skipped_fraction": round(skipped_seconds / audio_seconds, 3) if audio_seconds else 0.0
+    }
+
+# Speaker diarization: runs on the decoded PCM in a background thread while Whisper
+# transcribes it. Speech regions (Silero VAD) are cut into overlapping windows,
+# each window gets a speaker embedding, and the embeddings are clustered; every
+# segment is then tagged with the speaker covering most of it. Embeddings come from
+# the ONNX model at DIARIZATION_EMBEDDING_MODEL when one is configured, otherwise from
+# the mean MFCCs of the voiced frames (numpy only). The model must take [batch, frames, 80]
+# Kaldi fbank features and return [batch, dim] embeddings, as WeSpeaker ONNX exports do:
+# 16-bit-scaled PCM, 25 ms frames every 10 ms, DC removal, 0.97 pre-emphasis, HTK mel
+# scale (20 Hz to Nyquist), log power with Kaldi's energy floor, no dither, mean
+# normalised per window (see kaldi_fbank). DIARIZATION_FBANK_WINDOW selects the frame
+# window the model was trained with: "povey" (Kaldi's default) or "hamming" (WeSpeaker recipes).
+# The MFCC fallback has not been validated on real meetings, and its labels end up in
+# the minutes prompts, so diarization is only on by default with an embedding model.
+DIARIZATION_EMBEDDING_MODEL = get_setting("DIARIZATION_EMBEDDING_MODEL", "")
+DIARIZATION_ENABLED = get_setting("DIARIZATION_ENABLED", bool(DIARIZATION_EMBEDDING_MODEL))
+DIARIZATION_THRESHOLD = get_setting("DIARIZATION_THRESHOLD", 0.5)
+DIARIZATION_MAX_SPEAKERS = get_setting("DIARIZATION_MAX_SPEAKERS", 8)
+DIARIZATION_WINDOW_SECONDS = get_setting("DIARIZATION_WINDOW_SECONDS", 1.5)
+DIARIZATION_HOP_SECONDS = get_setting("DIARIZATION_HOP_SECONDS", 0.75)
+DIARIZATION_WORKERS = get_setting("DIARIZATION_WORKERS", 2)
+DIARIZATION_FBANK_WINDOW = get_setting("DIARIZATION_FBANK_WINDOW", "povey")
+# Windows are first reduced to this many k-means centroids, which keeps the
+# agglomerative clustering cheap for recordings of several hours
+DIARIZATION_MAX_CENTROIDS = 128
+DIARIZATION_MIN_SIGNIFICANCE = 10
+# Cosine distance between speakers for the MFCC fallback, whose embeddings are far
+# less spread out. Experimental: only tuned on synthetic voices.
+DIARIZATION_MFCC_THRESHOLD = 0.005
+FBANK_FRAME = 400   # 25 ms
+FBANK_HOP = 160     # 10 ms
+FBANK_FFT = 512
+
+diarization_executor = ThreadPoolExecutor(max_workers=DIARIZATION_WORKERS, thread_name_prefix="diarize")
+diarization_stats = {"runs": 0, "failures": 0, "audio_seconds": 0.0, "seconds": 0.0, "speakers": 0}
+diarization_stats_lock = threading.Lock()
+embedding_session = None
+embedding_session_lock = threading.Lock()
+
+def get_embedding_session():
+    """ONNX Runtime session of the speaker embedding model (None: use MFCCs)"""
+    global embedding_session
+    if not DIARIZATION_EMBEDDING_MODEL:
+        return None
+    with embedding_session_lock:
+        if embedding_session is None:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = max(1, CPU_CORES // 4)
+            embedding_session = onnxruntime.InferenceSession(
+                DIARIZATION_EMBEDDING_MODEL, options, providers=["CPUExecutionProvider"]
+            )
+            print(f"  🗣️ Loaded speaker embedding model {os.path.basename(DIARIZATION_EMBEDDING_MODEL)}")
+        return embedding_session
+
+mel_filters_cache = {}
+
+def log_mel_frames(audio, n_mels):
+    """Log-mel filterbank energies of 25 ms frames every 10 ms, shape (frames, n_mels)"""
+    if len(audio) < FBANK_FRAME:
+        return np.zeros((0, n_mels), dtype=np.float32)
+    filters = mel_filters_cache.get(n_mels)
+    if filters is None:
+        filters = mel_filters_cache[n_mels] = FeatureExtractor.get_mel_filters(SAMPLE_RATE, FBANK_FFT, n_mels).T.astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FBANK_FRAME)[::FBANK_HOP] * np.hamming(FBANK_FRAME).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n=FBANK_FFT)) ** 2
+    return np.log(power @ filters + 1e-6).astype(np.float32)
+
+kaldi_fbank_cache = {}
+
+def get_kaldi_fbank_banks(n_mels):
+    """Kaldi's triangular mel filters on the HTK mel scale, shape (FBANK_FFT // 2, n_mels)"""
+    banks = kaldi_fbank_cache.get(n_mels)
+    if banks is None:
+        def mel(freq):
+            return 1127.0 * np.log(1.0 + freq / 700.0)
+        low, high = mel(20.0), mel(SAMPLE_RATE / 2)
+        delta = (high - low) / (n_mels + 1)
+        # Kaldi leaves out the Nyquist bin
+        bins = mel(np.arange(FBANK_FFT // 2) * SAMPLE_RATE / FBANK_FFT)[:, None]
+        left = low + np.arange(n_mels)[None, :] * delta
+        up = (bins - left) / delta
+        down = (left + 2 * delta - bins) / delta
+        banks = kaldi_fbank_cache[n_mels] = np.maximum(0.0, np.minimum(up, down)).astype(np.float32)
+    return banks
+
+def kaldi_fbank(audio, n_mels=80):
+    """Kaldi-compatible log mel filterbank (compute-fbank-feats without dither), shape (frames, n_mels)"""
+    if len(audio) < FBANK_FRAME:
+        return np.zeros((0, n_mels), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio * 32768.0, FBANK_FRAME)[::FBANK_HOP].astype(np.float32)
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    frames = np.concatenate([frames[:, :1] * (1 - 0.97), frames[:, 1:] - 0.97 * frames[:, :-1]], axis=1)
+    n = np.arange(FBANK_FRAME)
+    if DIARIZATION_FBANK_WINDOW == "hamming":
+        window = 0.54 - 0.46 * np.cos(2 * np.pi * n / (FBANK_FRAME - 1))
+    else:
+        window = (0.5 - 0.5 * np.cos(2 * np.pi * n / (FBANK_FRAME - 1))) ** 0.85
+    power = np.abs(np.fft.rfft(frames * window.astype(np.float32), n=FBANK_FFT)) ** 2
+    energies = power[:, :FBANK_FFT // 2] @ get_kaldi_fbank_banks(n_mels)
+    return np.log(np.maximum(energies, np.finfo(np.float32).eps)).astype(np.float32)
+
+def get_diarization_windows(audio):
+    """Speech windows as (start_sample, end_sample) pairs"""
+    options = VadOptions(threshold=0.5, min_silence_duration_ms=300, speech_pad_ms=100)
+    window = int(DIARIZATION_WINDOW_SECONDS * SAMPLE_RATE)
+    hop = int(DIARIZATION_HOP_SECONDS * SAMPLE_RATE)
+    windows = []
+    for region in get_speech_timestamps(audio, options):
+        start, end = region["start"], region["end"]
+        if end - start < window:
+            # Short utterances are one (shorter) window
+            if end - start >= window // 3:
+                windows.append((start, end))
+            continue
+        last = start
+        for position in range(start, end - window + 1, hop):
+            windows.append((position, position + window))
+            last = position + window
+        if end - last >= hop // 2:
+            windows.append((end - window, end))
+    return windows
+
+def embed_windows(audio, windows, batch_size=64):
+    """Speaker embeddings of the windows, shape (len(windows), dim)"""
+    session = get_embedding_session()
+    embeddings = []
+    if session is not None:
+        input_name = session.get_inputs()[0].name
+        for i in range(0, len(windows), batch_size):
+            batch = [kaldi_fbank(audio[start:end]) for start, end in windows[i:i + batch_size]]
+            frames = max(len(features) for features in batch)
+            padded = np.zeros((len(batch), frames, 80), dtype=np.float32)
+            for j, features in enumerate(batch):
+                # Per-window mean normalisation; short windows are padded by repetition
+                features = features - features.mean(axis=0)
+                padded[j] = np.resize(features, (frames, 80))
+            embeddings.append(session.run(None, {input_name: padded})[0].reshape(len(batch), -1))
+        embeddings = np.concatenate(embeddings)
+        # Length-normalised, so Euclidean distances follow cosine similarity
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-6)
+    
+    dct = np.cos(np.pi / 40 * (np.arange(40) + 0.5)[None, :] * np.arange(1, 21)[:, None]).astype(np.float32)
+    for start, end in windows:
+        mel = log_mel_frames(audio[start:end], 40)
+        # Voice colour of the louder (voiced) frames; c0, the loudness, is left out
+        energy = mel.mean(axis=1)
+        embeddings.append((mel[energy >= np.median(energy)] @ dct.T).mean(axis=0))
+    embeddings = np.array(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-6)
+
+def kmeans(points, k, iterations=15):
+    """k-means with k-means++ seeding. Returns a cluster label per point"""
+    rng = np.random.default_rng(0)
+    squared = (points ** 2).sum(axis=1)
+    centroids = [points[rng.integers(len(points))]]
+    distances = squared - 2 * points @ centroids[0] + (centroids[0] ** 2).sum()
+    for _ in range(1, k):
+        probabilities = np.maximum(distances, 0)
+        total = probabilities.sum()
+        index = rng.choice(len(points), p=probabilities / total) if total > 0 else rng.integers(len(points))
+        centroids.append(points[index])
+        distances = np.minimum(distances, squared - 2 * points @ points[index] + squared[index])
+    centroids = np.array(centroids)
+    for _ in range(iterations):
+        labels = np.argmin((centroids ** 2).sum(axis=1) - 2 * points @ centroids.T, axis=1)
+        for j in range(k):
+            members = points[labels == j]
+            if len(members):
+                centroids[j] = members.mean(axis=0)
+    return np.argmin((centroids ** 2).sum(axis=1) - 2 * points @ centroids.T, axis=1)
+
+def cluster_embeddings(embeddings):
+    """
+    Ward agglomerative clustering of length-normalised embeddings. Merging stops
+    when the closest clusters are both clearly apart (cosine distance between the
+    centroids above the threshold) and unlikely to be noise (merge cost of more
+    than DIARIZATION_MIN_SIGNIFICANCE windows' worth of variance); at most
+    DIARIZATION_MAX_SPEAKERS remain. Returns a label per embedding.
+    """
+    if get_embedding_session() is not None:
+        threshold = DIARIZATION_THRESHOLD
+    else:
+        threshold = DIARIZATION_MFCC_THRESHOLD
+    if len(embeddings) > DIARIZATION_MAX_CENTROIDS:
+        assignment = kmeans(embeddings, DIARIZATION_MAX_CENTROIDS)
+    else:
+        assignment = np.arange(len(embeddings))
+    clusters = np.unique(assignment)
+    sizes = np.array([np.sum(assignment == c) for c in clusters], dtype=np.float64)
+    centroids = np.array([embeddings[assignment == c].mean(axis=0) for c in clusters], dtype=np.float64)
+    # Variance per window, the scale of the merge costs
+    variance = max(float(((embeddings - embeddings.mean(axis=0)) ** 2).sum(axis=1).mean()), 1e-9)
+    
+    members = [[c] for c in clusters]
+    while len(members) > 1:
+        # Ward cost of merging i and j: the increase of the within-cluster sum of squares
+        distances = ((centroids[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        costs = np.outer(sizes, sizes) / (sizes[:, None] + sizes[None, :]) * distances
+        np.fill_diagonal(costs, np.inf)
+        i, j = sorted(np.unravel_index(np.argmin(costs), costs.shape))
+        norms = np.linalg.norm(centroids[i]) * np.linalg.norm(centroids[j])
+        cosine_distance = 1 - centroids[i] @ centroids[j] / max(norms, 1e-12)
+        if (cosine_distance > threshold and costs[i, j] / variance > DIARIZATION_MIN_SIGNIFICANCE
+                and len(members) <= DIARIZATION_MAX_SPEAKERS):
+            break
+        # Merge j into i
+        centroids[i] = (centroids[i] * sizes[i] + centroids[j] * sizes[j]) / (sizes[i] + sizes[j])
+        sizes[i] += sizes[j]
+        members[i].extend(members[j])
+        centroids = np.delete(centroids, j, axis=0)
+        sizes = np.delete(sizes, j)
+        del members[j]
+    
+    labels = np.zeros(len(embeddings), dtype=np.int64)
+    for label, group in enumerate(members):
+        labels[np.isin(assignment, group)] = label
+    return labels
+
+def diarize_audio(audio):
+    """Speaker turns of a recording as a list of (start, end, speaker) in seconds, speakers numbered by first appearance"""
+    start_time = time.time()
+    try:
+        windows = get_diarization_windows(audio)
+        if len(windows) < 2:
+            turns = [(start / SAMPLE_RATE, end / SAMPLE_RATE, 0) for start, end in windows]
+        else:
+            labels = cluster_embeddings(embed_windows(audio, windows))
+            # Smooth isolated window labels (mode of each window and its neighbours)
+            smoothed = labels.copy()
+            for i in range(1, len(labels) - 1):
+                if labels[i - 1] == labels[i + 1] != labels[i]:
+                    smoothed[i] = labels[i - 1]
+            
+            turns = []
+            order = {}
+            for (start, end), label in zip(windows, smoothed):
+                speaker = order.setdefault(int(label), len(order))
+                start, end = start / SAMPLE_RATE, end / SAMPLE_RATE
+                if turns and turns[-1][2] == speaker and start <= turns[-1][1] + DIARIZATION_HOP_SECONDS:
+                    turns[-1] = (turns[-1][0], max(turns[-1][1], end), speaker)
+                else:
+                    if turns and start < turns[-1][1]:
+                        # Overlapping windows of different speakers: split the overlap
+                        middle = (start + turns[-1][1]) / 2
+                        turns[-1] = (turns[-1][0], middle, turns[-1][2])
+                        start = middle
+                    turns.append((start, end, speaker))
+    except Exception:
+        with diarization_stats_lock:
+            diarization_stats["failures"] += 1
+        raise
+    
+    with diarization_stats_lock:
+        diarization_stats["runs"] += 1
+        diarization_stats["audio_seconds"] += len(audio) / SAMPLE_RATE
+        diarization_stats["seconds"] += time.time() - start_time
+        diarization_stats["speakers"] += len({speaker for _, _, speaker in turns})
+    print(f"  🗣️ Diarization: {len({speaker for _, _, speaker in turns})} speaker(s) in {time.time() - start_time:.1f}s")
+    return turns
+
+def assign_speakers(segments, turns):
+    """Tag each segment (in place) with the speaker of the turns overlapping it most"""
+    if not turns:
+        return segments
+    turn_starts = [turn[0] for turn in turns]
+    for seg in segments:
+        overlap = {}
+        i = max(bisect.bisect_right(turn_starts, seg['start']) - 1, 0)
+        while i < len(turns) and turns[i][0] < seg['end']:
+            start, end, speaker = turns[i]
+            amount = min(end, seg['end']) - max(start, seg['start'])
+            if amount > 0:
+                overlap[speaker] = overlap.get(speaker, 0) + amount
+            i += 1
+        if overlap:
+            seg['speaker'] = max(overlap, key=overlap.get)
+        else:
+            # No speech detected under the segment: use the nearest turn
+            i = bisect.bisect_left(turn_starts, seg['start'])
+            candidates = [turns[j] for j in (i - 1, i) if 0 <= j < len(turns)]
+            nearest = min(candidates, key=lambda turn: min(abs(turn[0] - seg['end']), abs(turn[1] - seg['start'])))
+            seg['speaker'] = nearest[2]
+    return segments
+
+def get_speaker_ranges(segments):
+    """Per-speaker talk time and time ranges (consecutive segments merged), for the session metadata"""
+    speakers = {}
+    for seg in segments:
+        speaker = seg.get('speaker')
+        if speaker is None:
+            continue
+        entry = speakers.setdefault(speaker, {"id": speaker, "label": f"Speaker {speaker + 1}", "seconds": 0.0, "ranges": []})
+        entry["seconds"] += seg['end'] - seg['start']
+        ranges = entry["ranges"]
+        if ranges and ranges[-1][2] == seg['id'] - 1:
+            ranges[-1][1] = seg['end']
+            ranges[-1][2] = seg['id']
+        else:
+            ranges.append([seg['start'], seg['end'], seg['id']])
+    for entry in speakers.values():
+        entry["seconds"] = round(entry["seconds"], 2)
+        entry["ranges"] = [[round(start, 2), round(end, 2)] for start, end, _ in entry["ranges"]]
+    return [speakers[speaker] for speaker in sorted(speakers)]
+
+def get_diarization_turns(diarization):
+    """Wait for a diarization submitted to diarization_executor; None if it failed"""
+    try:
+        return diarization.result()
+    except Exception as e:
+        print(f"  ⚠️ Diarization failed, segments are left without speakers: {e}")
+        return None
+
+def get_diarization_stats():
+    """Diarization runs and their speed"""
+    with diarization_stats_lock:
+        runs = diarization_stats["runs"]
+        return {
+            "enabled": DIARIZATION_ENABLED,
+            "embedding_model": os.path.basename(DIARIZATION_EMBEDDING_MODEL) if DIARIZATION_EMBEDDING_MODEL else "mfcc",
+            "runs": runs,
+            "failures": diarization_stats["failures"],
+            "audio_seconds": round(diarization_stats["audio_seconds"], 1),
+            "x_realtime": round(diarization_stats["audio_seconds"] / diarization_stats["seconds"], 1) if diarization_stats["seconds"] else None,
+            "avg_speakers": round(diarization_stats["speakers"] / runs, 2) if runs else None
+        }
+
+# Long-file mode: recordings of at least LONG_FILE_MIN_SECONDS are split at
+# silences into ~LONG_FILE_CHUNK_SECONDS chunks that are transcribed in a process
+# pool. Every worker process loads and keeps its own Whisper model.
+LONG_FILE_MIN_SECONDS = get_setting("LONG_FILE_MIN_SECONDS", 1800)
+LONG_FILE_CHUNK_SECONDS = get_setting("LONG_FILE_CHUNK_SECONDS", 600)
+LONG_FILE_WORKERS = get_setting("LONG_FILE_WORKERS", max(1, CPU_CORES // 4))
+
+long_file_pools = {}
+long_file_pools_lock = threading.Lock()
+long_file_worker_model = None
+
+def find_silence_splits(audio, chunk_seconds, search_seconds=30, frame_seconds=0.1):
+    """Sample offsets to split audio at, each at the quietest point within +-search_seconds of a chunk boundary"""
+    frame_size = int(SAMPLE_RATE * frame_seconds)
+    frame_count = len(audio) // frame_size
+    if frame_count == 0:
+        return []
+    
+    # RMS energy per frame, smoothed over ~0.5s so we land inside a pause rather than on a single quiet frame
+    frames = audio[:frame_count * frame_size].reshape(frame_count, frame_size)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    energy = np.convolve(energy, np.ones(5) / 5, mode="same")
+    
+    search_seconds = min(search_seconds, chunk_seconds / 4)
+    total_seconds = len(audio) / SAMPLE_RATE
+    splits = []
+    target = chunk_seconds
+    while target < total_seconds - search_seconds:
+        low = max(int((target - search_seconds) / frame_seconds), 0)
+        high = min(int((target + search_seconds) / frame_seconds), frame_count)
+        quietest = low + int(np.argmin(energy[low:high]))
+        split = quietest * frame_size + frame_size // 2
+        splits.append(split)
+        target = split / SAMPLE_RATE + chunk_seconds
+    return splits
+
+def init_long_file_worker(model_size, device, compute_type, cpu_threads):
+    """Process pool initializer: load this worker's own Whisper model"""
+    global long_file_worker_model
+    long_file_worker_model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+def transcribe_long_file_chunk(audio_chunk, offset_seconds):
+    """
+    Transcribe one chunk in a worker process; timestamps are shifted back to the
+    full recording. Returns (segments, seconds skipped by the VAD).
+    """
+    segments, info = long_file_worker_model.transcribe(audio_chunk, **get_transcribe_options())
+    return (
+        [build_segment_data(None, segment, offset=offset_seconds) for segment in segments],
+        get_vad_skipped_seconds(info)
+    )
+
+def get_long_file_pool(model_size, device, compute_type):
+    """Process pool for long files, kept alive between jobs so workers keep their models loaded"""
+    key = (model_size, device, compute_type)
+    with long_file_pools_lock:
+        pool = long_file_pools.get(key)
+        if pool is None:
+            # Spawn rather than fork: the parent runs Flask and worker threads
+            pool = ProcessPoolExecutor(
+                max_workers=LONG_FILE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_long_file_worker,
+                initargs=(model_size, device, compute_type, max(1, CPU_CORES // LONG_FILE_WORKERS))
+            )
+            long_file_pools[key] = pool
+        return pool
+
+def transcribe_long_file(audio, model_size, device, compute_type, stats=None):
+    """
+    Split audio at silences, transcribe the chunks in parallel and yield segments
+    in timeline order. Seconds skipped by the VAD are added to stats["vad_skipped_seconds"].
+    """
+    bounds = [0] + find_silence_splits(audio, LONG_FILE_CHUNK_SECONDS) + [len(audio)]
+    print(f"  ✂️ Long-file mode: {len(bounds) - 1} chunks across {LONG_FILE_WORKERS} worker processes")
+    
+    pool = get_long_file_pool(model_size, device, compute_type)
+    futures = [
+        pool.submit(transcribe_long_file_chunk, audio[start:end], start / SAMPLE_RATE)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+    try:
+        for future in futures:
+            segments, skipped_seconds = future.result()
+            if stats is not None:
+                stats["vad_skipped_seconds"] = stats.get("vad_skipped_seconds", 0.0) + skipped_seconds
+            for segment in segments:
+                yield segment
+    except BrokenProcessPool:
+        # A worker died (e.g. the model failed to load); start a fresh pool next time
+        with long_file_pools_lock:
+            if long_file_pools.get((model_size, device, compute_type)) is pool:
+                del long_file_pools[(model_size, device, compute_type)]
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+def get_session_log_path(session_id):
+    """Path of the append-only segment log written while a session is transcribing"""
+    return os.path.join(SESSION_FOLDER, f"{session_id}.partial.jsonl")
+
+def read_session_log(log_path):
+    """Read a session log: the first line holds session metadata, every other line one segment"""
+    with open(log_path, "r", encoding="utf-8") as f:
+        metadata = json.loads(f.readline())
+        segments = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                segments.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The writer may be halfway through the last line
+                break
+    return metadata, segments
+
+# Storage layer. Every session, summary and side file is written to a temporary
+# file in the same folder and renamed over the target, so a reader (e.g. a client
+# polling /api/summary) never sees a half-written file. JSON is written compactly,
+# with orjson when it is installed. Read-modify-write updates of a session's files
+# hold that session's lock, which is shared by the worker processes of a multi-process
+# deployment (flock on a file in LOCK_FOLDER; in-process only where fcntl is missing).
+# With SUMMARY_GZIP, summaries and contexts are stored gzip-compressed (readers
+# detect compressed files, so the setting can change).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_FOLDER = os.path.join(CACHE_FOLDER, "locks")
+os.makedirs(LOCK_FOLDER, exist_ok=True)
+
+SUMMARY_GZIP = get_setting("SUMMARY_GZIP", False)
+GZIP_MAGIC = b"\x1f\x8b"
+
+class FileLock:
+    """Lock shared by the threads of this process and by other processes (flock on a lock file)"""
+    
+    def __init__(self, path, reentrant=False):
+        self.path = path
+        self.lock = threading.RLock() if reentrant else threading.Lock()
+        self.depth = 0
+        self.file = None
+    
+    def acquire(self, blocking=True):
+        if not self.lock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            lock_file = open(self.path, "a+b")
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    lock_file.close()
+                    self.lock.release()
+                    return False
+            self.file = lock_file
+        self.depth += 1
+        return True
+    
+    def release(self):
+        """Release the lock (a non-reentrant one may be released by another thread)"""
+        self.depth -= 1
+        if self.depth == 0:
+            # Closing the file drops the flock
+            self.file.close()
+            self.file = None
+        self.lock.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+
+session_locks = {}
+session_locks_lock = threading.Lock()
+
+def get_session_lock(session_id, purpose="files"):
+    """
+    Cross-process lock for one session. "files" (reentrant) serialises writes to the
+    session's files; other purposes are separate, non-reentrant locks.
+    """
+    with session_locks_lock:
+        lock = session_locks.get((session_id, purpose))
+        if lock is None:
+            path = os.path.join(LOCK_FOLDER, f"{session_id}.{purpose}.lock")
+            lock = session_locks[(session_id, purpose)] = FileLock(path, reentrant=purpose == "files")
+        return lock
+
+def dumps_json(data):
+    """Compact JSON as UTF-8 bytes"""
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def loads_json(raw):
+    """Parse JSON bytes (gzip-compressed or not)"""
+    if raw[:2] == GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# The process umask (os.umask can only be read by setting it, so once at import)
+FILE_UMASK = os.umask(0o022)
+os.umask(FILE_UMASK)
+
+@contextmanager
+def atomic_write(path):
+    """Binary file handle whose content replaces path only once the block completes"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file with mode 0600: make it readable like other written files
+        os.chmod(temp_path, 0o644 & ~FILE_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_json_file(path, data, compress=False):
+    """Atomically write data as compact (optionally gzip-compressed) JSON"""
+    raw = dumps_json(data)
+    if compress:
+        raw = gzip.compress(raw, compresslevel=5)
+    with atomic_write(path) as f:
+        f.write(raw)
+
+def read_json_file(path):
+    """Read a JSON file written by write_json_file (or any plain JSON file)"""
+    with open(path, "rb") as f:
+        return loads_json(f.read())
+
+def get_summary_path(session_id):
+    return os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
+
+def write_summary(session_id, summary_data):
+    """Save a session's summary and index its notes for search"""
+    with get_session_lock(session_id):
+        write_json_file(get_summary_path(session_id), summary_data, compress=SUMMARY_GZIP)
+        index_session_summary(session_id, summary_data)
+
+def write_session_file(session_path, metadata, segments, words_path=None, index_path=None):
+    """
+    Write a session JSON with the metadata first and one segment per line,
+    streaming segments from any iterable. With words_path, word timestamps are
+    moved into a columnar sidecar (see WordColumnsBuilder); with index_path, an
+    offset index of the segment lines is written (see SegmentIndexBuilder).
+    Returns the number of segments written.
+    """
+    columns = WordColumnsBuilder() if words_path else None
+    index = SegmentIndexBuilder() if index_path else None
+    count = 0
+    with atomic_write(session_path) as out:
+        out.write(b"{\n")
+        for key, value in metadata.items():
+            out.write(b"  " + dumps_json(key) + b": " + dumps_json(value) + b",\n")
+        out.write(b'  "segments": [')
+        for segment in segments:
+            if columns:
+                columns.add(segment.pop("words", []))
+            line = dumps_json(segment)
+            out.write(b"\n    " if count == 0 else b",\n    ")
+            if index:
+                index.add(segment, out.tell(), len(line))
+            out.write(line)
+            count += 1
+        out.write(b"\n  ]\n}\n")
+        # Sidecars first: once the session JSON is in place, they are too
+        if columns:
+            columns.save(words_path)
+        if index:
+            index.save(index_path)
+    return count
+
+def write_session_from_log(session_path, metadata, log_path, words_path=None, index_path=None, speakers=None):
+    """
+    Write the final session JSON, streaming segments from the log instead of
+    holding them in memory. speakers maps segment ids to speaker ids.
+    """
+    def logged_segments():
+        with open(log_path, "r", encoding="utf-8") as log:
+            log.readline()  # Skip the metadata line
+            for line in log:
+                line = line.strip()
+                if line:
+                    segment = json.loads(line)
+                    if speakers and segment["id"] in speakers:
+                        segment["speaker"] = speakers[segment["id"]]
+                    yield segment
+    
+    return write_session_file(session_path, metadata, logged_segments(), words_path, index_path)
+
+def read_session_metadata(session_path):
+    """Read the metadata of a session JSON written by write_session_file without parsing its segments"""
+    fields = []
+    with open(session_path, "r", encoding="utf-8") as f:
+        f.readline()  # Opening brace
+        for line in f:
+            if line.startswith('  "segments":'):
+                break
+            fields.append(line.strip().rstrip(","))
+    return json.loads("{" + ",".join(fields) + "}")
+
+# Columnar sidecars are small .npz files of numpy arrays; the most recently used
+# ones are kept in memory so range requests do not reload them every time.
+COLUMNS_CACHE_SIZE = 16
+
+columns_cache = OrderedDict()
+columns_cache_lock = threading.Lock()
+
+def load_columns(path):
+    """Load the arrays of an .npz sidecar, reusing the cached copy while the file is unchanged"""
+    mtime = os.path.getmtime(path)
+    with columns_cache_lock:
+        cached = columns_cache.get(path)
+        if cached and cached[0] == mtime:
+            columns_cache.move_to_end(path)
+            return cached[1]
+    
+    with np.load(path) as data:
+        columns = {name: data[name] for name in data.files}
+    
+    with columns_cache_lock:
+        columns_cache[path] = (mtime, columns)
+        while len(columns_cache) > COLUMNS_CACHE_SIZE:
+            columns_cache.popitem(last=False)
+    return columns
+
+def save_columns(path, **arrays):
+    """Write arrays to an .npz sidecar (uncompressed, so loading is a plain read)"""
+    temp_path = f"{path}.tmp.npz"
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, path)
+
+# Word-level timestamps are stored column-wise next to the session JSON in
+# sessions/<id>.words.npz: float32 start/end arrays, the words as one UTF-8 blob
+# with int32 offsets (the string table), and int32 segment_offsets so the words of
+# segment i are words[segment_offsets[i]:segment_offsets[i + 1]].
+def get_session_words_path(session_id):
+    """Path of the columnar word timestamp sidecar of a session"""
+    return os.path.join(SESSION_FOLDER, f"{session_id}.words.npz")
+
+class WordColumnsBuilder:
+    """Accumulates word dicts segment by segment and writes them as columns"""
+    
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.text = bytearray()
+        self.word_offsets = [0]
+        self.segment_offsets = [0]
+    
+    def add(self, words):
+        """Append the words of the next segment"""
+        for word in words:
+            self.starts.append(word["start"])
+            self.ends.append(word["end"])
+            self.text += word["word"].encode("utf-8")
+            self.word_offsets.append(len(self.text))
+        self.segment_offsets.append(len(self.starts))
+    
+    def save(self, path):
+        save_columns(
+            path,
+            start=np.array(self.starts, dtype=np.float32),
+            end=np.array(self.ends, dtype=np.float32),
+            text=np.frombuffer(bytes(self.text), dtype=np.uint8),
+            word_offsets=np.array(self.word_offsets, dtype=np.int32),
+            segment_offsets=np.array(self.segment_offsets, dtype=np.int32)
+        )
+
+def get_words_in_range(session_id, start=None, end=None):
+    """Words overlapping [start, end] (seconds) as [{segment_id, start, end, word}, ...]"""
+    columns = load_columns(get_session_words_path(session_id))
+    mask = np.ones(len(columns["start"]), dtype=bool)
+    if start is not None:
+        mask &= columns["end"] >= start
+    if end is not None:
+        mask &= columns["start"] <= end
+    indices = np.nonzero(mask)[0]
+    
+    segment_ids = np.searchsorted(columns["segment_offsets"], indices, side="right") - 1
+    text, offsets = columns["text"].tobytes(), columns["word_offsets"]
+    return [
+        {
+            "segment_id": int(segment_id),
+            "start": round(float(columns["start"][i]), 2),
+            "end": round(float(columns["end"][i]), 2),
+            "word": text[offsets[i]:offsets[i + 1]].decode("utf-8")
+        }
+        for i, segment_id in zip(indices.tolist(), segment_ids.tolist())
+    ]
+
+# Segment offset index in sessions/<id>.segments.npz: float32 start/end and the
+# int64 byte offset/length of every segment line in the session JSON, so a page
+# or time window of segments is served with a single seek + read.
+def get_segment_index_path(session_id):
+    """Path of the segment offset index of a session"""
+    return os.path.join(SESSION_FOLDER, f"{session_id}.segments.npz")
+
+class SegmentIndexBuilder:
+    """Collects the time range and file position of each segment line"""
+    
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.offsets = []
+        self.lengths = []
+        self.speakers = []
+    
+    def add(self, segment, offset, length):
+        self.starts.append(segment["start"])
+        self.ends.append(segment["end"])
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.speakers.append(segment.get("speaker", -1))
+    
+    def save(self, path):
+        save_columns(
+            path,
+            start=np.array(self.starts, dtype=np.float32),
+            end=np.array(self.ends, dtype=np.float32),
+            offset=np.array(self.offsets, dtype=np.int64),
+            length=np.array(self.lengths, dtype=np.int64),
+            speaker=np.array(self.speakers, dtype=np.int16)
+        )
+
+def read_indexed_segments(session_id, first, last):
+    """Read segments first..last-1 of a session with one contiguous read"""
+    if last <= first:
+        return []
+    index = load_columns(get_segment_index_path(session_id))
+    offsets, lengths = index["offset"], index["length"]
+    base = int(offsets[first])
+    with open(os.path.join(SESSION_FOLDER, f"{session_id}.json"), "rb") as f:
+        f.seek(base)
+        data = f.read(int(offsets[last - 1] + lengths[last - 1]) - base)
+    return [
+        loads_json(data[int(offsets[i]) - base:int(offsets[i] + lengths[i]) - base])
+        for i in range(first, last)
+    ]
+
+def get_session_segments(session_id, start=None, end=None, offset=0, limit=None, speaker=None):
+    """
+    Segments of a session by time window ([start, end] seconds) and/or position
+    (offset, limit), optionally only those of one speaker. Falls back to the live
+    segment log while transcribing. Returns (total, first_index, segments, partial).
+    """
+    index_path = get_segment_index_path(session_id)
+    if os.path.exists(index_path):
+        index = load_columns(index_path)
+        starts, ends = index["start"], index["end"]
+        # Indexes written before diarization have no speaker column
+        speakers = index.get("speaker")
+        partial = False
+    else:
+        metadata, logged = read_session_log(get_session_log_path(session_id))
+        starts = np.array([seg["start"] for seg in logged], dtype=np.float32)
+        ends = np.array([seg["end"] for seg in logged], dtype=np.float32)
+        speakers = np.array([seg.get("speaker", -1) for seg in logged], dtype=np.int16)
+        partial = True
+    
+    total = len(starts)
+    # Segments are in timeline order, so a time window is a contiguous slice
+    first = int(np.searchsorted(ends, start, side="left")) if start is not None else 0
+    last = int(np.searchsorted(starts, end, side="right")) if end is not None else total
+    
+    if speaker is not None:
+        # Positions are counted among the speaker's segments in the window
+        matches = np.flatnonzero(speakers[first:last] == speaker) + first if speakers is not None else np.array([], dtype=np.int64)
+        selected = matches[offset:offset + limit if limit is not None else None]
+        if partial:
+            segments = [logged[i] for i in selected]
+        else:
+            # One contiguous read per run of consecutive segments
+            runs = np.split(selected, np.flatnonzero(np.diff(selected) != 1) + 1) if len(selected) else []
+            segments = [seg for run in runs for seg in read_indexed_segments(session_id, int(run[0]), int(run[-1]) + 1)]
+        return len(matches), min(offset, len(matches)), segments, partial
+    
+    first = min(first + offset, total)
+    if limit is not None:
+        last = min(last, first + limit)
+    last = max(last, first)
+    
+    if partial:
+        segments = logged[first:last]
+    else:
+        segments = read_indexed_segments(session_id, first, last)
+    return total, first, segments, partial
+
+def migrate_session_storage(session_id):
+    """
+    Rewrite a session JSON from before the columnar storage: words go to the
+    .words.npz sidecar and the segment offset index is built. Returns True if migrated.
+    """
+    session_path = os.path.join(SESSION_FOLDER, f"{session_id}.json")
+    index_path = get_segment_index_path(session_id)
+    with get_session_lock(session_id):
+        if os.path.exists(index_path):
+            return False
+        data = read_json_file(session_path)
+        segments = data.pop("segments", [])
+        has_words = any("words" in segment for segment in segments)
+        words_path = get_session_words_path(session_id)
+        write_session_file(
+            session_path, data, segments,
+            words_path=words_path if has_words or not os.path.exists(words_path) else None,
+            index_path=index_path
+        )
+        return True
+
+def migrate_session_storage_all():
+    """One-off migration of every session without columnar storage"""
+    migrated = 0
+    for filename in os.listdir(SESSION_FOLDER):
+        if not is_session_file(filename):
+            continue
+        try:
+            if migrate_session_storage(filename[:-len(".json")]):
+                migrated += 1
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  ⚠️ Could not migrate session {filename}: {e}")
+    if migrated:
+        print(f"  🗜️ Moved {migrated} session(s) to columnar word storage with a segment index")
+
+def write_segments_to_log(session_id, log_path, metadata, duration, segments, on_segment=None):
+    """
+    Append each segment to the session log as soon as it is available, so
+    /session/<id> can show the partial transcript, and report progress from the
+    decoded position in the audio. on_segment is called with each segment
+    (without words). Returns (text_parts, stripped_segments).
+    """
+    stripped_segments = []
+    text_parts = []
+    
+    with open(log_path, "w", encoding="utf-8") as log:
+        log.write(json.dumps({**metadata, "duration": round(duration, 2)}) + "\n")
+        log.flush()
+        
+        for i, segment_entry in enumerate(segments):
+            # Segment ids are continuous across the whole recording
+            segment_entry["id"] = i
+            log.write(json.dumps(segment_entry) + "\n")
+            log.flush()
+            
+            text_parts.append(segment_entry["text"])
+            stripped_segments.append(strip_words_from_segments([segment_entry])[0])
+            if on_segment:
+                on_segment(stripped_segments[-1])
+            
+            fraction = min(segment_entry["end"] / duration, 1.0) if duration else 0
+            processing_status[session_id] = {
+                "status": "transcribing",
+                "progress": 30 + int(fraction * 40),
+                "transcribed_seconds": segment_entry["end"],
+                "duration": round(duration, 2)
+            }
+    
+    return text_parts, stripped_segments
+
+def finish_transcription(session_id, filename, metadata, duration, vad_skipped_seconds, text_parts, stripped_segments, cache_key, summarizer=None, diarization=None):
+    """Turn the segment log into the session file, catalog it and generate the summary"""
+    log_path = get_session_log_path(session_id)
+    
+    if VAD_FILTER:
+        record_vad_skip(duration, vad_skipped_seconds)
+        print(f"  🔇 VAD skipped {vad_skipped_seconds:.0f}s of {duration:.0f}s without speech")
+    
+    processing_status[session_id] = {"status": "saving", "progress": 75}
+    
+    full_text = " ".join(text_parts)
+    metadata = {**metadata, "vad_skipped_seconds": round(vad_skipped_seconds, 2)}
+    
+    # Tag the segments with the speakers found by the diarization
+    speakers = None
+    turns = get_diarization_turns(diarization) if diarization else None
+    if turns:
+        assign_speakers(stripped_segments, turns)
+        speakers = {seg['id']: seg['speaker'] for seg in stripped_segments}
+        metadata["speakers"] = get_speaker_ranges(stripped_segments)
+    
+    # Save session file
+    with get_session_lock(session_id):
+        write_session_from_log(
+            os.path.join(SESSION_FOLDER, f"{session_id}.json"),
+            {**metadata, "text": full_text},
+            log_path,
+            words_path=get_session_words_path(session_id),
+            index_path=get_segment_index_path(session_id),
+            speakers=speakers
+        )
+    os.remove(log_path)
+    catalog_session(session_id, filename, duration=round(duration, 2), segment_count=len(stripped_segments))
+    index_session_segments(session_id, stripped_segments)
+    
+    if cache_key:
+        store_cached_transcript(cache_key, session_id)
+    
+    processing_status[session_id] = {"status": "generating_summary", "progress": 80}
+    
+    # Generate summary with Gemini if API keys are available
+    if summarizer:
+        meeting_type, sections = summarizer.finish()
+        generate_summary(session_id, full_text, stripped_segments, meeting_type=meeting_type, sections=sections)
+    elif GEMINI_API_KEYS:
+        generate_summary(session_id, full_text, stripped_segments)
+    
+    processing_status[session_id] = {"status": "complete", "progress": 100}
+
+def release_transcription(session_id, temp_path, cache_key, error=None):
+    """Clean up after a transcription job (successful or not) and record its final job state"""
+    if error is not None:
+        processing_status[session_id] = {"status": "error", "progress": 0, "error": str(error)}
+        log_path = get_session_log_path(session_id)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+    if cache_key:
+        with transcript_cache_lock:
+            if inflight_transcriptions.get(cache_key) == session_id:
+                del inflight_transcriptions[cache_key]
+    processing_status.set_job_state(session_id, "failed" if error is not None else "done")
+
+def process_transcription(session_id, audio_path, filename, model_size, device, compute_type, audio_hash=None):
     """Background task to process transcription with progress updates"""
+    log_path = get_session_log_path(session_id)
+    temp_path = None
+    cache_key = get_transcript_cache_key(audio_hash, model_size, compute_type) if audio_hash else None
+    error = None
+    deferred = False
+    summarizer = None
+    diarization = None
     try:
         processing_status[session_id] = {"status": "converting", "progress": 10}
         
-        # Convert to WAV
-        wav_path = os.path.join(tempfile.gettempdir(), f"{session_id}.wav")
-        convert_to_wav(audio_path, wav_path)
+        # Decode to 16kHz mono PCM (in-process by default, temp WAV as fallback)
+        audio, temp_path = load_audio(audio_path, session_id)
+        schedule_audio_rendition(audio_hash, audio, audio_path)
         
         processing_status[session_id] = {"status": "loading_model", "progress": 20}
         
-        # Load model
-        model = WhisperModel(model_size, device=device, compute_type=compute_type)
-        
-        processing_status[session_id] = {"status": "transcribing", "progress": 30}
-        
-        # Transcribe
-        segments, info = model.transcribe(wav_path, word_timestamps=True)
-        
-        # Build segment data
-        segment_data = []
-        full_text = ""
-        segment_list = list(segments)
-        total_segments = len(segment_list)
-        
-        for i, segment in enumerate(segment_list):
-            text = segment.text.strip()
-            full_text += text + " "
-            segment_data.append({
-                "id": i,
-                "start": round(segment.start, 2),
-                "end": round(segment.end, 2),
-                "text": text,
-                "words": [
-                    {
-                        "start": round(w.start, 2),
-                        "end": round(w.end, 2),
-                        "word": w.word.strip()
-                    } for w in segment.words or []
-                ]
-            })
-            # Update progress
-            progress = 30 + int((i / total_segments) * 40)
-            processing_status[session_id] = {"status": "transcribing", "progress": progress}
-        
-        processing_status[session_id] = {"status": "saving", "progress": 75}
-        
-        result = {
+        metadata = {
             "session_id": session_id,
             "name": filename,
-            "audio_url": f"/uploads/{filename}",
-            "text": full_text.strip(),
-            "segments": segment_data
+            "audio_url": f"/media/{os.path.basename(audio_path)}"
         }
+        if audio_hash:
+            metadata["audio_hash"] = audio_hash
         
-        # Save session file
-        with open(os.path.join(SESSION_FOLDER, f"{session_id}.json"), "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2)
+        # Short clips are handed to the batcher, which transcribes many of them in one
+        # batched pass and finishes the job; this worker moves on to the next job
+        if (BATCH_SHORT_JOBS and isinstance(audio, np.ndarray)
+                and len(audio) / SAMPLE_RATE <= BATCH_MAX_CLIP_SECONDS):
+            processing_status[session_id] = {"status": "transcribing", "progress": 30}
+            short_job_batcher.submit(SimpleNamespace(
+                session_id=session_id, audio=audio, duration=len(audio) / SAMPLE_RATE,
+                filename=filename, metadata=metadata, model_key=(model_size, device, compute_type), cache_key=cache_key, temp_path=temp_path
+            ))
+            deferred = True
+            return
         
-        processing_status[session_id] = {"status": "generating_summary", "progress": 80}
+        transcribe_start = time.time()
         
-        # Generate summary with Gemini if API keys are available
-        if GEMINI_API_KEYS:
-            # Strip word-level data to save tokens and avoid massive payloads
-            stripped_segments = strip_words_from_segments(segment_data)
-            generate_summary(session_id, full_text, stripped_segments)
+        # Diarize the same PCM in the background while Whisper transcribes it
+        if DIARIZATION_ENABLED and isinstance(audio, np.ndarray):
+            diarization = diarization_executor.submit(diarize_audio, audio)
         
-        processing_status[session_id] = {"status": "complete", "progress": 100}
+        # Summarize finished chunks while the rest is still being transcribed
+        if GEMINI_API_KEYS and INCREMENTAL_SUMMARY:
+            summarizer = IncrementalSummarizer(session_id, diarization=diarization)
+        on_segment = summarizer.add_segment if summarizer else None
         
-        # Cleanup
-        if os.path.exists(wav_path):
-            os.remove(wav_path)
-            
+        # Long recordings are split at silences and transcribed in parallel processes
+        if (isinstance(audio, np.ndarray) and LONG_FILE_WORKERS > 1
+                and len(audio) / SAMPLE_RATE >= LONG_FILE_MIN_SECONDS):
+            processing_status[session_id] = {"status": "transcribing", "progress": 30}
+            duration = len(audio) / SAMPLE_RATE
+            long_file_stats = {}
+            text_parts, stripped_segments = write_segments_to_log(
+                session_id, log_path, metadata, duration,
+                transcribe_long_file(audio, model_size, device, compute_type, stats=long_file_stats),
+                on_segment=on_segment
+            )
+            vad_skipped_seconds = long_file_stats.get("vad_skipped_seconds", 0.0)
+        else:
+            # Borrow a shared model from the pool (loaded on first use only)
+            with pooled_whisper_model(model_size, device, compute_type) as model:
+                processing_status[session_id] = {"status": "transcribing", "progress": 30}
+                
+                # Transcribe lazily: the generator is consumed segment by segment
+                # (the VAD pass runs up front, so the skipped duration is known immediately)
+                segments, info = model.transcribe(audio, **get_transcribe_options())
+                duration = info.duration or 0
+                vad_skipped_seconds = get_vad_skipped_seconds(info)
+                text_parts, stripped_segments = write_segments_to_log(
+                    session_id, log_path, metadata, duration,
+                    (build_segment_data(None, segment) for segment in segments),
+                    on_segment=on_segment
+                )
+        
+        # Release the decoded PCM before the (long) summary stage
+        audio = None
+        record_transcription_speed(model_size, duration, time.time() - transcribe_start)
+        
+        finish_transcription(
+            session_id, filename, metadata, duration, vad_skipped_seconds,
+            text_parts, stripped_segments, cache_key, summarizer=summarizer, diarization=diarization
+        )
     except Exception as e:
-        processing_status[session_id] = {"status": "error", "progress": 0, "error": str(e)}
+        error = e
+        if summarizer:
+            summarizer.cancel()
+        if diarization:
+            diarization.cancel()
+    finally:
+        if not deferred:
+            release_transcription(session_id, temp_path, cache_key, error)
+
+# Batched mode for short clips (voicemail-style uploads): instead of one
+# transcribe call per job, decoded clips of at most BATCH_MAX_CLIP_SECONDS are
+# collected for up to BATCH_WINDOW_SECONDS (or BATCH_MAX_CLIPS clips) and run
+# through faster-whisper's BatchedInferencePipeline on one shared model.
+# The clips are concatenated with a short silence between them, and their speech
+# regions are passed as clip_timestamps so the pipeline batches them like chunks of
+# one recording. Segments are then mapped back to their clip. Note that the
+# pipeline detects the language once per batch (from the first clip).
+BATCH_SHORT_JOBS = get_setting("BATCH_SHORT_JOBS", True)
+BATCH_MAX_CLIP_SECONDS = get_setting("BATCH_MAX_CLIP_SECONDS", 120)
+BATCH_WINDOW_SECONDS = get_setting("BATCH_WINDOW_SECONDS", 2.0)
+BATCH_MAX_CLIPS = get_setting("BATCH_MAX_CLIPS", 64)
+BATCH_SIZE = get_setting("BATCH_SIZE", 16)
+BATCH_CHUNK_SECONDS = 30  # Whisper's input window; clip_timestamps must not exceed it
+# Clips handed to the batcher and not finished yet (decoded PCM is held until their
+# batch has run). Beyond this, transcription workers wait, so uploads stay bounded
+# by the job queue (TRANSCRIPTION_QUEUE_SIZE) instead of piling up in memory.
+BATCH_MAX_IN_FLIGHT = BATCH_MAX_CLIPS * 2
+
+def get_clip_regions(clip):
+    """Sample ranges of a clip to transcribe: its speech (with the VAD) or the whole clip, in <=30s pieces"""
+    if VAD_FILTER:
+        vad_options = VadOptions(
+            threshold=VAD_THRESHOLD,
+            min_silence_duration_ms=VAD_MIN_SILENCE_MS,
+            speech_pad_ms=VAD_SPEECH_PAD_MS,
+            max_speech_duration_s=BATCH_CHUNK_SECONDS
+        )
+        speech = get_speech_timestamps(clip, vad_options)
+        return [{"start": region["start"], "end": region["end"]} for region in merge_segments(speech, vad_options)]
+    
+    piece = BATCH_CHUNK_SECONDS * SAMPLE_RATE
+    return [{"start": start, "end": min(start + piece, len(clip))} for start in range(0, len(clip), piece)]
+
+def transcribe_clips(pipeline, clips):
+    """
+    Transcribe several short clips in one batched pass.
+    Returns a list of (segment_data_list, vad_skipped_seconds) per clip.
+    """
+    gap = np.zeros(SAMPLE_RATE, dtype=np.float32)  # 1s of silence keeps clips apart
+    pieces = []
+    clip_timestamps = []
+    clip_offsets = []
+    speech_samples = []
+    position = 0
+    for clip in clips:
+        regions = get_clip_regions(clip)
+        clip_offsets.append(position)
+        speech_samples.append(sum(region["end"] - region["start"] for region in regions))
+        clip_timestamps.extend({"start": position + r["start"], "end": position + r["end"]} for r in regions)
+        pieces.extend([clip, gap])
+        position += len(clip) + len(gap)
+    
+    results = [([], (len(clip) - speech) / SAMPLE_RATE) for clip, speech in zip(clips, speech_samples)]
+    if not clip_timestamps:
+        return results
+    
+    segments, info = pipeline.transcribe(
+        np.concatenate(pieces),
+        clip_timestamps=clip_timestamps,
+        word_timestamps=True,
+        batch_size=BATCH_SIZE
+    )
+    offsets_seconds = [offset / SAMPLE_RATE for offset in clip_offsets]
+    for segment in segments:
+        index = max(bisect.bisect_right(offsets_seconds, segment.start) - 1, 0)
+        results[index][0].append(build_segment_data(None, segment, offset=-offsets_seconds[index]))
+    return results
+
+class ShortJobBatcher:
+    """Collects short transcription jobs and runs them through the batched pipeline"""
+    
+    def __init__(self):
+        self.pending = []
+        self.in_flight = 0
+        self.changed = threading.Condition()
+        self.thread = None
+        # Writing sessions and generating summaries happens off the batch thread
+        self.finisher = ThreadPoolExecutor(max_workers=max(1, TRANSCRIPTION_WORKERS), thread_name_prefix="batch-finish")
+        self.stats = {"batches": 0, "clips": 0, "seconds": 0.0}
+    
+    def submit(self, job):
+        """Queue a decoded short clip; it is transcribed with the next batch. Blocks while too many clips are in flight"""
+        with self.changed:
+            while self.in_flight >= BATCH_MAX_IN_FLIGHT:
+                self.changed.wait()
+            self.in_flight += 1
+            job.submitted_at = time.time()
+            self.pending.append(job)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.changed.notify_all()
+    
+    def next_batch(self):
+        """Wait for the batch window of the oldest pending job (or a full batch) and take the batch"""
+        with self.changed:
+            while not self.pending:
+                self.changed.wait()
+            deadline = self.pending[0].submitted_at + BATCH_WINDOW_SECONDS
+            while len(self.pending) < BATCH_MAX_CLIPS and time.time() < deadline:
+                self.changed.wait(deadline - time.time())
+            # One batch per model: take the oldest job's model and everything else queued for it
+            model_key = self.pending[0].model_key
+            batch = [job for job in self.pending if job.model_key == model_key][:BATCH_MAX_CLIPS]
+            self.pending = [job for job in self.pending if job not in batch]
+            return model_key, batch
+    
+    def run(self):
+        while True:
+            model_key, batch = self.next_batch()
+            start = time.time()
+            try:
+                with pooled_whisper_model(*model_key) as model:
+                    results = transcribe_clips(BatchedInferencePipeline(model), [job.audio for job in batch])
+            except Exception as e:
+                print(f"Error transcribing batch of {len(batch)} clip(s): {e}")
+                for job in batch:
+                    release_transcription(job.session_id, job.temp_path, job.cache_key, e)
+                    self.job_done()
+                continue
+            
+            elapsed = time.time() - start
+            with self.changed:
+                self.stats["batches"] += 1
+                self.stats["clips"] += len(batch)
+                self.stats["seconds"] += elapsed
+            print(f"  📦 Batched {len(batch)} short clip(s) in {elapsed:.1f}s")
+            for job, (segments, vad_skipped_seconds) in zip(batch, results):
+                job.audio = None
+                self.finisher.submit(self.finish, job, segments, vad_skipped_seconds)
+    
+    def finish(self, job, segments, vad_skipped_seconds):
+        """Write one batched job's session like a regular transcription"""
+        error = None
+        try:
+            text_parts, stripped_segments = write_segments_to_log(
+                job.session_id, get_session_log_path(job.session_id), job.metadata, job.duration, iter(segments)
+            )
+            finish_transcription(
+                job.session_id, job.filename, job.metadata, job.duration, vad_skipped_seconds,
+                text_parts, stripped_segments, job.cache_key
+            )
+        except Exception as e:
+            error = e
+        finally:
+            release_transcription(job.session_id, job.temp_path, job.cache_key, error)
+            self.job_done()
+    
+    def job_done(self):
+        """A clip has left the batcher: let a waiting transcription worker submit the next one"""
+        with self.changed:
+            self.in_flight -= 1
+            self.changed.notify_all()
+    
+    def get_stats(self):
+        with self.changed:
+            stats = dict(self.stats)
+            stats["pending"] = len(self.pending)
+            stats["in_flight"] = self.in_flight
+        stats["seconds"] = round(stats["seconds"], 1)
+        stats["clips_per_batch"] = round(stats["clips"] / stats["batches"], 1) if stats["batches"] else 0
+        return stats
+
+short_job_batcher = ShortJobBatcher()
+
+def render_index(**context):
+    """Upload page with the model options and their defaults from settings"""
+    return render_template(
+        "index.html",
+        model_sizes=get_upload_model_sizes(),
+        defaults={"model_size": WHISPER_MODEL_SIZE, "device": WHISPER_DEVICE, "compute_type": WHISPER_COMPUTE_TYPE},
+        **context
+    )
+
+def upload_error(error, status_code, **extra):
+    """Error response for the upload form: JSON for API clients, the upload page otherwise"""
+    if request.accept_mimetypes.best == "application/json":
+        response = jsonify({"error": error, **extra})
+    else:
+        response = app.make_response(render_index(error=error))
+    response.status_code = status_code
+    return response
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
         audio = request.files.get("audio")
-        model_size = "tiny"
-        device = request.form.get("device", "cpu")
-        compute_type = request.form.get("compute_type", "int8")
+        priority = request.form.get("priority", 0, type=int)
+        try:
+            model_size, device, compute_type = resolve_model_settings(
+                request.form.get("model_size"),
+                request.form.get("device"),
+                request.form.get("compute_type"),
+                allowed_sizes=get_upload_model_sizes()
+            )
+        except ValueError as e:
+            return upload_error(str(e), 400)
 
         if audio:
-            # Generate session ID and save file
-            session_id = str(uuid.uuid4())
+            # Save the file content-addressed and check for an existing transcript
             filename = audio.filename
-            original_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, filename))
-            audio.save(original_path)
+            audio_hash, stored_filename, created = save_upload(audio)
+            original_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, stored_filename))
+            audio_seconds = probe_audio_duration(original_path)
+            if model_size == "auto":
+                model_size, estimated_wait = choose_model_tier(audio_seconds)
+                print(f"  🎚️ Auto-selected model {model_size} for {filename} (estimated wait {estimated_wait:.0f}s)")
+            cache_key = get_transcript_cache_key(audio_hash, model_size, compute_type)
+            
+            cached_session_id = get_cached_transcript(cache_key)
+            if cached_session_id:
+                print(f"  ♻️ Duplicate upload of {filename}, reusing session {cached_session_id}")
+                return redirect(url_for("session_view", session_id=cached_session_id))
             
-            # Initialize status
-            processing_status[session_id] = {"status": "starting", "progress": 0}
+            session_id = str(uuid.uuid4())
+            with transcript_cache_lock:
+                inflight_session_id = inflight_transcriptions.get(cache_key)
+                if inflight_session_id is None:
+                    inflight_transcriptions[cache_key] = session_id
+            if inflight_session_id:
+                # The same recording is already being transcribed: follow that job
+                return render_template("processing.html", session_id=inflight_session_id)
             
-            # Start background processing
-            thread = threading.Thread(
-                target=process_transcription,
-                args=(session_id, original_path, filename, model_size, device, compute_type)
+            # Queue for background processing (admission control when the queue is full)
+            position = enqueue_transcription(
+                session_id,
+                (original_path, filename, model_size, device, compute_type, audio_hash),
+                priority=priority,
+                estimated_seconds=(audio_seconds or 0) * get_realtime_factor(model_size)
             )
-            thread.daemon = True
-            thread.start()
+            if position is None:
+                with transcript_cache_lock:
+                    inflight_transcriptions.pop(cache_key, None)
+                # Don't keep a file no session points to (content stored before is in use)
+                if created and os.path.exists(original_path):
+                    os.remove(original_path)
+                response = upload_error(
+                    "The transcription queue is full. Please try again in a few minutes.",
+                    429, **get_queue_stats()
+                )
+                response.headers["Retry-After"] = "60"
+                return response
             
             # Return processing page
             return render_template("processing.html", session_id=session_id)
 
-    return render_template("index.html")
+    return render_index()
 
 @app.route("/session/<session_id>")
 def session_view(session_id):
+    # Segments are fetched page by page from /api/session/<id>/segments; only metadata is rendered here
+    session_path = os.path.join(SESSION_FOLDER, f"{session_id}.json")
     try:
-        with open(os.path.join(SESSION_FOLDER, f"{session_id}.json"), "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if not os.path.exists(get_segment_index_path(session_id)):
+            migrate_session_storage(session_id)
+        data = read_session_metadata(session_path)
+        data.pop("text", None)
+        if data.get("audio_hash") and os.path.exists(get_rendition_path(data["audio_hash"])):
+            data["audio_rendition_url"] = f"/media/renditions/{data['audio_hash']}.opus"
+        data["segment_count"] = len(load_columns(get_segment_index_path(session_id))["start"])
         return render_template("session.html", data=data)
     except FileNotFoundError:
+        pass
+    
+    # Still transcribing: show what has been decoded so far
+    try:
+        metadata, segments = read_session_log(get_session_log_path(session_id))
+    except (FileNotFoundError, json.JSONDecodeError):
         return "Session not found", 404
+    data = {
+        **metadata,
+        "segment_count": len(segments),
+        "partial": True
+    }
+    return render_template("session.html", data=data)
+
+def ensure_session_storage(session_id):
+    """Migrate an older session on first access. Returns False if the session does not exist"""
+    if os.path.exists(get_segment_index_path(session_id)):
+        return True
+    try:
+        migrate_session_storage(session_id)
+    except FileNotFoundError:
+        return False
+    return True
+
+@app.route("/api/session/<session_id>/segments")
+def session_segments(session_id):
+    """
+    Segments of a session by time window and/or page.
+    Query: from, to (seconds), offset (within the window), limit (default 200, max 1000),
+    speaker (id, only that speaker's segments)
+    """
+    ensure_session_storage(session_id)
+    limit = min(max(request.args.get("limit", 200, type=int), 1), 1000)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    try:
+        total, first, segments, partial = get_session_segments(
+            session_id,
+            request.args.get("from", type=float),
+            request.args.get("to", type=float),
+            offset,
+            limit,
+            request.args.get("speaker", type=int)
+        )
+    except (FileNotFoundError, json.JSONDecodeError):
+        return jsonify({"error": "Session not found"}), 404
+    
+    return jsonify({
+        "session_id": session_id,
+        "total": total,
+        "offset": first,
+        "partial": partial,
+        "segments": segments
+    })
+
+@app.route("/api/session/<session_id>/words")
+def session_words(session_id):
+    """Word timestamps of a session, optionally limited to a time range. Query: from, to (seconds)"""
+    if not ensure_session_storage(session_id) or not os.path.exists(get_session_words_path(session_id)):
+        return jsonify({"error": "Session not found"}), 404
+    
+    words = get_words_in_range(
+        session_id,
+        request.args.get("from", type=float),
+        request.args.get("to", type=float)
+    )
+    return jsonify({"session_id": session_id, "words": words})
+
+CONTENT_ADDRESSED_MEDIA = re.compile(r"^(renditions/)?[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
 
-@app.route("/uploads/<filename>")
+@app.route("/media/<path:filename>")
+@app.route("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    """Serve uploads and renditions with byte-range requests (for seeking) and HTTP caching"""
+    if CONTENT_ADDRESSED_MEDIA.match(filename):
+        # The name is the SHA-256 of the content, so it never changes: strong ETag + immutable
+        response = send_from_directory(
+            UPLOAD_FOLDER, filename, conditional=True,
+            etag=filename.replace("/", "-"), max_age=31536000
+        )
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response = send_from_directory(UPLOAD_FOLDER, filename, conditional=True)
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+def catalog_session(session_id, name, created_at=None, duration=None, segment_count=None, conn=None):
+    """Add or update a session in the catalog used by /api/sessions"""
+    conn = conn or get_app_db()
+    conn.execute(
+        """INSERT INTO sessions (session_id, name, created_at, updated_at, duration, segment_count)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT(session_id) DO UPDATE SET
+               name = excluded.name,
+               updated_at = excluded.updated_at,
+               duration = COALESCE(excluded.duration, sessions.duration),
+               segment_count = COALESCE(excluded.segment_count, sessions.segment_count)""",
+        (session_id, name, created_at or datetime.now().isoformat(), time.time(), duration, segment_count)
+    )
+    conn.commit()
+
+def is_session_file(filename):
+    """True for <session_id>.json files (not the *_contexts.json side files)"""
+    return filename.endswith(".json") and not filename.endswith("_contexts.json")
+
+def rebuild_session_catalog():
+    """Index every session file on disk (one-off migration for sessions written before the catalog)"""
+    conn = get_app_db()
+    count = 0
+    for filename in os.listdir(SESSION_FOLDER):
+        if not is_session_file(filename):
+            continue
+        path = os.path.join(SESSION_FOLDER, filename)
+        try:
+            data = read_json_file(path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  ⚠️ Skipping unreadable session file {filename}: {e}")
+            continue
+        segments = data.get("segments", [])
+        catalog_session(
+            filename[:-len(".json")],
+            data.get("name", "Untitled"),
+            created_at=datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            duration=segments[-1]["end"] if segments else None,
+            segment_count=len(segments),
+            conn=conn
+        )
+        count += 1
+    print(f"  📇 Indexed {count} session(s) into the catalog")
+
+def ensure_session_catalog():
+    """Build the catalog on first use if sessions exist on disk but none are indexed"""
+    conn = get_app_db()
+    if conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None:
+        if any(is_session_file(filename) for filename in os.listdir(SESSION_FOLDER)):
+            rebuild_session_catalog()
 
 @app.route("/api/sessions", methods=["GET"])
 def list_sessions():
-    sessions = []
+    """List sessions from the catalog. Query: limit, offset, sort (created_at|name), order (asc|desc)"""
+    ensure_session_catalog()
+    conn = get_app_db()
+    
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    sort = request.args.get("sort", "created_at")
+    if sort not in ("created_at", "name"):
+        sort = "created_at"
+    order = "ASC" if request.args.get("order", "desc" if sort == "created_at" else "asc").lower() == "asc" else "DESC"
+    
+    # The ETag changes whenever any session is added or updated
+    total, last_update = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM sessions").fetchone()
+    etag = hashlib.sha1(f"{total}:{last_update}:{limit}:{offset}:{sort}:{order}".encode("utf-8")).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    rows = conn.execute(
+        f"SELECT session_id, name, created_at, duration FROM sessions ORDER BY {sort} {order}, session_id LIMIT ? OFFSET ?",
+        (limit, offset)
+    ).fetchall()
+    sessions = [
+        {
+            "session_id": row["session_id"],
+            "name": row["name"],
+            "created_at": row["created_at"],
+            "duration": row["duration"]
+        } for row in rows
+    ]
+    
+    response = jsonify(sessions)
+    response.set_etag(etag)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# Full-text search over transcripts and minutes. Segment text and section notes
+# are kept in SQLite FTS5 indexes (external-content tables, so a session can be
+# replaced through an ordinary index on session_id). Sessions are indexed when
+# their transcript or summary is written; older ones are backfilled on startup.
+SEARCH_INDEX_PATH = get_setting("SEARCH_INDEX_PATH", os.path.join(CACHE_FOLDER, "search.db"))
+
+def get_search_db():
+    """Connection to the search index, creating the schema on first use"""
+    conn = get_db(SEARCH_INDEX_PATH)
+    if not getattr(db_local, "search_db_ready", False):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS search_segments (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                segment_id INTEGER,
+                start_ms INTEGER NOT NULL,
+                end_ms INTEGER NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS search_segments_session ON search_segments (session_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_segments_fts USING fts5(
+                text, content='search_segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS search_segments_insert AFTER INSERT ON search_segments BEGIN
+                INSERT INTO search_segments_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_segments_delete AFTER DELETE ON search_segments BEGIN
+                INSERT INTO search_segments_fts (search_segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            CREATE TABLE IF NOT EXISTS search_notes (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                section_index INTEGER NOT NULL,
+                section_name TEXT,
+                start_ms INTEGER NOT NULL,
+                end_ms INTEGER NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS search_notes_session ON search_notes (session_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_notes_fts USING fts5(
+                section_name, text, content='search_notes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS search_notes_insert AFTER INSERT ON search_notes BEGIN
+                INSERT INTO search_notes_fts (rowid, section_name, text) VALUES (new.id, new.section_name, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_notes_delete AFTER DELETE ON search_notes BEGIN
+                INSERT INTO search_notes_fts (search_notes_fts, rowid, section_name, text)
+                VALUES ('delete', old.id, old.section_name, old.text);
+            END;
+            CREATE TABLE IF NOT EXISTS search_sessions (
+                session_id TEXT PRIMARY KEY,
+                segments_indexed_at REAL,
+                summary_indexed_at REAL
+            );
+        """)
+        conn.commit()
+        db_local.search_db_ready = True
+    return conn
+
+def to_ms(seconds):
+    return int(round(float(seconds or 0) * 1000))
+
+def index_session_segments(session_id, segments):
+    """(Re)index the transcript segments of a session"""
+    try:
+        conn = get_search_db()
+        with conn:
+            conn.execute("DELETE FROM search_segments WHERE session_id = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO search_segments (session_id, segment_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (session_id, seg.get("id", i), to_ms(seg.get("start")), to_ms(seg.get("end")), seg["text"])
+                    for i, seg in enumerate(segments) if seg.get("text")
+                )
+            )
+            conn.execute(
+                """INSERT INTO search_sessions (session_id, segments_indexed_at) VALUES (?, ?)
+                   ON CONFLICT(session_id) DO UPDATE SET segments_indexed_at = excluded.segments_indexed_at""",
+                (session_id, time.time())
+            )
+    except sqlite3.Error as e:
+        print(f"  ⚠️ Could not index transcript of session {session_id}: {e}")
+
+def index_session_summary(session_id, summary_data):
+    """(Re)index the section notes of a session's minutes"""
+    try:
+        conn = get_search_db()
+        with conn:
+            conn.execute("DELETE FROM search_notes WHERE session_id = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO search_notes (session_id, section_index, section_name, start_ms, end_ms, text) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (session_id, i, section.get("section_name"), to_ms(section.get("start_time")),
+                     to_ms(section.get("end_time")), "\n".join(str(note) for note in section.get("notes", [])))
+                    for i, section in enumerate(summary_data.get("sections", []))
+                )
+            )
+            conn.execute(
+                """INSERT INTO search_sessions (session_id, summary_indexed_at) VALUES (?, ?)
+                   ON CONFLICT(session_id) DO UPDATE SET summary_indexed_at = excluded.summary_indexed_at""",
+                (session_id, time.time())
+            )
+    except sqlite3.Error as e:
+        print(f"  ⚠️ Could not index minutes of session {session_id}: {e}")
+
+def backfill_search_index():
+    """Index sessions and summaries written before the search index (or while it was unavailable)"""
+    conn = get_search_db()
+    indexed = {
+        row["session_id"]: row for row in conn.execute(
+            "SELECT session_id, segments_indexed_at, summary_indexed_at FROM search_sessions"
+        )
+    }
+    count = 0
     for filename in os.listdir(SESSION_FOLDER):
-        if filename.endswith(".json"):
-            session_id = filename.replace(".json", "")
-            with open(os.path.join(SESSION_FOLDER, filename), "r", encoding="utf-8") as f:
-                data = json.load(f)
-                sessions.append({
-                    "session_id": session_id,
-                    "name": data.get("name", "Untitled")
-                })
-    return jsonify(sessions)
+        if not is_session_file(filename):
+            continue
+        session_id = filename[:-len(".json")]
+        row = indexed.get(session_id)
+        try:
+            if not row or row["segments_indexed_at"] is None:
+                index_session_segments(session_id, read_json_file(os.path.join(SESSION_FOLDER, filename)).get("segments", []))
+                count += 1
+            summary_path = get_summary_path(session_id)
+            if (not row or row["summary_indexed_at"] is None) and os.path.exists(summary_path):
+                index_session_summary(session_id, read_json_file(summary_path))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  ⚠️ Could not index session {filename}: {e}")
+    if count:
+        print(f"  🔎 Indexed {count} session(s) for search")
+
+def build_fts_query(text):
+    """
+    Turn free text into an FTS5 query: "quoted phrases" are kept, every other word
+    is matched as a term (all must occur); a trailing * allows prefix matches
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', text):
+        if phrase:
+            tokens = re.findall(r"\w+", phrase)
+            if tokens:
+                terms.append('"' + " ".join(tokens) + '"')
+        else:
+            prefix = word.endswith("*")
+            terms.extend(f'"{token}"' for token in re.findall(r"\w+", word))
+            if prefix and terms:
+                terms[-1] += "*"
+    return " ".join(terms)
+
+# Private-use characters marking the matches in FTS snippets: the text around them is
+# HTML-escaped before they become <mark> tags, so transcript text cannot inject markup
+SNIPPET_MARK_START = "\ue000"
+SNIPPET_MARK_END = "\ue001"
+
+def render_snippet(snippet):
+    """HTML-safe snippet with the matches wrapped in <mark>"""
+    return (html.escape(snippet)
+            .replace(SNIPPET_MARK_START, "<mark>")
+            .replace(SNIPPET_MARK_END, "</mark>"))
+
+@app.route("/api/search")
+def search():
+    """
+    Search transcripts and minutes. Query: q, kind (segments|notes|all),
+    session_id (optional), limit, offset. Results are ranked by relevance.
+    """
+    query = build_fts_query(request.args.get("q", ""))
+    if not query:
+        return jsonify({"error": "Missing search query"}), 400
+    kind = request.args.get("kind", "all")
+    if kind not in ("segments", "notes", "all"):
+        return jsonify({"error": "kind must be segments, notes or all"}), 400
+    session_id = request.args.get("session_id")
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    
+    session_filter = "AND s.session_id = ?" if session_id else ""
+    params = (query, session_id) if session_id else (query,)
+    conn = get_search_db()
+    result = {"query": request.args.get("q", "")}
+    try:
+        if kind in ("segments", "all"):
+            rows = conn.execute(
+                f"""SELECT s.session_id, s.segment_id, s.start_ms, s.end_ms,
+                           snippet(search_segments_fts, 0, ?, ?, '…', 16) AS snippet
+                    FROM search_segments_fts JOIN search_segments s ON s.id = search_segments_fts.rowid
+                    WHERE search_segments_fts MATCH ? {session_filter}
+                    ORDER BY rank LIMIT ? OFFSET ?""",
+                (SNIPPET_MARK_START, SNIPPET_MARK_END, *params, limit, offset)
+            ).fetchall()
+            result["segments"] = [{**row, "snippet": render_snippet(row["snippet"])} for row in map(dict, rows)]
+        if kind in ("notes", "all"):
+            rows = conn.execute(
+                f"""SELECT s.session_id, s.section_index, s.section_name, s.start_ms, s.end_ms,
+                           snippet(search_notes_fts, 1, ?, ?, '…', 16) AS snippet
+                    FROM search_notes_fts JOIN search_notes s ON s.id = search_notes_fts.rowid
+                    WHERE search_notes_fts MATCH ? {session_filter}
+                    ORDER BY rank LIMIT ? OFFSET ?""",
+                (SNIPPET_MARK_START, SNIPPET_MARK_END, *params, limit, offset)
+            ).fetchall()
+            result["notes"] = [{**row, "snippet": render_snippet(row["snippet"])} for row in map(dict, rows)]
+    except sqlite3.OperationalError as e:
+        return jsonify({"error": f"Invalid search query: {e}"}), 400
+    
+    # Session names from the catalog
+    session_ids = {row["session_id"] for rows in (result.get("segments", []), result.get("notes", [])) for row in rows}
+    if session_ids:
+        placeholders = ",".join("?" * len(session_ids))
+        names = dict(get_app_db().execute(
+            f"SELECT session_id, name FROM sessions WHERE session_id IN ({placeholders})", tuple(session_ids)
+        ).fetchall())
+        for rows in (result.get("segments", []), result.get("notes", [])):
+            for row in rows:
+                row["session_name"] = names.get(row["session_id"])
+    return jsonify(result)
+
+@app.route("/api/stats")
+def get_stats():
+    """Runtime statistics for the shared resources (model pool, etc.)"""
+    return jsonify({
+        "whisper_model_pool": get_model_pool_stats(),
+        "transcription_queue": get_queue_stats(),
+        "gemini_api_keys": api_key_scheduler.stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "vad": get_vad_stats(),
+        "short_job_batches": short_job_batcher.get_stats(),
+        "llm_calls": get_llm_call_stats(),
+        "llm_chunks": get_chunk_token_stats(),
+        "diarization": get_diarization_stats()
+    })
+
+def get_progress_status(session_id):
+    """Current transcription progress, including the live queue position while waiting"""
+    status = processing_status.get(session_id, {"status": "unknown", "progress": 0})
+    if status.get("status") == "queued":
+        position = get_queue_position(session_id)
+        if position is not None:
+            status = {**status, "queue_position": position}
+    return status
+
+def stream_status(key, get_status):
+    """Server-Sent Events response that pushes a status dict every time it changes"""
+    def generate():
+        version = processing_status.get_version(key)
+        last_payload = None
+        while True:
+            status = get_status()
+            payload = json.dumps(status)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+            else:
+                yield ": keep-alive\n\n"
+            # Unknown: a mistyped or expired id, whose status will never change
+            if status.get("status") in ("complete", "error", "unknown"):
+                break
+            # Queue positions move without a status update, so re-check queued jobs often
+            timeout = 2 if status.get("status") == "queued" else 15
+            version = processing_status.wait_for_change(key, version, timeout)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route("/api/progress/<session_id>")
 def get_progress(session_id):
     """Get processing progress for a session"""
-    status = processing_status.get(session_id, {"status": "unknown", "progress": 0})
-    return jsonify(status)
+    return jsonify(get_progress_status(session_id))
+
+@app.route("/api/progress/<session_id>/stream")
+def stream_progress(session_id):
+    """Push processing progress for a session as Server-Sent Events"""
+    return stream_status(session_id, lambda: get_progress_status(session_id))
 
 @app.route("/api/summary/<session_id>")
 def get_summary(session_id):
-    """Get generated summary for a session"""
-    summary_path = os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
-    if os.path.exists(summary_path):
-        with open(summary_path, "r", encoding="utf-8") as f:
-            return jsonify(json.load(f))
-    return jsonify({"error": "Summary not found"}), 404
+    """Get generated summary for a session (the stored JSON is sent as-is, without re-parsing)"""
+    try:
+        with open(get_summary_path(session_id), "rb") as f:
+            raw = f.read()
+            stat = os.fstat(f.fileno())
+    except FileNotFoundError:
+        return jsonify({"error": "Summary not found"}), 404
+    
+    response = app.response_class(mimetype="application/json")
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if raw[:2] == GZIP_MAGIC:
+        # Both representations vary by encoding and need distinct ETags
+        response.vary.add("Accept-Encoding")
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response.headers["Content-Encoding"] = "gzip"
+            etag += "-gz"
+        else:
+            raw = gzip.decompress(raw)
+    response.set_data(raw)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 @app.route("/api/regenerate-summary/<session_id>", methods=["POST"])
 def regenerate_summary(session_id):
@@ -237,8 +3209,12 @@ def regenerate_summary(session_id):
         if not os.path.exists(session_path):
             return jsonify({"error": "Session not found"}), 404
         
-        with open(session_path, "r", encoding="utf-8") as f:
-            session_data = json.load(f)
+        session_data = read_json_file(session_path)
+        
+        # One regeneration per session at a time, across processes (their summary
+        # writes would race); the background task releases the lock when it ends
+        if not get_session_lock(session_id, "regenerate").acquire(blocking=False):
+            return jsonify({"error": "Minutes are already being regenerated"}), 409
         
         # Initialize progress
         processing_status[f"minutes_{session_id}"] = {
@@ -259,15 +3235,23 @@ def regenerate_summary(session_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/api/minutes-progress/<session_id>")
-def get_minutes_progress(session_id):
-    """Get progress of minutes generation"""
-    status = processing_status.get(f"minutes_{session_id}", {
+def get_minutes_status(session_id):
+    """Current progress of minutes generation"""
+    return processing_status.get(f"minutes_{session_id}", {
         "status": "unknown",
         "progress": 0,
         "step": "Unknown"
     })
-    return jsonify(status)
+
+@app.route("/api/minutes-progress/<session_id>")
+def get_minutes_progress(session_id):
+    """Get progress of minutes generation"""
+    return jsonify(get_minutes_status(session_id))
+
+@app.route("/api/minutes-progress/<session_id>/stream")
+def stream_minutes_progress(session_id):
+    """Push progress of minutes generation as Server-Sent Events"""
+    return stream_status(f"minutes_{session_id}", lambda: get_minutes_status(session_id))
 
 def find_failed_sections(summary_data):
     """Find sections with error notes"""
@@ -283,72 +3267,121 @@ def find_failed_sections(summary_data):
             })
     return failed
 
+def get_contexts_path(session_id):
+    """Side file with the meeting type and the context of every summary section"""
+    return os.path.join(SESSION_FOLDER, f"{session_id}_contexts.json")
+
+def context_key(start_time, end_time):
+    """Lookup key matching a section to its context"""
+    return (round(float(start_time), 1), round(float(end_time), 1))
+
+def save_section_contexts(session_id, meeting_type, sections):
+    """Write the contexts behind the summary sections, so failed sections can be retried"""
+    contexts = [{
+        "name": section["section_name"],
+        "from_time": section["start_time"],
+        "end_time": section["end_time"]
+    } for section in sections]
+    with get_session_lock(session_id):
+        write_json_file(get_contexts_path(session_id), {"meeting_type": meeting_type, "contexts": contexts}, compress=SUMMARY_GZIP)
+
+def generate_section_summary(context, segments, meeting_type, segment_starts=None):
+    """Generate notes for one context from the segments in its time range"""
+    if segment_starts is None:
+        segment_starts = [seg['start'] for seg in segments]
+    first = bisect.bisect_left(segment_starts, context["from_time"] - 1.0)
+    last = bisect.bisect_right(segment_starts, context["end_time"])
+    section_segments = [seg for seg in segments[first:last] if seg['end'] > context["from_time"]]
+    if not section_segments:
+        return {"notes": []}
+    
+    focus = "the incident being investigated" if meeting_type == "INCIDENT_REPORT" else "decisions, facts and open points"
+    prompt = f"""Generate detailed notes for this section of a meeting transcript.
+
+SECTION: {context.get("name", "Untitled")} ({context["from_time"]}s - {context["end_time"]}s)
+
+TRANSCRIPT:
+{get_segments_text(section_segments, target_duration=60)}
+
+Focus on {focus}. Notes must be concise and only cover this section.
+
+Return ONLY valid JSON:
+{{
+  "notes": ["Point 1", "Point 2"]
+}}"""
+    return call_llm(prompt, parse=parse_json_response, description=f"Section '{context.get('name')}'")
+
 @app.route("/api/retry-failed-sections/<session_id>", methods=["POST"])
 def retry_failed_sections(session_id):
     """Retry generating notes for sections that failed"""
     try:
         # Load summary
-        summary_path = os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
+        summary_path = get_summary_path(session_id)
         if not os.path.exists(summary_path):
             return jsonify({"error": "Summary not found"}), 404
         
-        with open(summary_path, "r", encoding="utf-8") as f:
-            summary_data = json.load(f)
+        summary_data = read_json_file(summary_path)
         
         # Find failed sections
         failed = find_failed_sections(summary_data)
         if not failed:
             return jsonify({"message": "No failed sections found", "retried": 0})
         
-        # Load contexts
-        contexts_path = os.path.join(SESSION_FOLDER, f"{session_id}_contexts.json")
-        if not os.path.exists(contexts_path):
-            return jsonify({"error": "Contexts not found"}), 404
-        
-        with open(contexts_path, "r", encoding="utf-8") as f:
-            contexts_data = json.load(f)
-            contexts = contexts_data.get("contexts", [])
-            meeting_type = contexts_data.get("meeting_type", "REGULAR_MEETING")
+        # Load contexts (indexed by time range); a section without one is retried from its own range
+        contexts_by_range = {}
+        meeting_type = summary_data.get("meeting_type", "REGULAR_MEETING")
+        contexts_path = get_contexts_path(session_id)
+        if os.path.exists(contexts_path):
+            contexts_data = read_json_file(contexts_path)
+            meeting_type = contexts_data.get("meeting_type", meeting_type)
+            contexts_by_range = {
+                context_key(ctx.get("from_time", 0), ctx.get("end_time", 0)): ctx
+                for ctx in contexts_data.get("contexts", [])
+            }
         
         # Load session segments
         session_path = os.path.join(SESSION_FOLDER, f"{session_id}.json")
         if not os.path.exists(session_path):
             return jsonify({"error": "Session not found"}), 404
         
-        with open(session_path, "r", encoding="utf-8") as f:
-            session_data = json.load(f)
-            segments = strip_words_from_segments(session_data.get("segments", []))
+        segments = strip_words_from_segments(read_json_file(session_path).get("segments", []))
+        segment_starts = [seg['start'] for seg in segments]
         
-        # Retry each failed section
-        retried_count = 0
-        for failed_section in failed:
-            section_idx = failed_section["index"]
-            section = summary_data["sections"][section_idx]
-            
-            # Find matching context
-            matching_context = None
-            for ctx in contexts:
-                if (abs(ctx.get("from_time", 0) - section["start_time"]) < 1.0 and 
-                    abs(ctx.get("end_time", 0) - section["end_time"]) < 1.0):
-                    matching_context = ctx
-                    break
-            
-            if not matching_context:
-                print(f"  ⚠️ No matching context found for section '{section['section_name']}'")
-                continue
-            
-            # Retry generation
+        def retry_section(failed_section):
+            section = summary_data["sections"][failed_section["index"]]
+            context = contexts_by_range.get(context_key(section["start_time"], section["end_time"])) or {
+                "name": section["section_name"],
+                "from_time": section["start_time"],
+                "end_time": section["end_time"]
+            }
             print(f"  🔄 Retrying section '{section['section_name']}' ({section['start_time']}s - {section['end_time']}s)...")
-            model = get_model()
-            result = generate_section_summary(matching_context, segments, model, meeting_type)
-            
-            # Update section with new notes
-            summary_data["sections"][section_idx]["notes"] = result.get("notes", ["Error generating notes"])
-            retried_count += 1
+            try:
+                return generate_section_summary(context, segments, meeting_type, segment_starts)
+            except Exception as e:
+                print(f"  ⚠️ Retry of section '{section['section_name']}' failed: {e}")
+                return None
+        
+        # Retry the failed sections in parallel (calls are spread over the API keys)
+        concurrency = max(1, min(len(failed), len(GEMINI_API_KEYS) * GEMINI_PER_KEY_CONCURRENCY))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(retry_section, failed))
         
-        # Save updated summary
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(summary_data, f, indent=2)
+        # Apply the new notes to the current summary (it may have been regenerated meanwhile)
+        retried_count = 0
+        with get_session_lock(session_id):
+            summary_data = read_json_file(summary_path)
+            sections = summary_data.get("sections", [])
+            for failed_section, result in zip(failed, results):
+                index = failed_section["index"]
+                if (result and result.get("notes") and index < len(sections)
+                        and sections[index].get("start_time") == failed_section["start_time"]
+                        and sections[index].get("end_time") == failed_section["end_time"]):
+                    # Update section with new notes
+                    sections[index]["notes"] = result["notes"]
+                    retried_count += 1
+            
+            # Save updated summary
+            write_summary(session_id, summary_data)
         
         return jsonify({
             "success": True,
@@ -377,15 +3410,14 @@ def regenerate_summary_task(session_id, session_data, meeting_type_override):
         full_text = session_data.get("text", "")
         
         # Check if contexts are already cached
-        contexts_cache_file = os.path.join(SESSION_FOLDER, f"{session_id}_contexts.json")
+        contexts_cache_file = get_contexts_path(session_id)
         
         # Use override or detect meeting type
         if meeting_type_override == "auto":
             # Check cache first
             if os.path.exists(contexts_cache_file):
-                with open(contexts_cache_file, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                    meeting_type = cached_data.get('meeting_type', 'REGULAR_MEETING')
+                cached_data = read_json_file(contexts_cache_file)
+                meeting_type = cached_data.get('meeting_type', 'REGULAR_MEETING')
             else:
                 meeting_type = detect_meeting_type(segments)
         else:
@@ -401,6 +3433,7 @@ def regenerate_summary_task(session_id, session_data, meeting_type_override):
         model = get_model()
         
         sections = process_chunk_stream(segments, model, meeting_type)
+        save_section_contexts(session_id, meeting_type, sections)
         
         processing_status[progress_key] = {
             "status": "finalizing",
@@ -409,7 +3442,6 @@ def regenerate_summary_task(session_id, session_data, meeting_type_override):
         }
         
         print("  📝 Prompting AI: Generating final summary and conclusion...")
-        model = get_model()  # Get new model instance to rotate keys
         
         # Generate overall summary
         sections_summary = ""
@@ -447,17 +3479,7 @@ Return JSON:
 
 IMPORTANT: Return ONLY valid JSON, no markdown."""
         
-        response = model.generate_content(final_prompt)
-        response_text = response.text.strip()
-        
-        # Clean markdown
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-            response_text = response_text.strip()
-        
-        final_data = json.loads(response_text)
+        final_data = call_llm(final_prompt, parse=parse_json_response, description="Final summary")
         
         # Save summary
         summary_data = {
@@ -474,7 +3496,6 @@ IMPORTANT: Return ONLY valid JSON, no markdown."""
         # For incident reports, generate additional incident_report section
         if meeting_type == "INCIDENT_REPORT":
             print("  📝 Prompting AI: Generating incident report section...")
-            model = get_model()  # Get new model instance to rotate keys
             
             incident_prompt = f"""You are generating the INCIDENT REPORT section of a formal investigation report.
 
@@ -532,22 +3553,10 @@ IMPORTANT:
 - Each item should be 1-2 sentences
 - Focus on KEY information only"""
             
-            response = model.generate_content(incident_prompt)
-            response_text = response.text.strip()
-            
-            # Clean markdown
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            
-            incident_report_data = json.loads(response_text)
+            incident_report_data = call_llm(incident_prompt, parse=parse_json_response, description="Incident report")
             summary_data["incident_report"] = incident_report_data
         
-        summary_path = os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(summary_data, f, indent=2)
+        write_summary(session_id, summary_data)
         
         processing_status[progress_key] = {
             "status": "complete",
@@ -565,11 +3574,12 @@ IMPORTANT:
             "step": "Error occurred",
             "error": str(e)
         }
+    finally:
+        get_session_lock(session_id, "regenerate").release()
 
 def detect_meeting_type(segments):
     """Detect if this is a regular meeting or incident report"""
     print("  📝 Prompting AI: Detecting meeting type...")
-    model = get_model()
     
     # Use first 10 segments to detect type
     sample_text = ""
@@ -587,7 +3597,7 @@ REGULAR_MEETING: Normal business meetings, discussions, planning sessions, team
 INCIDENT_REPORT: Investigation, incident review, disciplinary meeting, accident report, complaint investigation"""
     
     try:
-        response = model.generate_content(prompt)
+        response = call_llm(prompt, description="Meeting type detection")
         meeting_type = response.text.strip().upper()
         if "INCIDENT" in meeting_type:
             return "INCIDENT_REPORT"
@@ -595,34 +3605,105 @@ INCIDENT_REPORT: Investigation, incident review, disciplinary meeting, accident
     except:
         return "REGULAR_MEETING"  # Default
 
-def chunk_by_time(segments, chunk_duration=300):
-    """Split segments into time-based chunks (default 5 minutes = 300 seconds)"""
-    chunks = []
-    current_chunk = []
-    chunk_start = 0
+# Adaptive chunking: chunk prompts are sized by an estimate of their transcript
+# tokens rather than by wall-clock time, so fast talkers don't overflow a prompt and
+# sparse audio doesn't waste calls on near-empty chunks. Once a chunk holds
+# LLM_CHUNK_PAUSE_FRACTION of LLM_CHUNK_TOKEN_BUDGET it is closed at the next pause
+# of at least LLM_CHUNK_PAUSE_SECONDS; if none comes before the budget is reached, it
+# is split at the longest pause seen since. LLM_CHUNK_MAX_SECONDS caps chunk length.
+LLM_CHUNK_TOKEN_BUDGET = get_setting("LLM_CHUNK_TOKEN_BUDGET", 4000)
+LLM_CHUNK_PAUSE_FRACTION = get_setting("LLM_CHUNK_PAUSE_FRACTION", 0.75)
+LLM_CHUNK_PAUSE_SECONDS = get_setting("LLM_CHUNK_PAUSE_SECONDS", 2.0)
+LLM_CHUNK_MAX_SECONDS = get_setting("LLM_CHUNK_MAX_SECONDS", 3600)
+
+def estimate_segment_tokens(seg):
+    """Token estimate for a segment's text in a chunk prompt"""
+    return estimate_tokens(seg['text']) + 1
+
+def make_chunk(segments):
+    """Chunk dict for consecutive segments"""
+    return {
+        'segments': segments,
+        'start_time': segments[0]['start'],
+        'end_time': segments[-1]['end'],
+        'estimated_tokens': sum(estimate_segment_tokens(seg) for seg in segments)
+    }
+
+class ChunkBuilder:
+    """Groups segments into chunks as they arrive (used for whole and still-growing transcripts)"""
     
-    for seg in segments:
-        if not current_chunk:
-            chunk_start = seg['start']
+    def __init__(self, chunk_duration, token_budget=None):
+        self.chunk_duration = chunk_duration
+        self.token_budget = token_budget
+        self.current_chunk = []
+        self.tokens = 0
+        # Longest pause since the chunk reached the soft budget: (gap, split index)
+        self.best_pause = None
+    
+    def add(self, seg):
+        """Add the next segment; returns the chunk it completes, or None"""
+        if not self.token_budget:
+            self.append(seg)
+            # Check if we've exceeded chunk duration
+            if seg['end'] - self.current_chunk[0]['start'] >= self.chunk_duration:
+                return self.flush()
+            return None
         
-        current_chunk.append(seg)
+        chunk = None
+        seg_tokens = estimate_segment_tokens(seg)
+        if self.current_chunk:
+            gap = seg['start'] - self.current_chunk[-1]['end']
+            if self.tokens >= self.token_budget * LLM_CHUNK_PAUSE_FRACTION:
+                if gap >= LLM_CHUNK_PAUSE_SECONDS:
+                    # Natural pause after the soft budget: close the chunk here
+                    chunk = self.flush()
+                elif not self.best_pause or gap > self.best_pause[0]:
+                    self.best_pause = (gap, len(self.current_chunk))
+            
+            if chunk is None and (self.tokens + seg_tokens > self.token_budget
+                                  or seg['end'] - self.current_chunk[0]['start'] > self.chunk_duration):
+                chunk = self.split()
         
-        # Check if we've exceeded chunk duration
-        if seg['end'] - chunk_start >= chunk_duration:
-            chunks.append({
-                'segments': current_chunk,
-                'start_time': chunk_start,
-                'end_time': seg['end']
-            })
-            current_chunk = []
+        self.append(seg)
+        return chunk
+    
+    def append(self, seg):
+        self.current_chunk.append(seg)
+        self.tokens += estimate_segment_tokens(seg)
+    
+    def split(self):
+        """Close the chunk at the longest pause since the soft budget; later segments carry over"""
+        index = self.best_pause[1] if self.best_pause else len(self.current_chunk)
+        carried = self.current_chunk[index:]
+        self.current_chunk = self.current_chunk[:index]
+        chunk = self.flush()
+        for seg in carried:
+            self.append(seg)
+        return chunk
+    
+    def flush(self):
+        """Close the chunk in progress; returns it, or None if it is empty"""
+        if not self.current_chunk:
+            return None
+        chunk = make_chunk(self.current_chunk)
+        self.current_chunk = []
+        self.tokens = 0
+        self.best_pause = None
+        return chunk
+
+def chunk_by_time(segments, chunk_duration=300, token_budget=None):
+    """
+    Split segments into time-based chunks (default 5 minutes = 300 seconds), or
+    into chunks of about token_budget tokens that end at pauses, at most
+    chunk_duration long
+    """
+    builder = ChunkBuilder(chunk_duration, token_budget)
+    chunks = [chunk for chunk in map(builder.add, segments) if chunk]
     
     # Add remaining segments
-    if current_chunk:
-        chunks.append({
-            'segments': current_chunk,
-            'start_time': chunk_start,
-            'end_time': current_chunk[-1]['end']
-        })
+    last_chunk = builder.flush()
+    if last_chunk:
+        chunks.append(last_chunk)
     
     return chunks
 
@@ -636,22 +3717,43 @@ def strip_words_from_segments(segments):
             'end': seg.get('end'),
             'text': seg.get('text', '')
         })
+        if 'speaker' in seg:
+            stripped[-1]['speaker'] = seg['speaker']
     return stripped
 
 def get_segments_text(segments, target_duration=45):
-    """Group segments into larger blocks of text with timestamps to reduce token overhead"""
+    """
+    Group segments into larger blocks of text with timestamps to reduce token overhead.
+    Blocks end after target_duration, or earlier at a pause once half of it has passed.
+    Diarized segments are prefixed with their speaker at each change of speaker.
+    """
     if not segments:
         return ""
     
     output_text = ""
     current_group = []
     group_start = None
+    group_end = None
+    speaker = None
     
     for seg in segments:
+        # Prefer to start a new block at a natural pause
+        if (current_group and seg['start'] - group_end >= LLM_CHUNK_PAUSE_SECONDS
+                and group_end - group_start >= target_duration / 2):
+            output_text += f"[{round(group_start, 2)}s - {round(group_end, 2)}s] {' '.join(current_group)}\n"
+            current_group = []
+            group_start = None
+        
         if group_start is None:
             group_start = seg['start']
+            speaker = None
         
-        current_group.append(seg['text'])
+        if seg.get('speaker') is not None and seg['speaker'] != speaker:
+            speaker = seg['speaker']
+            current_group.append(f"Speaker {speaker + 1}: {seg['text'].strip()}")
+        else:
+            current_group.append(seg['text'])
+        group_end = seg['end']
         
         # If we reached the target duration or it's the last segment
         if seg['end'] - group_start >= target_duration:
@@ -665,34 +3767,28 @@ def get_segments_text(segments, target_duration=45):
         
     return output_text
 
-def process_chunk_stream(segments, model, meeting_type="REGULAR_MEETING"):
-    """
-    Single-pass processing: Process segments in chunks, identifying contexts
-    and generating/updating notes in real-time.
-    """
-    # 1. Chunk by time (15-20 min chunks for better context)
-    chunk_duration = 1000  # ~16 minutes
-    chunks = chunk_by_time(segments, chunk_duration=chunk_duration)
-    
-    print(f"Processing transcript in {len(chunks)} stream chunks...")
-    
-    final_sections = []
-    ongoing_context = None
-    
-    for i, chunk in enumerate(chunks):
-        chunk_start = round(chunk['start_time'], 2)
-        chunk_end = round(chunk['end_time'], 2)
-        print(f"  🌊 Stream Processing Chunk {i+1}/{len(chunks)} ({chunk_start}s - {chunk_end}s)...")
-        
-        model = get_model() # Rotate keys
-        
-        # Get text for this chunk
-        chunk_text = get_segments_text(chunk['segments'], target_duration=60)
-        
-        # Prepare ongoing context info
-        ongoing_context_prompt = ""
-        if ongoing_context:
-            ongoing_context_prompt = f"""
+# Pipelined chunk processing: chunk prompts are sent concurrently (up to
+# GEMINI_PER_KEY_CONCURRENCY calls per API key) and the ongoing/finished context
+# hand-off is reconciled afterwards in timeline order.
+GEMINI_PER_KEY_CONCURRENCY = get_setting("GEMINI_PER_KEY_CONCURRENCY", 1)
+GEMINI_PIPELINED_CHUNKS = get_setting("GEMINI_PIPELINED_CHUNKS", True)
+
+def clean_json_response(response_text):
+    """Strip markdown code fences around a JSON response"""
+    response_text = response_text.strip()
+    if response_text.startswith("```"):
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+        response_text = response_text.strip()
+    return response_text
+
+def build_chunk_prompt(chunk_text, chunk_start, chunk_end, ongoing_context=None, pipelined=False):
+    """Prompt for one transcript chunk of the stream (pipelined: analysed concurrently, with earlier chunks before it)"""
+    # Prepare ongoing context info
+    ongoing_context_prompt = ""
+    if ongoing_context:
+        ongoing_context_prompt = f"""
 ONGOING CONTEXT FROM PREVIOUS CHUNK:
 Name: "{ongoing_context['name']}"
 Started at: {ongoing_context['from_time']}s
@@ -705,13 +3801,30 @@ INSTRUCTION FOR ONGOING CONTEXT:
 3. **DO NOT REPEAT** information from the previous chunk.
 4. If the topic finishes in this chunk, mark as "finished".
 5. If it continues to the NEXT chunk, mark as "ongoing".
+"""
+    elif pipelined:
+        # Chunks are processed concurrently, so the previous chunk's topic is unknown
+        ongoing_context_prompt = f"""
+PREVIOUS CHUNK:
+This chunk follows an earlier part of the meeting that is analysed separately.
+If the chunk starts in the middle of a topic that began before {chunk_start}s,
+set "continues_previous": true on that first context (and false everywhere else).
+"""
+
+    speaker_prompt = ""
+    if re.search(r"\bSpeaker \d+: ", chunk_text):
+        speaker_prompt = """
+SPEAKERS:
+The transcript is labelled by speaker ("Speaker 2: ..."). Attribute proposals,
+decisions and commitments in the notes to the speaker who made them, by name if
+they are named in the transcript, otherwise by their label.
 """
 
-        prompt = f"""Analyze this meeting transcript chunk. Identify topics (contexts) and generate detailed notes.
+    return f"""Analyze this meeting transcript chunk. Identify topics (contexts) and generate detailed notes.
 
 TRANSCRIPT CHUNK ({chunk_start}s - {chunk_end}s):
 {chunk_text}
-{ongoing_context_prompt}
+{ongoing_context_prompt}{speaker_prompt}
 
 INSTRUCTIONS:
 1. **Identify Contexts**: logical sections/topics in the meeting.
@@ -741,89 +3854,385 @@ CRITICAL:
 - NO overlapping times (except boundaries).
 - Gaps are allowed if no meaningful content exists, but prefer continuous coverage.
 """
+
+def context_to_section(context, default_start, default_end):
+    """Convert a chunk context into a final summary section"""
+    return {
+        "section_name": context['name'],
+        "start_time": round(float(context.get('from_time', default_start)), 2),
+        "end_time": round(float(context.get('end_time', default_end)), 2),
+        "notes": context['notes']
+    }
+
+def add_failed_chunk(final_sections, ongoing_context, chunk):
+    """
+    Keep a chunk whose analysis failed as a placeholder section (picked up by
+    /api/retry-failed-sections) instead of dropping its transcript range.
+    Returns the new ongoing context (none: the carried topic is closed).
+    """
+    chunk_start = round(chunk['start_time'], 2)
+    if ongoing_context:
+        final_sections.append(context_to_section(ongoing_context, chunk_start, chunk_start))
+    final_sections.append({
+        "section_name": "Unprocessed transcript",
+        "start_time": chunk_start,
+        "end_time": round(chunk['end_time'], 2),
+        "notes": ["Error generating notes"]
+    })
+    return None
+
+def parse_seconds(value):
+    """A context time in seconds (number, "12.5", "12:30" or "1:02:03"), or None if unreadable"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-            
-            chunk_results = json.loads(response_text)
-            
-            # Process results
-            for res in chunk_results:
-                # Validate
-                if 'name' not in res or 'notes' not in res:
-                    continue
-                
-                # Logic for ongoing vs finished
-                if res.get('status') == 'ongoing':
-                    if ongoing_context and res['name'] == ongoing_context['name']:
-                        # Append NEW notes to existing ongoing context
-                        ongoing_context['notes'].extend(res['notes'])
-                        ongoing_context['end_time'] = res['end_time']
-                    else:
-                        # New ongoing context detected
-                        ongoing_context = res
-                else:
-                    # Finished context
-                    if ongoing_context and res['name'] == ongoing_context['name']:
-                        # It was ongoing, now finished. Combine and close.
-                        ongoing_context['notes'].extend(res['notes'])
-                        ongoing_context['end_time'] = res['end_time']
-                        final_sections.append({
-                            "section_name": ongoing_context['name'],
-                            "start_time": round(float(ongoing_context.get('from_time', chunk_start)), 2),
-                            "end_time": round(float(ongoing_context.get('end_time', chunk_end)), 2),
-                            "notes": ongoing_context['notes']
-                        })
-                        ongoing_context = None
-                    else:
-                        # Just a regular finished context in this chunk
-                        final_sections.append({
-                            "section_name": res['name'],
-                            "start_time": round(float(res.get('from_time', chunk_start)), 2),
-                            "end_time": round(float(res.get('end_time', chunk_end)), 2),
-                            "notes": res['notes']
-                        })
-                        ongoing_context = None
-            
-        except Exception as e:
-            print(f"Error processing chunk {i}: {e}")
+            seconds = 0.0
+            for part in value.strip().rstrip("s").split(":"):
+                seconds = seconds * 60 + float(part)
+            return seconds
+        except ValueError:
+            return None
+    return None
+
+def normalize_context(res, chunk_start, chunk_end):
+    """
+    Check one context of a chunk response: a name, a list of notes and numeric
+    times (unreadable times fall back to the chunk bounds). Returns None for
+    contexts that cannot be used.
+    """
+    if not isinstance(res, dict) or not res.get('name') or 'notes' not in res:
+        return None
+    notes = res['notes']
+    if isinstance(notes, str):
+        notes = [notes]
+    if not isinstance(notes, list):
+        return None
+    from_time = parse_seconds(res.get('from_time'))
+    end_time = parse_seconds(res.get('end_time'))
+    return {
+        **res,
+        'name': str(res['name']),
+        'notes': [str(note) for note in notes if note],
+        'from_time': from_time if from_time is not None else chunk_start,
+        'end_time': end_time if end_time is not None else chunk_end
+    }
+
+def merge_chunk_results(final_sections, ongoing_context, chunk_results, chunk_start, chunk_end):
+    """Fold one chunk's contexts into final_sections; returns the context still ongoing after it"""
+    carried_resolved = ongoing_context is None
+    next_ongoing = None
+    
+    if isinstance(chunk_results, dict):
+        chunk_results = [chunk_results]
+    elif not isinstance(chunk_results, list):
+        print(f"  ⚠️ Ignoring chunk response that is not a list of contexts ({chunk_start}s - {chunk_end}s)")
+        chunk_results = []
+    
+    for res in chunk_results:
+        # Validate (a malformed context is skipped rather than failing the whole summary)
+        res = normalize_context(res, chunk_start, chunk_end)
+        if res is None:
+            continue
+        
+        # Pipelined chunks flag a continued topic instead of knowing its name
+        if res.get('continues_previous') and ongoing_context and not carried_resolved:
+            res['name'] = ongoing_context['name']
+        
+        if not carried_resolved and res['name'] == ongoing_context['name']:
+            # The topic handed over from the previous chunk: append its NEW notes
+            ongoing_context['notes'].extend(res['notes'])
+            ongoing_context['end_time'] = res['end_time']
+            carried_resolved = True
+            if res.get('status') == 'ongoing':
+                next_ongoing = ongoing_context
+            else:
+                # It was ongoing, now finished. Combine and close.
+                final_sections.append(context_to_section(ongoing_context, chunk_start, chunk_end))
+        elif res.get('status') == 'ongoing':
+            # New ongoing context detected (only the last one can carry forward)
+            if next_ongoing is not None:
+                final_sections.append(context_to_section(next_ongoing, chunk_start, chunk_end))
+            next_ongoing = res
+        else:
+            # Just a regular finished context in this chunk
+            final_sections.append(context_to_section(res, chunk_start, chunk_end))
+    
+    if not carried_resolved:
+        # The handed-over topic did not come up again: close it where it last ended
+        final_sections.append(context_to_section(ongoing_context, chunk_start, chunk_start))
+    
+    return next_ongoing
+
+# Per-chunk token counts (estimated transcript tokens and the prompt/response tokens
+# reported by the API) of recent chunk prompts, for tuning LLM_CHUNK_TOKEN_BUDGET
+chunk_token_log = deque(maxlen=500)
+chunk_token_lock = threading.Lock()
+
+def record_chunk_tokens(chunk, chunk_text, prompt, response, seconds):
+    """Log the token counts of one chunk prompt"""
+    usage = getattr(response, "usage_metadata", None) if response is not None else None
+    prompt_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+    response_tokens = getattr(usage, "candidates_token_count", None) if usage else None
+    entry = {
+        "duration": round(chunk['end_time'] - chunk['start_time'], 2),
+        "segments": len(chunk['segments']),
+        "transcript_tokens": estimate_tokens(chunk_text),
+        "estimated_prompt_tokens": estimate_tokens(prompt),
+        "prompt_tokens": prompt_tokens if isinstance(prompt_tokens, int) else None,
+        "response_tokens": response_tokens if isinstance(response_tokens, int) else None,
+        "seconds": round(seconds, 2),
+        "failed": response is None
+    }
+    with chunk_token_lock:
+        chunk_token_log.append(entry)
+    return entry
+
+def get_chunk_token_stats():
+    """Token statistics of recent chunk prompts"""
+    with chunk_token_lock:
+        entries = list(chunk_token_log)
+    
+    def average(key):
+        values = [entry[key] for entry in entries if entry[key] is not None]
+        return round(sum(values) / len(values), 1) if values else None
+    
+    return {
+        "token_budget": LLM_CHUNK_TOKEN_BUDGET,
+        "chunks": len(entries),
+        "failed": sum(1 for entry in entries if entry["failed"]),
+        "avg_transcript_tokens": average("transcript_tokens"),
+        "max_transcript_tokens": max((entry["transcript_tokens"] for entry in entries), default=None),
+        "avg_prompt_tokens": average("prompt_tokens") or average("estimated_prompt_tokens"),
+        "avg_response_tokens": average("response_tokens"),
+        "avg_duration": average("duration"),
+        "avg_seconds": average("seconds"),
+        "recent": entries[-10:]
+    }
+
+def analyse_stream_chunk(index, total, chunk, ongoing_context=None, pipelined=False):
+    """Send one chunk prompt; returns the parsed contexts, or None if the call failed"""
+    chunk_start = round(chunk['start_time'], 2)
+    chunk_end = round(chunk['end_time'], 2)
+    print(f"  🌊 Stream Processing Chunk {index+1}/{total or '?'} ({chunk_start}s - {chunk_end}s)...")
+    
+    # Get text for this chunk
+    chunk_text = get_segments_text(chunk['segments'], target_duration=60)
+    # The first chunk has no previous chunk to hand a topic over from, wherever it starts
+    prompt = build_chunk_prompt(chunk_text, chunk_start, chunk_end, ongoing_context, pipelined=pipelined and index > 0)
+    start = time.time()
+    response = None
+    try:
+        # Keep the response for its token counts
+        response, chunk_results = call_llm(
+            prompt, parse=lambda response: (response, parse_json_response(response)),
+            description=f"Chunk {index+1}"
+        )
+        return chunk_results
+    except Exception as e:
+        print(f"Error processing chunk {index}: {e}")
+        return None
+    finally:
+        entry = record_chunk_tokens(chunk, chunk_text, prompt, response, time.time() - start)
+        print(f"  🧮 Chunk {index+1}: ~{entry['transcript_tokens']} transcript tokens, "
+              f"{entry['prompt_tokens'] or entry['estimated_prompt_tokens']} prompt tokens")
+
+def process_chunk_stream(segments, model, meeting_type="REGULAR_MEETING", pipelined=None):
+    """
+    Single-pass processing: Process segments in chunks, identifying contexts
+    and generating/updating notes in real-time.
+    """
+    chunks = chunk_by_time(segments, chunk_duration=LLM_CHUNK_MAX_SECONDS, token_budget=LLM_CHUNK_TOKEN_BUDGET)
+    
+    print(f"Processing transcript in {len(chunks)} stream chunks...")
+    
+    concurrency = len(GEMINI_API_KEYS) * GEMINI_PER_KEY_CONCURRENCY
+    if pipelined is None:
+        pipelined = GEMINI_PIPELINED_CHUNKS and concurrency > 1 and len(chunks) > 1
+    if pipelined:
+        return process_chunk_stream_pipelined(chunks, max(concurrency, 1))
+    
+    final_sections = []
+    ongoing_context = None
+    
+    for i, chunk in enumerate(chunks):
+        chunk_results = analyse_stream_chunk(i, len(chunks), chunk, ongoing_context)
+        if chunk_results is None:
+            ongoing_context = add_failed_chunk(final_sections, ongoing_context, chunk)
             continue
+        
+        # Process results
+        ongoing_context = merge_chunk_results(
+            final_sections, ongoing_context, chunk_results,
+            round(chunk['start_time'], 2), round(chunk['end_time'], 2)
+        )
 
-    # After all chunks, if there's still an ongoing context, close it
+    return close_ongoing_context(final_sections, ongoing_context, chunks)
+
+def close_ongoing_context(final_sections, ongoing_context, chunks):
+    """After all chunks, if there's still an ongoing context, close it"""
     if ongoing_context:
-        final_sections.append({
-            "section_name": ongoing_context['name'],
-            "start_time": round(float(ongoing_context.get('from_time', 0)), 2),
-            "end_time": round(float(ongoing_context.get('end_time', chunks[-1]['end_time'])), 2),
-            "notes": ongoing_context['notes']
-        })
+        final_sections.append(context_to_section(ongoing_context, 0, chunks[-1]['end_time']))
 
+    # Topics closed at a chunk boundary are appended late; keep the timeline order
+    final_sections.sort(key=lambda section: section['start_time'])
     return final_sections
 
+def merge_pipelined_results(chunks, chunk_results):
+    """Stitch independently analysed chunks together exactly as in sequential mode"""
+    final_sections = []
+    ongoing_context = None
+    for chunk, results in zip(chunks, chunk_results):
+        if results is None:
+            ongoing_context = add_failed_chunk(final_sections, ongoing_context, chunk)
+            continue
+        ongoing_context = merge_chunk_results(
+            final_sections, ongoing_context, results,
+            round(chunk['start_time'], 2), round(chunk['end_time'], 2)
+        )
+    
+    return close_ongoing_context(final_sections, ongoing_context, chunks)
+
+def process_chunk_stream_pipelined(chunks, concurrency):
+    """Send all chunk prompts concurrently, then reconcile context hand-offs in timeline order"""
+    print(f"  🚀 Pipelining {len(chunks)} chunks with up to {concurrency} concurrent calls...")
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        chunk_results = list(executor.map(
+            lambda i, chunk: analyse_stream_chunk(i, len(chunks), chunk, pipelined=True),
+            range(len(chunks)), chunks
+        ))
+    
+    return merge_pipelined_results(chunks, chunk_results)
+
+# Incremental summarization: while a recording is transcribed, every chunk (see
+# ChunkBuilder) is sent to the LLM as soon as its segments exist (in order,
+# carrying the ongoing context forward, or concurrently in pipelined mode), so the
+# minutes are ready shortly after the last segment instead of after a second pass.
+INCREMENTAL_SUMMARY = get_setting("INCREMENTAL_SUMMARY", True)
+
+class IncrementalSummarizer:
+    """Runs the chunk stream alongside transcription, fed one segment at a time"""
+    
+    def __init__(self, session_id, diarization=None):
+        self.session_id = session_id
+        # Chunks analysed after the diarization has finished name the speakers in their prompts
+        self.diarization = diarization
+        concurrency = len(GEMINI_API_KEYS) * GEMINI_PER_KEY_CONCURRENCY
+        self.pipelined = GEMINI_PIPELINED_CHUNKS and concurrency > 1
+        # A single worker keeps sequential chunks in timeline order
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency if self.pipelined else 1,
+            thread_name_prefix=f"summary-{session_id[:8]}"
+        )
+        self.builder = ChunkBuilder(LLM_CHUNK_MAX_SECONDS, LLM_CHUNK_TOKEN_BUDGET)
+        self.chunks = []
+        self.futures = []
+        self.sample = []
+        self.meeting_type = None
+        self.final_sections = []
+        self.ongoing_context = None
+    
+    def add_segment(self, segment):
+        """Feed the next transcribed segment (without words)"""
+        if self.meeting_type is None:
+            self.sample.append(segment)
+            if len(self.sample) == 10:
+                self.meeting_type = self.executor.submit(detect_meeting_type, self.sample)
+        
+        chunk = self.builder.add(segment)
+        if chunk:
+            self.submit(chunk)
+    
+    def submit(self, chunk):
+        index = len(self.chunks)
+        self.chunks.append(chunk)
+        if self.pipelined:
+            self.futures.append(self.executor.submit(self.analyse, index, chunk, None, True))
+        else:
+            self.futures.append(self.executor.submit(self.process_in_order, index, chunk))
+    
+    def analyse(self, index, chunk, ongoing_context=None, pipelined=False):
+        """
+        analyse_stream_chunk, with the chunk's segments tagged with speakers when the
+        diarization is already done. It is not waited for: that would hold back every
+        chunk until the whole recording is diarized, so earlier chunks go unlabelled.
+        """
+        turns = None
+        if self.diarization and self.diarization.done():
+            turns = get_diarization_turns(self.diarization)
+        if turns:
+            assign_speakers(chunk['segments'], turns)
+        return analyse_stream_chunk(index, None, chunk, ongoing_context, pipelined)
+    
+    def process_in_order(self, index, chunk):
+        """Sequential mode: analyse a chunk with the context carried over from the previous one"""
+        chunk_results = self.analyse(index, chunk, self.ongoing_context)
+        if chunk_results is None:
+            self.ongoing_context = add_failed_chunk(self.final_sections, self.ongoing_context, chunk)
+        else:
+            self.ongoing_context = merge_chunk_results(
+                self.final_sections, self.ongoing_context, chunk_results,
+                round(chunk['start_time'], 2), round(chunk['end_time'], 2)
+            )
+        return chunk_results
+    
+    def finish(self):
+        """Send the last partial chunk, wait for all chunks and return (meeting_type, sections)"""
+        chunk = self.builder.flush()
+        if chunk:
+            self.submit(chunk)
+        if self.meeting_type is None:
+            self.meeting_type = self.executor.submit(detect_meeting_type, self.sample)
+        
+        chunk_results = []
+        for future in self.futures:
+            try:
+                chunk_results.append(future.result())
+            except Exception as e:
+                print(f"Error processing chunk: {e}")
+                chunk_results.append(None)
+        meeting_type = self.meeting_type.result()
+        self.executor.shutdown()
+        
+        print(f"  ⏱️ Incremental summary: {len(self.chunks)} chunk(s) analysed during transcription")
+        if not self.chunks:
+            return meeting_type, []
+        if self.pipelined:
+            return meeting_type, merge_pipelined_results(self.chunks, chunk_results)
+        return meeting_type, close_ongoing_context(self.final_sections, self.ongoing_context, self.chunks)
+    
+    def cancel(self):
+        """Drop pending chunk calls (the transcription failed)"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
-def generate_summary(session_id, full_text, segments):
-    """Generate structured summary using streamed chunk processing"""
+def generate_summary(session_id, full_text, segments, meeting_type=None, sections=None):
+    """
+    Generate structured summary using streamed chunk processing. meeting_type and
+    sections may already be known (see IncrementalSummarizer).
+    """
     try:
         model = get_model()
         
         print(f"Starting optimized stream summarization for session {session_id}...")
         
         # Step 1: Detect meeting type
-        meeting_type = detect_meeting_type(segments)
+        if meeting_type is None:
+            meeting_type = detect_meeting_type(segments)
         print(f"  Detected meeting type: {meeting_type}")
 
         # Step 2: Stream Process (Contexts + Notes in one pass)
-        sections = process_chunk_stream(segments, model, meeting_type)
+        if sections is None:
+            sections = process_chunk_stream(segments, model, meeting_type)
         print(f"  Generated {len(sections)} sections via stream processing.")
+        save_section_contexts(session_id, meeting_type, sections)
                 
         # Step 4: Generate overall summary, conclusion, and action items
         print("  Generating overall summary...")
         print("  📝 Prompting AI: Generating final summary and conclusion...")
-        model = get_model()  # Get new model instance to rotate keys
         
         # Create summary of all sections
         sections_summary = ""
@@ -861,17 +4270,7 @@ Return JSON:
 
 IMPORTANT: Return ONLY valid JSON, no markdown."""
         
-        response = model.generate_content(final_prompt)
-        response_text = response.text.strip()
-        
-        # Clean markdown
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-            response_text = response_text.strip()
-        
-        final_data = json.loads(response_text)
+        final_data = call_llm(final_prompt, parse=parse_json_response, description="Final summary")
         
         # Combine everything
         summary_data = {
@@ -888,7 +4287,6 @@ IMPORTANT: Return ONLY valid JSON, no markdown."""
         # For incident reports, generate additional incident_report section
         if meeting_type == "INCIDENT_REPORT":
             print("  📝 Prompting AI: Generating incident report section...")
-            model = get_model()  # Get new model instance to rotate keys
             
             incident_prompt = f"""You are generating the INCIDENT REPORT section of a formal investigation report.
 
@@ -946,23 +4344,11 @@ IMPORTANT:
 - Each item should be 1-2 sentences
 - Focus on KEY information only"""
             
-            response = model.generate_content(incident_prompt)
-            response_text = response.text.strip()
-            
-            # Clean markdown
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            
-            incident_report_data = json.loads(response_text)
+            incident_report_data = call_llm(incident_prompt, parse=parse_json_response, description="Incident report")
             summary_data["incident_report"] = incident_report_data
         
         # Save summary
-        summary_path = os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(summary_data, f, indent=2)
+        write_summary(session_id, summary_data)
         
         print(f"  Summary generation complete!")
             
@@ -976,9 +4362,32 @@ IMPORTANT:
             "error": str(e),
             "generated_at": datetime.now().isoformat()
         }
-        summary_path = os.path.join(SUMMARY_FOLDER, f"{session_id}_summary.json")
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(error_data, f, indent=2)
+        write_json_file(get_summary_path(session_id), error_data)
+
+session_storage_migration_started = False
+
+def run_startup_migrations():
+    """One-off background upgrades of sessions written by older versions"""
+    migrate_session_storage_all()
+    backfill_search_index()
+
+def start_background_workers():
+    """Start the transcription workers (this also resumes interrupted jobs) and the startup migrations"""
+    global session_storage_migration_started
+    ensure_transcription_workers()
+    if not session_storage_migration_started:
+        session_storage_migration_started = True
+        threading.Thread(target=run_startup_migrations, daemon=True).start()
+
+@app.before_request
+def ensure_background_workers():
+    """Under a WSGI server (which imports the app instead of running it), start the workers with the first request"""
+    start_background_workers()
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    debug = True
+    # The reloader runs the app in a child process (WERKZEUG_RUN_MAIN=true); the parent
+    # only watches files, so it must not claim and run jobs itself
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_workers()
+    app.run(debug=debug)
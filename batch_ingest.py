@@ -0,0 +1,256 @@
+"""
+Transcribe (and summarize) a folder of archived recordings without the web server.
+
+Every audio file under the folder goes through the same pipeline as an upload:
+it is stored content-addressed in uploads/, transcribed by process_transcription
+(which decodes it, falling back to convert_to_wav, and calls generate_summary when
+Gemini API keys are configured) and appears in /api/sessions like any other session.
+Files are processed by a pool of worker processes.
+
+Progress is appended to a checkpoint file, so an interrupted run resumes where it
+stopped: files already done are skipped (failed ones are retried), as are
+recordings whose transcript exists already (same audio and model settings).
+Files whose summary failed are recorded as summary_failed; on the next run their
+transcript is reused and only the summary is generated again.
+
+Usage:
+    python batch_ingest.py /archive/meetings
+    python batch_ingest.py /archive/meetings --workers 4 --model small --compute-type int8
+    python batch_ingest.py /archive/meetings --no-summary --checkpoint cache/archive.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from werkzeug.datastructures import FileStorage
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".wma", ".webm", ".mp4", ".amr", ".3gp"}
+DEFAULT_CHECKPOINT = os.path.join("cache", "batch_ingest.jsonl")
+
+app = None
+ingest_options = {}
+
+
+def find_recordings(folder):
+    """Audio files under folder (recursively), in a stable order"""
+    recordings = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                recordings.append(os.path.abspath(os.path.join(root, name)))
+    return recordings
+
+
+def file_signature(path):
+    """Checkpoint key of a file: a file that is replaced or modified is processed again"""
+    stat = os.stat(path)
+    return f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def hash_file(path):
+    """SHA-256 of a file, the key the uploads are stored under"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def load_checkpoint(path):
+    """Latest checkpoint entry per file signature"""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line cut short by an interrupted run
+                entries[entry["signature"]] = entry
+    return entries
+
+
+def get_summary_error(session_id):
+    """Why a session has no usable summary (missing, an error record, no sections), or None"""
+    try:
+        summary = app.read_json_file(app.get_summary_path(session_id))
+    except FileNotFoundError:
+        return "summary missing"
+    except ValueError as e:
+        return f"unreadable summary: {e}"
+    if summary.get("error"):
+        return summary["error"]
+    if not summary.get("sections"):
+        return "summary has no sections"
+    return None
+
+
+def init_worker(model_size, device, compute_type, workers, summarize):
+    """Import the app once per worker process and split the CPU cores between the workers"""
+    global app
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as transcriber_app
+    app = transcriber_app
+
+    # Each worker transcribes one file at a time, synchronously: no short-clip batcher,
+    # no long-file process pool (the files themselves are the unit of parallelism)
+    app.BATCH_SHORT_JOBS = False
+    app.LONG_FILE_WORKERS = 1
+    app.TRANSCRIPTION_WORKERS = 1
+    app.WHISPER_CPU_THREADS = max(1, app.CPU_CORES // workers)
+    if not summarize:
+        app.GEMINI_API_KEYS = []
+    ingest_options.update(model_size=model_size, device=device, compute_type=compute_type)
+
+
+def ingest_file(path):
+    """Transcribe one recording (or reuse its transcript) and return its checkpoint entry"""
+    start = time.time()
+    filename = os.path.basename(path)
+    model_size, device, compute_type = app.resolve_model_settings(
+        ingest_options["model_size"], ingest_options["device"], ingest_options["compute_type"]
+    )
+
+    with open(path, "rb") as f:
+        audio_hash, stored_filename, _ = app.save_upload(FileStorage(stream=f, filename=filename))
+    stored_path = os.path.abspath(os.path.join(app.UPLOAD_FOLDER, stored_filename))
+    audio_seconds = app.probe_audio_duration(stored_path) or 0.0
+    if model_size == "auto":
+        model_size, _ = app.choose_model_tier(audio_seconds)
+    entry = {"path": path, "audio_hash": audio_hash, "model_size": model_size, "audio_seconds": round(audio_seconds, 2)}
+
+    cache_key = app.get_transcript_cache_key(audio_hash, model_size, compute_type)
+    session_id = app.get_cached_transcript(cache_key)
+    if session_id:
+        entry.update(session_id=session_id, status="cached")
+        # Transcribed before, but the summary failed or was skipped: only summarize
+        if app.GEMINI_API_KEYS and get_summary_error(session_id):
+            session_data = app.read_json_file(os.path.join(app.SESSION_FOLDER, f"{session_id}.json"))
+            segments = app.strip_words_from_segments(session_data.get("segments", []))
+            app.generate_summary(session_id, session_data.get("text", ""), segments)
+            entry["status"] = "summarized"
+    else:
+        session_id = str(uuid.uuid4())
+        app.process_transcription(session_id, stored_path, filename, model_size, device, compute_type, audio_hash)
+        status = app.processing_status.get(session_id, {})
+        if status.get("status") == "error":
+            entry.update(session_id=session_id, status="failed", error=status.get("error"))
+        else:
+            entry.update(session_id=session_id, status="done", transcribed=True)
+
+    # generate_summary records its failures in the summary file instead of raising
+    if entry["status"] in ("done", "summarized") and app.GEMINI_API_KEYS:
+        summary_error = get_summary_error(session_id)
+        if summary_error:
+            entry.update(status="summary_failed", error=summary_error)
+
+    entry["seconds"] = round(time.time() - start, 2)
+    return entry
+
+
+def format_hours(seconds):
+    return f"{seconds / 3600:.2f}h"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and summarize every recording in a folder, resumably")
+    parser.add_argument("folder", help="Folder of recordings (searched recursively)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Worker processes, each transcribing one file at a time")
+    parser.add_argument("--model", default=None, help="Whisper model size (default: WHISPER_MODEL_SIZE)")
+    parser.add_argument("--device", default=None, help="Device (default: WHISPER_DEVICE)")
+    parser.add_argument("--compute-type", default=None, help="Compute type (default: WHISPER_COMPUTE_TYPE)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file used to resume runs")
+    parser.add_argument("--no-summary", action="store_true", help="Only transcribe, without Gemini minutes")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"{args.folder} is not a folder")
+
+    checkpoint = load_checkpoint(args.checkpoint)
+    # Failed files are tried again, summary_failed ones only get a new summary
+    done_statuses = {"done", "cached", "summarized"}
+    recordings = find_recordings(args.folder)
+    pending = [path for path in recordings
+               if checkpoint.get(file_signature(path), {}).get("status") not in done_statuses]
+    print(f"📂 {len(recordings)} recording(s) found, {len(recordings) - len(pending)} already in the checkpoint, "
+          f"{len(pending)} to process with {args.workers} worker(s)")
+    if not pending:
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.checkpoint)), exist_ok=True)
+    counts = {"done": 0, "cached": 0, "summarized": 0, "summary_failed": 0, "failed": 0}
+    audio_seconds = 0.0
+    start = time.time()
+    with open(args.checkpoint, "a", encoding="utf-8") as checkpoint_file, ProcessPoolExecutor(
+        max_workers=args.workers, initializer=init_worker,
+        initargs=(args.model, args.device, args.compute_type, args.workers, not args.no_summary)
+    ) as executor:
+        # Copies of the same recording wait for the first one, then reuse its transcript
+        futures = {}
+        copies = {}
+        for path in pending:
+            audio_hash = hash_file(path)
+            if audio_hash in copies:
+                copies[audio_hash].append(path)
+            else:
+                copies[audio_hash] = []
+                futures[executor.submit(ingest_file, path)] = (path, audio_hash)
+
+        processed = 0
+        try:
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path, audio_hash = futures.pop(future)
+                    if copies[audio_hash]:
+                        copy = copies[audio_hash].pop(0)
+                        futures[executor.submit(ingest_file, copy)] = (copy, audio_hash)
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        entry = {"path": path, "status": "failed", "error": str(e)}
+                    entry["signature"] = file_signature(path)
+                    entry["finished_at"] = datetime.now().isoformat()
+                    checkpoint_file.write(json.dumps(entry) + "\n")
+                    checkpoint_file.flush()
+
+                    processed += 1
+                    counts[entry["status"]] += 1
+                    if entry.get("transcribed"):
+                        audio_seconds += entry.get("audio_seconds", 0.0)
+                    elapsed = time.time() - start
+                    rate = audio_seconds / elapsed if elapsed else 0
+                    print(f"[{processed}/{len(pending)}] {entry['status']:<10} {os.path.relpath(path, args.folder)}"
+                          f"{' (' + entry['error'] + ')' if entry.get('error') else ''} "
+                          f"- {format_hours(audio_seconds)} of audio in {format_hours(elapsed)}, {rate:.1f} audio-h/h")
+        except KeyboardInterrupt:
+            print("\n⏹️ Interrupted, finished files are in the checkpoint; run again to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise SystemExit(1)
+
+    elapsed = time.time() - start
+    print(f"\n{'transcribed':<12} {counts['done']:>6}")
+    print(f"{'reused':<12} {counts['cached'] + counts['summarized']:>6}  ({counts['summarized']} re-summarized)")
+    print(f"{'no summary':<12} {counts['summary_failed']:>6}  (summarized again on the next run)")
+    print(f"{'failed':<12} {counts['failed']:>6}")
+    print(f"{'audio':<12} {format_hours(audio_seconds):>6}")
+    print(f"{'wall time':<12} {format_hours(elapsed):>6}")
+    print(f"\nThroughput: {audio_seconds / elapsed if elapsed else 0:.1f} audio-hours per wall-hour")
+
+
+if __name__ == "__main__":
+    main()
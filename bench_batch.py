@@ -0,0 +1,98 @@
+"""
+Benchmark batched transcription of short clips against one transcribe call per clip.
+
+Each mode runs in a fresh subprocess with the same model settings.
+
+Usage:
+    python bench_batch.py path/to/clips/             # every audio file in the folder
+    python bench_batch.py voicemail.mp3 --count 200  # one clip repeated 200 times
+    python bench_batch.py path/to/clips/ --model base --batch-size 16
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def load_clips(path, count):
+    """Decode the clips to benchmark (a folder of files, or one file repeated `count` times)"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path))
+    else:
+        files = [path]
+    clips = [app.load_audio(file, "bench-batch", mode="pyav")[0] for file in files]
+    if count:
+        clips = [clips[i % len(clips)] for i in range(count)]
+    return app, clips
+
+
+def run_worker(mode, path, count, model_size, compute_type, batch_size):
+    """Transcribe every clip with the given mode and print the result as JSON"""
+    app, clips = load_clips(path, count)
+    app.BATCH_SIZE = batch_size
+    audio_seconds = sum(len(clip) for clip in clips) / app.SAMPLE_RATE
+
+    with app.pooled_whisper_model(model_size, "cpu", compute_type) as model:
+        start = time.time()
+        segment_count = 0
+        if mode == "batched":
+            pipeline = app.BatchedInferencePipeline(model)
+            for i in range(0, len(clips), app.BATCH_MAX_CLIPS):
+                for segments, skipped in app.transcribe_clips(pipeline, clips[i:i + app.BATCH_MAX_CLIPS]):
+                    segment_count += len(segments)
+        else:
+            for clip in clips:
+                segments, info = model.transcribe(clip, **app.get_transcribe_options())
+                segment_count += sum(1 for _ in segments)
+        elapsed = time.time() - start
+
+    print(json.dumps({
+        "mode": mode,
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 1),
+        "seconds": round(elapsed, 2),
+        "segments": segment_count
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batched and one-at-a-time transcription of short clips")
+    parser.add_argument("path", help="Audio file or folder of audio files")
+    parser.add_argument("--count", type=int, default=0, help="Repeat the clips up to this many (e.g. 200)")
+    parser.add_argument("--model", default="tiny", help="Whisper model size")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--batch-size", type=int, default=16, help="BATCH_SIZE for the batched pipeline")
+    parser.add_argument("--worker", choices=["sequential", "batched"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.path, args.count, args.model, args.compute_type, args.batch_size)
+        return
+
+    results = {}
+    print(f"{'mode':<11} {'clips':>6} {'audio (s)':>10} {'time (s)':>9} {'clips/s':>8} {'segments':>9}")
+    for mode in ("sequential", "batched"):
+        command = [sys.executable, os.path.abspath(__file__), args.path, "--worker", mode,
+                   "--count", str(args.count), "--model", args.model,
+                   "--compute-type", args.compute_type, "--batch-size", str(args.batch_size)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{mode:<11} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        results[mode] = stats
+        rate = stats["clips"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"{mode:<11} {stats['clips']:>6} {stats['audio_seconds']:>10.1f} {stats['seconds']:>9.2f} "
+              f"{rate:>8.2f} {stats['segments']:>9}")
+
+    if "sequential" in results and "batched" in results and results["batched"]["seconds"]:
+        print(f"\nBatched speed-up: {results['sequential']['seconds'] / results['batched']['seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
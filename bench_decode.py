@@ -0,0 +1,89 @@
+"""
+Benchmark the audio decode modes used by process_transcription.
+
+Each mode runs in a fresh subprocess so peak RSS is measured in isolation.
+
+Usage:
+    python bench_decode.py path/to/meeting.mp3
+    python bench_decode.py path/to/meeting.mp3 --transcribe --model tiny
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its children, in MB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, children) / divisor
+
+
+def run_worker(mode, audio_path, transcribe, model_size):
+    """Decode (and optionally transcribe) once with the given mode and print the result as JSON"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+
+    start = time.time()
+    audio, temp_path = app.load_audio(audio_path, f"bench-{mode}", mode=mode)
+    decode_seconds = time.time() - start
+    samples = len(audio) if not isinstance(audio, str) else None
+
+    transcribe_seconds = None
+    if transcribe:
+        start = time.time()
+        with app.pooled_whisper_model(model_size, "cpu", "int8") as model:
+            segments, info = model.transcribe(audio, word_timestamps=True)
+            for _ in segments:
+                pass
+        transcribe_seconds = time.time() - start
+
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    print(json.dumps({
+        "mode": mode,
+        "decode_seconds": round(decode_seconds, 3),
+        "transcribe_seconds": round(transcribe_seconds, 3) if transcribe_seconds is not None else None,
+        "samples": samples,
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare audio decode modes (wall time and peak RSS)")
+    parser.add_argument("audio_path")
+    parser.add_argument("--modes", default="pyav,pipe,wav", help="Comma-separated decode modes")
+    parser.add_argument("--transcribe", action="store_true", help="Also run Whisper on the decoded audio")
+    parser.add_argument("--model", default="tiny", help="Whisper model size used with --transcribe")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.audio_path, args.transcribe, args.model)
+        return
+
+    print(f"{'mode':<6} {'wall (s)':>9} {'decode (s)':>11} {'transcribe (s)':>15} {'peak RSS (MB)':>14}")
+    for mode in args.modes.split(","):
+        command = [sys.executable, os.path.abspath(__file__), args.audio_path, "--worker", mode, "--model", args.model]
+        if args.transcribe:
+            command.append("--transcribe")
+        start = time.time()
+        result = subprocess.run(command, capture_output=True, text=True)
+        wall_seconds = time.time() - start
+        if result.returncode != 0:
+            print(f"{mode:<6} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        transcribe_seconds = stats["transcribe_seconds"] if stats["transcribe_seconds"] is not None else "-"
+        print(f"{mode:<6} {wall_seconds:>9.2f} {stats['decode_seconds']:>11.2f} {transcribe_seconds:>15} {stats['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
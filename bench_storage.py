@@ -0,0 +1,189 @@
+"""
+Benchmark session and summary storage on a synthetic 3-hour transcript.
+
+Compares the old writer (json.dump with indent=2, written in place) with the
+atomic compact writer used by the app, with the standard json module, with
+orjson (skipped when it is not installed) and with gzip-compressed summaries. Each mode runs in a
+fresh subprocess inside a temporary folder.
+
+Usage:
+    python bench_storage.py
+    python bench_storage.py --hours 6 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["legacy", "json", "orjson", "gzip"]
+PAGE_SEGMENTS = 200
+
+
+def make_transcript(hours):
+    """Segments of ~4s with word timestamps, like a Whisper transcript of `hours` of speech"""
+    rng = random.Random(42)
+    vocabulary = ["budget", "meeting", "project", "agreed", "next", "week", "the", "we", "should",
+                  "review", "customer", "report", "action", "deadline", "team", "update", "risk"]
+    segments = []
+    t = 0.0
+    while t < hours * 3600:
+        duration = rng.uniform(2.0, 6.0)
+        count = max(int(duration * 2.5), 1)
+        words = []
+        for i in range(count):
+            start = t + duration * i / count
+            words.append({"start": round(start, 2), "end": round(start + duration / count, 2),
+                          "word": rng.choice(vocabulary)})
+        segments.append({"id": len(segments), "start": round(t, 2), "end": round(t + duration, 2),
+                         "text": " ".join(word["word"] for word in words), "words": words})
+        t += duration + rng.uniform(0.0, 1.0)
+    return segments
+
+
+def make_summary(segments):
+    """Minutes with one section every ~10 minutes"""
+    sections = []
+    for start in range(0, int(segments[-1]["end"]), 600):
+        sections.append({"section_name": f"Topic at {start}s", "start_time": float(start),
+                         "end_time": float(start + 600),
+                         "notes": [f"Discussed item {i} of this topic and agreed on next steps" for i in range(8)]})
+    return {"session_id": "bench", "meeting_type": "REGULAR_MEETING", "sections": sections,
+            "summary": "Summary " * 200, "conclusion": "Conclusion " * 50, "action_items": []}
+
+
+def timed(function, repeat):
+    """Best wall time of `repeat` runs, in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_worker(mode, hours, repeat):
+    """Write and read the transcript and summary with one storage mode and print the result as JSON"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, repo)
+    os.chdir(tempfile.mkdtemp(prefix="bench-storage-"))
+    import app
+
+    if mode == "json":
+        app.orjson = None
+    elif mode == "orjson" and app.orjson is None:
+        # The app would fall back to the json module: don't report that as orjson
+        print(json.dumps({"mode": mode, "skipped": "orjson is not installed"}))
+        return
+    segments = make_transcript(hours)
+    summary = make_summary(segments)
+    # The middle page of the transcript, whatever its length
+    page_first = max(len(segments) // 2 - PAGE_SEGMENTS // 2, 0)
+    page_last = min(page_first + PAGE_SEGMENTS, len(segments))
+    session_path = os.path.join(app.SESSION_FOLDER, "bench.json")
+    summary_path = app.get_summary_path("bench")
+    metadata = {"session_id": "bench", "name": "bench.mp3", "text": " ".join(seg["text"] for seg in segments)}
+
+    if mode == "legacy":
+        def write_session():
+            with open(session_path, "w", encoding="utf-8") as f:
+                json.dump({**metadata, "segments": segments}, f, indent=2)
+
+        def write_summary():
+            with open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+
+        def read_session():
+            with open(session_path, "r", encoding="utf-8") as f:
+                json.load(f)
+
+        def read_page():
+            # Without the segment index the whole file has to be parsed
+            with open(session_path, "r", encoding="utf-8") as f:
+                json.load(f)["segments"][page_first:page_last]
+
+        def read_summary():
+            with open(summary_path, "r", encoding="utf-8") as f:
+                json.load(f)
+    else:
+        def write_session():
+            app.write_session_file(
+                session_path, metadata, ({**seg, "words": list(seg["words"])} for seg in segments),
+                words_path=app.get_session_words_path("bench"), index_path=app.get_segment_index_path("bench")
+            )
+
+        def write_summary():
+            app.write_json_file(summary_path, summary, compress=mode == "gzip")
+
+        def read_session():
+            app.read_json_file(session_path)
+
+        def read_page():
+            app.columns_cache.clear()
+            app.read_indexed_segments("bench", page_first, page_last)
+
+        def read_summary():
+            app.read_json_file(summary_path)
+
+    results = {
+        "mode": mode,
+        "segments": len(segments),
+        "write_session_ms": timed(write_session, repeat),
+        "read_session_ms": timed(read_session, repeat),
+        "read_page_ms": timed(read_page, repeat),
+        "write_summary_ms": timed(write_summary, repeat),
+        "read_summary_ms": timed(read_summary, repeat),
+        "session_kb": os.path.getsize(session_path) / 1024,
+        "summary_kb": os.path.getsize(summary_path) / 1024
+    }
+    if mode != "legacy":
+        results["session_kb"] += os.path.getsize(app.get_session_words_path("bench")) / 1024
+        results["session_kb"] += os.path.getsize(app.get_segment_index_path("bench")) / 1024
+    print(json.dumps({key: round(value, 1) if isinstance(value, float) else value for key, value in results.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare session/summary write and read costs per storage mode")
+    parser.add_argument("--hours", type=float, default=3.0, help="Length of the synthetic transcript")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.hours, args.repeat)
+        return
+
+    results = {}
+    print(f"{'mode':<7} {'segments':>8} {'write (ms)':>11} {'read (ms)':>10} {'page (ms)':>10} {'size (KB)':>10} "
+          f"{'sum. write':>11} {'sum. read':>10} {'sum. KB':>8}")
+    for mode in MODES:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", mode,
+                   "--hours", str(args.hours), "--repeat", str(args.repeat)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{mode:<7} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        if "skipped" in stats:
+            print(f"{mode:<7} skipped: {stats['skipped']}")
+            continue
+        results[mode] = stats
+        print(f"{mode:<7} {stats['segments']:>8} {stats['write_session_ms']:>11.1f} {stats['read_session_ms']:>10.1f} "
+              f"{stats['read_page_ms']:>10.1f} {stats['session_kb']:>10.0f} {stats['write_summary_ms']:>11.1f} "
+              f"{stats['read_summary_ms']:>10.1f} {stats['summary_kb']:>8.1f}")
+
+    if "legacy" in results:
+        for mode in MODES[1:]:
+            if mode in results and results[mode]["write_session_ms"]:
+                print(f"\n{mode}: session write {results['legacy']['write_session_ms'] / results[mode]['write_session_ms']:.1f}x, "
+                      f"page read {results['legacy']['read_page_ms'] / max(results[mode]['read_page_ms'], 0.1):.0f}x faster, "
+                      f"{1 - results[mode]['session_kb'] / results['legacy']['session_kb']:.0%} smaller", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
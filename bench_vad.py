@@ -0,0 +1,93 @@
+"""
+Benchmark the VAD pre-filter used by process_transcription.
+
+Transcribes the same recording with the VAD off and on, each in a fresh
+subprocess, and reports how much audio was skipped and the throughput gain.
+
+Usage:
+    python bench_vad.py path/to/meeting.mp3
+    python bench_vad.py path/to/meeting.mp3 --model small --compute-type int8
+    python bench_vad.py path/to/meeting.mp3 --vad-only    # VAD pass only, no Whisper
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def run_worker(vad, audio_path, model_size, compute_type, vad_only):
+    """Transcribe once with the VAD on or off and print the result as JSON"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    audio, temp_path = app.load_audio(audio_path, "bench-vad", mode="pyav")
+    audio_seconds = len(audio) / app.SAMPLE_RATE
+
+    start = time.time()
+    if vad_only:
+        options = app.get_transcribe_options(vad_filter=True)["vad_parameters"]
+        speech = get_speech_timestamps(audio, VadOptions(**options))
+        speech_seconds = sum(chunk["end"] - chunk["start"] for chunk in speech) / app.SAMPLE_RATE
+        skipped_seconds = audio_seconds - speech_seconds
+        segment_count = len(speech)
+    else:
+        with app.pooled_whisper_model(model_size, "cpu", compute_type) as model:
+            segments, info = model.transcribe(audio, **app.get_transcribe_options(vad_filter=vad))
+            segment_count = sum(1 for _ in segments)
+        skipped_seconds = app.get_vad_skipped_seconds(info) if vad else 0.0
+    elapsed = time.time() - start
+
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    print(json.dumps({
+        "vad": vad,
+        "audio_seconds": round(audio_seconds, 1),
+        "skipped_seconds": round(skipped_seconds, 1),
+        "seconds": round(elapsed, 2),
+        "segments": segment_count
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription throughput with and without the VAD pre-filter")
+    parser.add_argument("audio_path")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--vad-only", action="store_true", help="Only run the VAD pass and report the speech fraction")
+    parser.add_argument("--worker", choices=["on", "off"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker == "on", args.audio_path, args.model, args.compute_type, args.vad_only)
+        return
+
+    runs = ["on"] if args.vad_only else ["off", "on"]
+    results = {}
+    print(f"{'vad':<4} {'audio (s)':>10} {'skipped (s)':>12} {'time (s)':>9} {'x realtime':>11} {'segments':>9}")
+    for run in runs:
+        command = [sys.executable, os.path.abspath(__file__), args.audio_path, "--worker", run,
+                   "--model", args.model, "--compute-type", args.compute_type]
+        if args.vad_only:
+            command.append("--vad-only")
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{run:<4} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        results[run] = stats
+        speed = stats["audio_seconds"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"{run:<4} {stats['audio_seconds']:>10.1f} {stats['skipped_seconds']:>12.1f} "
+              f"{stats['seconds']:>9.2f} {speed:>11.1f} {stats['segments']:>9}")
+
+    if "on" in results and results["on"]["audio_seconds"]:
+        print(f"\nVAD skipped {results['on']['skipped_seconds'] / results['on']['audio_seconds']:.0%} of the audio")
+    if "on" in results and "off" in results and results["on"]["seconds"]:
+        print(f"Throughput gain with VAD: {results['off']['seconds'] / results['on']['seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
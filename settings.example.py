@@ -12,10 +12,103 @@ GEMINI_API_KEYS = [
     "your-gemini-api-key-5",
 ]
 
+# Per-key rate limits used by the key scheduler. Keys that return HTTP 429 cool
+# down with exponential backoff and requests move to the remaining keys.
+GEMINI_RPM_PER_KEY = 10           # Requests per minute per key
+GEMINI_TPM_PER_KEY = 250000       # Tokens per minute per key
+GEMINI_KEY_DISABLE_SECONDS = 600  # A key the API rejects (invalid, revoked) is skipped for this long
+
+# Concurrent Gemini calls per API key when summarising transcript chunks.
+# Chunks are sent in parallel (keys x this value) and stitched together afterwards.
+GEMINI_PER_KEY_CONCURRENCY = 1
+GEMINI_PIPELINED_CHUNKS = True
+
+# Summarise each ~1000s chunk as soon as it has been transcribed, so the minutes
+# are ready shortly after transcription ends
+INCREMENTAL_SUMMARY = True
+
+# Chunk prompts are sized by estimated transcript tokens. A chunk is closed at the
+# first pause of LLM_CHUNK_PAUSE_SECONDS once it holds LLM_CHUNK_PAUSE_FRACTION of
+# the budget, or at the longest pause seen when the budget is reached.
+# Per-chunk token counts are reported under "llm_chunks" in /api/stats.
+LLM_CHUNK_TOKEN_BUDGET = 4000     # Transcript tokens per chunk prompt
+LLM_CHUNK_PAUSE_FRACTION = 0.75
+LLM_CHUNK_PAUSE_SECONDS = 2.0
+LLM_CHUNK_MAX_SECONDS = 3600      # Upper bound on chunk length for sparse audio
+
+# Every LLM call has a per-attempt deadline; failed attempts are retried on another
+# key with jittered exponential backoff until LLM_MAX_ATTEMPTS or the total deadline.
+# Chunks that still fail are kept as "Error generating notes" sections, which
+# /api/retry-failed-sections regenerates in parallel.
+LLM_CALL_TIMEOUT_SECONDS = 120
+LLM_TOTAL_TIMEOUT_SECONDS = 300
+LLM_MAX_ATTEMPTS = 4
+LLM_BACKOFF_SECONDS = 2.0         # Base delay, doubled per attempt (with jitter)
+LLM_MAX_BACKOFF_SECONDS = 30.0
+
+# LLM response cache (cache/llm_cache.db), keyed by model name + prompt hash
+LLM_CACHE_ENABLED = True
+LLM_CACHE_TTL_SECONDS = 2592000   # 30 days
+LLM_CACHE_MAX_MB = 200            # Least recently used responses are evicted above this
+
 # Whisper Model Configuration
-WHISPER_MODEL_SIZE = "base"  # Options: tiny, base, small, medium, large
-WHISPER_DEVICE = "cpu"       # Options: cpu, cuda
+WHISPER_MODEL_SIZE = "base"  # Options: auto, tiny, base, small, medium, large
+WHISPER_DEVICE = "cpu"       # Options: cpu, cuda, auto
 WHISPER_COMPUTE_TYPE = "int8"  # Options: int8, float16, float32
+WHISPER_PRELOAD = True         # Load the default model(s) at startup instead of on the first upload
+WHISPER_AUTO_TIERS = ["tiny", "base", "small"]  # Candidates for "auto", fastest first
+WHISPER_ALLOWED_MODELS = ["auto", "tiny", "base", "small"]  # Sizes uploads may request (the default is always allowed)
+TARGET_WAIT_SECONDS = 600      # "auto" picks the largest tier expected to finish within this wait
+AUDIO_DECODE_MODE = "pyav"     # Options: pyav (in-process), pipe (ffmpeg to memory), wav (ffmpeg temp file)
+VAD_FILTER = True                 # Skip silence/non-speech (Silero VAD) before Whisper decodes it
+VAD_THRESHOLD = 0.5               # Speech probability above which audio counts as speech
+VAD_MIN_SILENCE_MS = 2000         # Only silences at least this long are removed
+VAD_SPEECH_PAD_MS = 400           # Audio kept around each speech region
+AUDIO_RENDITION_ENABLED = True    # Encode a low-bitrate Opus copy of each upload for playback
+AUDIO_RENDITION_BITRATE = 24000   # Bits per second of the Opus rendition
+WHISPER_MODEL_POOL_MAX_MB = 2048  # Memory budget for loaded models; idle models are evicted (LRU) above this
+
+# Long recordings are split at silences and transcribed in parallel worker processes
+LONG_FILE_MIN_SECONDS = 1800      # Recordings at least this long use long-file mode
+LONG_FILE_CHUNK_SECONDS = 600     # Target chunk length (split at the nearest pause)
+# LONG_FILE_WORKERS = 4           # Worker processes, each with its own model (default: CPU cores / 4)
+
+# Speaker diarization runs alongside Whisper and tags each segment with a speaker.
+# It is on when an embedding model is configured. DIARIZATION_ENABLED = True without
+# one clusters MFCCs instead (experimental, unvalidated on real meetings).
+# DIARIZATION_EMBEDDING_MODEL = "models/wespeaker_resnet34.onnx"  # [batch, frames, 80] fbank in, embedding out
+# DIARIZATION_ENABLED = True
+DIARIZATION_FBANK_WINDOW = "povey" # Frame window of the model's fbank front-end: povey (Kaldi) or hamming (WeSpeaker)
+DIARIZATION_THRESHOLD = 0.5       # Cosine distance between speaker centroids (embedding model only)
+DIARIZATION_MAX_SPEAKERS = 8
+DIARIZATION_WINDOW_SECONDS = 1.5  # Length of the embedded windows
+DIARIZATION_HOP_SECONDS = 0.75
+DIARIZATION_WORKERS = 2           # Recordings diarized at the same time
+
+# Transcription Queue
+# TRANSCRIPTION_WORKERS = 2       # Concurrent transcription jobs (default: CPU cores / 4)
+TRANSCRIPTION_QUEUE_SIZE = 20     # Waiting jobs accepted before uploads get HTTP 429
+
+# Short clips (voicemails etc.) are collected briefly and transcribed together in one batched pass
+BATCH_SHORT_JOBS = True
+BATCH_MAX_CLIP_SECONDS = 120      # Clips up to this length are batched
+BATCH_WINDOW_SECONDS = 2.0        # How long the first clip waits for others to join its batch
+BATCH_MAX_CLIPS = 64              # Clips per batch
+BATCH_SIZE = 16                   # 30s windows decoded in parallel by the batched pipeline
+
+# Job state (progress + queued jobs), shared by every worker process
+JOB_STATE_BACKEND = "sqlite"      # Options: sqlite (transcriber.db), redis (multi-host, needs `pip install redis`), memory
+# JOB_STATE_REDIS_URL = "redis://localhost:6379/0"
+JOB_STATE_TTL_SECONDS = 86400     # Finished job entries are purged after this
+JOB_LEASE_SECONDS = 90            # Jobs whose owner stops renewing this lease are resumed by another process
+JOB_MAX_ATTEMPTS = 3              # A job interrupted this many times (e.g. its input crashes the worker) is failed
+
+# Summaries and contexts are stored as compact JSON (orjson when installed);
+# set this to gzip-compress them (/api/summary serves them compressed as-is)
+SUMMARY_GZIP = False
+
+# Full-text search index (SQLite FTS5) over transcripts and minutes, served by /api/search
+SEARCH_INDEX_PATH = "cache/search.db"
 
 # Application Settings
 DEBUG = True
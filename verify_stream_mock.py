@@ -1,17 +1,25 @@
 
 import unittest
 from unittest.mock import MagicMock, patch
+import io
 import json
 import os
 import sys
+import tempfile
+import time
+from types import SimpleNamespace
 
 # Ensure we can import app
-sys.path.append(os.getcwd())
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # Mock settings.GEMINI_API_KEYS before importing app
 sys.modules['settings'] = MagicMock()
 sys.modules['settings'].GEMINI_API_KEYS = ['fake_key']
+# The app creates its folders and databases in the working directory: use a scratch one
+os.chdir(tempfile.mkdtemp(prefix="transcriber-test-"))
 
+import app
 from app import process_chunk_stream
+from google.api_core import exceptions as google_exceptions
 
 class TestStreamProcessing(unittest.TestCase):
     def setUp(self):
@@ -92,5 +100,282 @@ class TestStreamProcessing(unittest.TestCase):
         
         print("\n✅ Verification Successful: Logic handles context transitions and merging correctly.")
 
+class TestGeminiClientInjection(unittest.TestCase):
+    """Guard for the pinned SDK: per-key requests rely on GenerativeModel._client"""
+
+    def test_requests_use_the_per_key_client(self):
+        import google.generativeai as genai
+        from google.ai import generativelanguage as glm
+        import app
+
+        self.assertIn("_client", vars(genai.GenerativeModel("gemini-test")),
+                      "GenerativeModel no longer has _client; per-key clients need another path")
+
+        client = MagicMock()
+        client.generate_content.return_value = glm.GenerateContentResponse(candidates=[
+            glm.Candidate(content=glm.Content(parts=[glm.Part(text="hello")], role="model"))
+        ])
+        with patch('app.get_gemini_client', return_value=client) as get_client:
+            response = app.ScheduledGeminiModel(use_cache=False).generate_content("prompt")
+        get_client.assert_called_once_with('fake_key')
+        client.generate_content.assert_called_once()
+        self.assertEqual(response.text, "hello")
+
+class TestApiKeyScheduler(unittest.TestCase):
+    """Cooldown after 429s and failover to other keys (user-021)"""
+
+    KEYS = ['key_one_aaaaaaaaaaaa', 'key_two_bbbbbbbbbbbb']
+
+    def setUp(self):
+        self.scheduler = app.ApiKeyScheduler(self.KEYS, rpm=100, tpm=10 ** 6)
+
+    def test_rate_limited_key_cools_down(self):
+        key, reservation = self.scheduler.acquire()
+        self.scheduler.release(key, reservation, rate_limited=True)
+        for _ in range(3):
+            other, reservation = self.scheduler.acquire()
+            self.assertNotEqual(other, key)
+            self.scheduler.release(other, reservation)
+        # Only the cooling key left: the wait is bounded by the timeout
+        with self.assertRaises(RuntimeError):
+            self.scheduler.acquire(exclude={other}, timeout=0.2)
+
+    def test_rejected_keys_are_set_aside(self):
+        key, reservation = self.scheduler.acquire()
+        self.scheduler.release(key, reservation, rejected=True)
+        other, reservation = self.scheduler.acquire()
+        self.assertNotEqual(other, key)
+        self.scheduler.release(other, reservation, rejected=True)
+        with self.assertRaises(app.NoUsableApiKeyError):
+            self.scheduler.acquire()
+
+    def test_requests_fail_over_to_another_key(self):
+        used = []
+
+        def generate_content(model, prompt, **kwargs):
+            used.append(model._client)
+            if model._client == self.KEYS[0]:
+                raise google_exceptions.TooManyRequests("quota")
+            return SimpleNamespace(text="ok", usage_metadata=None)
+
+        with patch.object(app, 'api_key_scheduler', self.scheduler), \
+                patch.object(app, 'GEMINI_API_KEYS', self.KEYS), \
+                patch('app.get_gemini_client', side_effect=lambda key: key), \
+                patch('app.genai.GenerativeModel.generate_content', generate_content):
+            model = app.ScheduledGeminiModel(use_cache=False, avoid_keys={self.KEYS[1]})
+            response = model.generate_content("prompt")
+        self.assertEqual(response.text, "ok")
+        self.assertEqual(used, self.KEYS)
+        self.assertGreater(self.scheduler.keys[self.KEYS[0]]["cooldown_until"], time.time())
+
+class TestLlmCache(unittest.TestCase):
+    """Response cache expiry and caching only parsed responses (user-009)"""
+
+    def test_entries_expire_after_the_ttl(self):
+        app.llm_cache_put("model", "ttl prompt", "response")
+        self.assertEqual(app.llm_cache_get("model", "ttl prompt"), "response")
+        with patch.object(app, 'LLM_CACHE_TTL_SECONDS', -1):
+            self.assertIsNone(app.llm_cache_get("model", "ttl prompt"))
+        self.assertIsNone(app.llm_cache_get("model", "ttl prompt"))
+
+    def test_only_parsed_responses_are_cached(self):
+        replies = iter(['{"truncated": ', '{"ok": true}'])
+        scheduled = MagicMock(side_effect=lambda *args, **kwargs: SimpleNamespace(text=next(replies), usage_metadata=None))
+        with patch.object(app.ScheduledGeminiModel, '_generate_scheduled', scheduled), \
+                patch.object(app, 'LLM_CACHE_ENABLED', True), \
+                patch.object(app, 'LLM_BACKOFF_SECONDS', 0):
+            self.assertEqual(app.call_llm("parse prompt", parse=app.parse_json_response), {"ok": True})
+            self.assertEqual(app.llm_cache_get(app.GEMINI_MODEL_NAME, "parse prompt"), '{"ok": true}')
+            # Served from the cache the second time
+            self.assertEqual(app.call_llm("parse prompt", parse=app.parse_json_response), {"ok": True})
+        self.assertEqual(scheduled.call_count, 2)
+
+    def test_unparseable_responses_are_not_cached(self):
+        scheduled = MagicMock(return_value=SimpleNamespace(text="not json", usage_metadata=None))
+        with patch.object(app.ScheduledGeminiModel, '_generate_scheduled', scheduled), \
+                patch.object(app, 'LLM_CACHE_ENABLED', True), \
+                patch.object(app, 'LLM_BACKOFF_SECONDS', 0), \
+                patch.object(app, 'LLM_MAX_ATTEMPTS', 2):
+            with self.assertRaises(ValueError):
+                app.call_llm("bad prompt", parse=app.parse_json_response)
+        self.assertIsNone(app.llm_cache_get(app.GEMINI_MODEL_NAME, "bad prompt"))
+
+class TestSQLiteJobStore(unittest.TestCase):
+    """Job leases, claims and attempt counting (user-012)"""
+
+    def setUp(self):
+        self.store = app.SQLiteJobStore()
+        self.session_id = f"job-{time.time_ns()}"
+
+    def expire_lease(self):
+        conn = app.get_app_db()
+        conn.execute("UPDATE jobs SET lease_expires = 0 WHERE session_id = ?", (self.session_id,))
+        conn.commit()
+
+    def test_status_versions(self):
+        version = self.store.get_version(self.session_id)
+        self.store[self.session_id] = {"status": "processing", "progress": 10}
+        self.assertEqual(self.store.get(self.session_id)["progress"], 10)
+        self.assertEqual(self.store.wait_for_change(self.session_id, version, 0.1), version + 1)
+
+    def test_live_leases_are_not_claimed(self):
+        self.store.record_job(self.session_id, ["audio.wav"], 0, "owner-a")
+        self.store.renew_leases("owner-a")
+        self.assertNotIn(self.session_id, [job[0] for job in self.store.claim_stale_jobs("owner-b")])
+
+    def test_expired_lease_is_claimed_once(self):
+        self.store.record_job(self.session_id, ["audio.wav"], 2, "owner-a")
+        self.store.set_job_state(self.session_id, "running")
+        self.expire_lease()
+        claimed = [job for job in self.store.claim_stale_jobs("owner-b") if job[0] == self.session_id]
+        self.assertEqual(claimed, [(self.session_id, ("audio.wav",), 2, 2)])
+        # Compare-and-set: the new lease is live, so nobody else gets the job
+        self.assertNotIn(self.session_id, [job[0] for job in self.store.claim_stale_jobs("owner-c")])
+
+    def test_jobs_that_keep_crashing_are_failed(self):
+        self.store.record_job(self.session_id, ["audio.wav"], 0, "owner-a")
+        self.expire_lease()
+        with patch.object(app, 'processing_status', self.store), \
+                patch.object(app, 'JOB_MAX_ATTEMPTS', 1), \
+                patch('app.enqueue_transcription') as enqueue, \
+                patch('app.time.sleep', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                app.job_lease_keeper()
+        enqueue.assert_not_called()
+        self.assertEqual(self.store.get(self.session_id)["status"], "error")
+        state = app.get_app_db().execute("SELECT state FROM jobs WHERE session_id = ?", (self.session_id,)).fetchone()
+        self.assertEqual(state["state"], "failed")
+
+def make_segments(count):
+    return [{
+        "id": i, "start": i * 2.0, "end": i * 2.0 + 1.5, "text": f"segment {i}",
+        "words": [{"start": i * 2.0, "end": i * 2.0 + 0.5, "word": f"word{i}"}]
+    } for i in range(count)]
+
+class TestSessionStorage(unittest.TestCase):
+    """Session files, segment range reads and the legacy migration (user-023)"""
+
+    def setUp(self):
+        self.session_id = f"storage-{time.time_ns()}"
+        self.session_path = os.path.join(app.SESSION_FOLDER, f"{self.session_id}.json")
+
+    def test_round_trip_and_range_reads(self):
+        segments = make_segments(10)
+        count = app.write_session_file(
+            self.session_path, {"session_id": self.session_id, "name": "test.mp3"},
+            (dict(seg) for seg in segments),
+            words_path=app.get_session_words_path(self.session_id),
+            index_path=app.get_segment_index_path(self.session_id)
+        )
+        self.assertEqual(count, 10)
+        self.assertEqual(app.read_session_metadata(self.session_path), {"session_id": self.session_id, "name": "test.mp3"})
+        without_words = [{k: v for k, v in seg.items() if k != "words"} for seg in segments]
+        self.assertEqual(app.read_json_file(self.session_path)["segments"], without_words)
+        self.assertEqual(app.read_indexed_segments(self.session_id, 3, 7), without_words[3:7])
+        self.assertEqual(app.read_indexed_segments(self.session_id, 5, 5), [])
+        words = app.get_words_in_range(self.session_id, 4.0, 6.0)
+        self.assertEqual([(w["segment_id"], w["word"]) for w in words], [(2, "word2"), (3, "word3")])
+
+    def test_legacy_sessions_are_migrated(self):
+        segments = make_segments(5)
+        with open(self.session_path, "w", encoding="utf-8") as f:
+            json.dump({"session_id": self.session_id, "segments": segments}, f, indent=2)
+        self.assertTrue(app.migrate_session_storage(self.session_id))
+        self.assertFalse(app.migrate_session_storage(self.session_id))
+        self.assertEqual(app.read_indexed_segments(self.session_id, 1, 3)[0]["text"], "segment 1")
+        self.assertEqual(app.get_words_in_range(self.session_id)[4]["word"], "word4")
+
+class TestChunkBuilder(unittest.TestCase):
+    """Token-budget chunking at pauses (user-013)"""
+
+    @staticmethod
+    def segments(gaps):
+        """Segments of 11 estimated tokens each, separated by the given gaps"""
+        segments, t = [], 0.0
+        for i, gap in enumerate(gaps):
+            t += gap
+            segments.append({"id": i, "start": t, "end": t + 1.0, "text": "x" * 36})
+            t += 1.0
+        return segments
+
+    def build(self, segments):
+        builder = app.ChunkBuilder(3600, token_budget=100)
+        chunks = [chunk for chunk in map(builder.add, segments) if chunk]
+        chunks.append(builder.flush())
+        return chunks
+
+    def test_closes_at_a_pause_after_the_soft_budget(self):
+        segments = self.segments([0.1] * 8 + [3.0] + [0.1] * 5)
+        chunks = self.build(segments)
+        self.assertEqual([seg["id"] for seg in chunks[0]["segments"]], list(range(8)))
+        self.assertEqual([seg["id"] for chunk in chunks for seg in chunk["segments"]], list(range(14)))
+
+    def test_splits_at_the_longest_pause_when_over_budget(self):
+        segments = self.segments([0.1] * 8 + [1.0] + [0.1] * 8)
+        chunks = self.build(segments)
+        self.assertEqual(chunks[0]["segments"][-1]["id"], 7)
+        self.assertLessEqual(chunks[0]["estimated_tokens"], 100)
+        self.assertEqual([seg["id"] for chunk in chunks for seg in chunk["segments"]], list(range(17)))
+
+class TestSearch(unittest.TestCase):
+    """Full-text search and snippet escaping (user-020, user-022)"""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.session_id = f"search-{time.time_ns()}"
+
+    def test_segments_and_notes_are_found(self):
+        app.index_session_segments(self.session_id, [
+            {"id": 0, "start": 1.0, "end": 2.0, "text": "we agreed on the zebrafish budget"},
+            {"id": 1, "start": 2.0, "end": 3.0, "text": "unrelated remark"}
+        ])
+        app.index_session_summary(self.session_id, {"sections": [
+            {"section_name": "Zebrafish", "start_time": 0, "end_time": 60, "notes": ["Budget approved"]}
+        ]})
+        result = self.client.get(f"/api/search?q=zebrafish&session_id={self.session_id}").get_json()
+        self.assertEqual([(row["segment_id"], row["start_ms"]) for row in result["segments"]], [(0, 1000)])
+        self.assertEqual(result["notes"][0]["section_name"], "Zebrafish")
+        self.assertIn("<mark>zebrafish</mark>", result["segments"][0]["snippet"])
+
+    def test_snippets_are_escaped(self):
+        app.index_session_segments(self.session_id, [
+            {"id": 0, "start": 0, "end": 1, "text": "<script>alert(1)</script> quokka & co"}
+        ])
+        snippet = self.client.get(f"/api/search?q=quokka&session_id={self.session_id}").get_json()["segments"][0]["snippet"]
+        self.assertEqual(snippet, "&lt;script&gt;alert(1)&lt;/script&gt; <mark>quokka</mark> &amp; co")
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self.client.get("/api/search?q=").status_code, 400)
+
+class TestUploadAdmission(unittest.TestCase):
+    """Queue admission (user-006) and the model allow-list (user-018)"""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        patcher = patch.multiple(app, WHISPER_PRELOAD=False, probe_audio_duration=MagicMock(return_value=30.0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, content, model_size="tiny"):
+        return self.client.post("/", data={"model_size": model_size, "audio": (io.BytesIO(content), "clip.wav")},
+                                headers={"Accept": "application/json"})
+
+    def test_full_queue_answers_429_without_keeping_the_upload(self):
+        with patch.object(app, 'TRANSCRIPTION_QUEUE_SIZE', 0):
+            response = self.upload(b"rejected upload")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "60")
+        self.assertEqual(response.get_json()["capacity"], 0)
+        self.assertFalse([name for name in os.listdir(app.UPLOAD_FOLDER) if name.endswith(".wav")])
+
+    def test_models_outside_the_allow_list_are_rejected(self):
+        response = self.upload(b"large model", model_size="large-v3")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not allowed", response.get_json()["error"])
+
+    def test_list_settings_from_the_environment(self):
+        with patch.dict(os.environ, {"TEST_LIST_SETTING": "tiny, base,,small"}):
+            self.assertEqual(app.get_setting("TEST_LIST_SETTING", ["auto"]), ["tiny", "base", "small"])
+
 if __name__ == '__main__':
     unittest.main()